@@ -20,6 +20,33 @@ GEN_TYPES = {
     "ST Other": "steam_other",
 }
 
+# Unify fuel types
+FUEL_TYPES = {
+    "Biomass": "biomass",
+    "Coal": "coal",
+    "Geo": "geothermal",
+    "Geothermal": "geothermal",
+    "Natural Gas": "natural_gas",
+    "Natural gas": "natural_gas",
+    "Oil": "oil",
+    "Oil Distillate": "oil",
+}
+
+# Fuels of generation types which have fuel costs
+# The fuel of "ST Other" units is not given in the NREL-118 dataset, their heat
+# rates are close to steam gas units, so natural gas is assumed
+GEN_FUELS = {
+    "biomass": "biomass",
+    "combined_cycle_gas": "natural_gas",
+    "combustion_gas": "natural_gas",
+    "combustion_oil": "oil",
+    "geothermal": "geothermal",
+    "internal_combustion_gas": "natural_gas",
+    "steam_coal": "coal",
+    "steam_gas": "natural_gas",
+    "steam_other": "natural_gas",
+}
+
 # Date format used in data
 DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
 
@@ -37,6 +64,30 @@ FILL_METHOD = "pad"
 # Which engine to use for building power flow cases
 POWER_FLOW_ENGINE = "pandapower"
 
+# Power flow solvers to try in order until one converges
+# The format: [(<algorithm>, <init>), ...], see pandapower.runpp for the values
+# The "results" init starts from OPF results, the fast-decoupled solver is
+# faster than Newton-Raphson with flat start for most of timestamps
+POWER_FLOW_SOLVERS = [("fdbx", "flat"), ("nr", "results"), ("nr", "flat"), ("nr", "dc")]
+
+# OPF strategies to try in order until one converges
+# "flat" --- AC OPF with flat start
+# "previous" --- AC OPF starting from converged results of the previous
+# timestamp, it is skipped if the previous timestamp was not solved just before
+# by the same process
+# "dc" --- AC OPF starting from results of DC OPF
+# "relaxed_voltage" --- AC OPF with bus voltage limits extended by
+# OPF_VOLTAGE_RELAXATION_PU
+# "dc_opf" --- gen outputs from DC OPF, voltages are found by power flow
+# "dispatch" --- AC OPF starting from DC power flow with gen outputs found by
+# economic dispatch, it is skipped if the dispatch is not loaded
+# Since gens have no costs, DC OPF gives just a feasible dispatch and a big part
+# of the demand can be covered by the slack, so "dc_opf" is not used by default
+# Starting from the dispatch gives the same solutions as the flat start but
+# costs an extra DC power flow, so "dispatch" is only the last fallback
+OPF_STRATEGIES = ["flat", "previous", "dc", "relaxed_voltage", "dispatch"]
+OPF_VOLTAGE_RELAXATION_PU = 0.02
+
 # Format of names for each power flow case
 # Power flow cases built for each timestamp should have unique names
 # Each name can contain timestamp parameters
@@ -48,6 +99,164 @@ LOG_FORMAT_DEBUG = "%(asctime)s | %(name)s | %(funcName)s | %(levelname)s | %(me
 LOG_FORMAT_INFO = "%(asctime)s | %(levelname)s | %(message)s"
 LOG_DATE_FORMAT = "%Y-%m-%d %H:%M:%S %Z"
 LOG_PATH = "logs/system.log"
+# If to write the log file in the JSON-lines format, one object per record
+# (time, level, logger, function, process, message, and exception)
+LOG_STRUCTURED = False
+LOG_STRUCTURED_PATH = "logs/system.jsonl"
+# Records are written to the log file in batches at most once per
+# LOG_FLUSH_PERIOD_S seconds, warnings and errors are written immediately
+LOG_FLUSH_PERIOD_S = 1.0
 
 # Number of workers to use for building of power flow cases
 WORKERS_COUNT = -1
+
+# Folder to cache network matrices (admittance matrices, PTDF, LODF, etc.)
+# Matrices are recalculated only if bus or branch data change
+SENSITIVITIES_PATH = "sensitivities"
+
+# Built power flow cases are screened for N-1 contingencies (outages of single branches)
+# Contingencies are calculated with AC power flow only if DC estimations of branch
+# loadings exceed this share of branch ratings
+CONTINGENCY_SCREENING_THRESHOLD = 0.9
+
+# Parameters of the local server of power flow cases
+# The format: (<host>, <port>)
+SERVER_ADDRESS = ("127.0.0.1", 8118)
+SERVER_WORKERS_COUNT = -1
+SERVER_CACHE_SIZE = 128
+
+# Outputs of optimized gens are found by economic dispatch with costs of fuel
+# and ramp limits, and they are used as a starting point of AC OPF
+# The dispatch of all timestamps is one linear problem, or it can be split into
+# windows of DISPATCH_HORIZON_HOURS timestamps to reduce memory usage
+# Outputs of the slack bus and violations of branch ratings and ramp limits are
+# penalized at DISPATCH_PENALTY_USD_PER_MWH
+DISPATCH_HORIZON_HOURS = None
+DISPATCH_PENALTY_USD_PER_MWH = 1000
+
+# Number of representative timestamps to build power flow cases for
+# Timestamps are clustered by loads and outputs of gens, and each cluster is
+# represented by one timestamp with the weight equal to the share of the cluster
+# None --- power flow cases are built for all timestamps
+REPRESENTATIVE_HOURS_COUNT = None
+
+# Folder to cache solved power flow cases across runs and scenarios
+# Cases are keyed by the hash of their inputs (statuses of branches, loads, and gens),
+# so identical inputs are solved only once
+# Least recently used cases are removed if the cache size exceeds CASE_CACHE_SIZE_MB
+# None --- solved cases are not cached
+# The cache is not tracked by DVC stages, so it is not used by default
+CASE_CACHE_PATH = None
+CASE_CACHE_SIZE_MB = 1024
+
+# Monte-Carlo scenarios of the year for probabilistic studies
+# Each scenario has its own random generator seeded by SCENARIOS_SEED and the number
+# of the scenario, so scenarios are reproducible
+# SCENARIO_LOAD_SCALE_STD --- std of load scaling factors which are common for loads
+# of a region during the scenario
+# SCENARIO_RENEWABLE_ERROR_STD --- std of hourly relative errors of wind and solar
+# outputs
+# SCENARIO_OUTAGE_RATE --- probability of an outage of an optimized gen at each hour
+SCENARIOS_COUNT = 100
+SCENARIOS_SEED = 118
+SCENARIO_LOAD_SCALE_STD = 0.05
+SCENARIO_RENEWABLE_ERROR_STD = 0.1
+SCENARIO_OUTAGE_RATE = 0.02
+
+# Parameters of the coordinator of distributed building on several hosts
+# Timestamps are split into chunks of COORDINATOR_CHUNK_SIZE and served to workers
+# Chunks of lost workers and chunks which are not finished in COORDINATOR_LEASE_S
+# seconds are assigned again up to COORDINATOR_MAX_ATTEMPTS times
+# The format of the address: (<host>, <port>)
+COORDINATOR_ADDRESS = ("127.0.0.1", 8119)
+COORDINATOR_CHUNK_SIZE = 24
+COORDINATOR_LEASE_S = 3600
+COORDINATOR_MAX_ATTEMPTS = 3
+
+# Limits of building power flow cases in worker processes
+# Cases which take longer than CASE_TIMEOUT_S seconds are aborted and marked as failed
+# Workers are replaced with new ones after WORKER_MAX_CASES cases or if their resident
+# memory exceeds WORKER_MAX_RSS_MB, and remaining cases are assigned to other workers
+# None --- no limit
+CASE_TIMEOUT_S = 120
+WORKER_MAX_CASES = 500
+WORKER_MAX_RSS_MB = 2048
+
+# Period of log lines with progress of building (completed and failed cases,
+# throughput, and the estimated remaining time) aggregated over all workers
+# None --- progress is not logged
+PROGRESS_LOG_PERIOD_S = 60
+
+# Metrics of building (cases, latency of solvers, iterations, memory of workers,
+# and the queue of cases) in the Prometheus text format
+# METRICS_ADDRESS --- host and port of the "/metrics" endpoint
+# METRICS_TEXTFILE_PATH --- file for the textfile collector of the node exporter,
+# it is rewritten at most once per METRICS_TEXTFILE_PERIOD_S seconds
+# None --- metrics are not exported
+METRICS_ADDRESS = None
+METRICS_TEXTFILE_PATH = None
+METRICS_TEXTFILE_PERIOD_S = 15
+METRICS_LATENCY_BUCKETS_S = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+# Online statistics of results over built cases (min, max, mean, std, quantiles,
+# and shares of cases with violated limits for each bus, branch, and gen)
+# Cases are weighted by the number of timestamps represented by them
+# Quantiles are estimated with fixed-width histograms, so their accuracy is the
+# bin width, the format: {<element type>: {<variable>: (<lower>, <upper>, <bins>)}}
+# If SAVE_CASES is False, only statistics and the results index are saved
+STATISTICS_QUANTILES = (0.05, 0.5, 0.95)
+STATISTICS_HISTOGRAMS = {
+    "bus": {"vm_pu": (0.8, 1.2, 400)},
+    "branch": {"loading_percent": (0, 200, 400)},
+    "gen": {"p_mw": (0, 1300, 1300)},
+}
+SAVE_CASES = True
+
+# Limits of result variables to count violations in statistics and to flag elements
+# in the results index, the format: {<element type>: {<variable>: (<lower>,
+# <upper>)}}, None --- no limit
+RESULT_LIMITS = {
+    "bus": {"vm_pu": (0.95, 1.05)},
+    "branch": {"loading_percent": (None, 100)},
+}
+
+# Index of results of built cases: per-hour summaries, values of variables listed in
+# RESULTS_INDEX_VARIABLES for each element, and hours when elements violate
+# RESULT_LIMITS or optimized gens are at their output limits
+# Gen outputs within RESULTS_INDEX_GEN_TOLERANCE_MW of their limits are binding, since
+# the interior point solver of OPF stops slightly inside limits
+RESULTS_INDEX_VARIABLES = {
+    "bus": ["vm_pu", "va_degree"],
+    "branch": ["loading_percent"],
+    "gen": ["p_mw", "q_mvar"],
+}
+RESULTS_INDEX_GEN_TOLERANCE_MW = 0.05
+
+# Number of recently decoded cases kept by the reader of built datasets
+DATASET_CACHE_SIZE = 256
+
+# Arrays of results of the shape (hours, elements, features) for ML pipelines
+# The format: {<array>: (<element type>, [<variables>], <scale>)}, the scale of -1
+# turns powers of buses, which are positive for consumption, into injections
+ARRAYS_EXPORT = {
+    "bus_injections": ("bus", ["p_mw", "q_mvar"], -1),
+    "bus_voltages": ("bus", ["vm_pu", "va_degree"], 1),
+    "gen_setpoints": ("gen", ["p_mw", "vm_pu"], 1),
+    "branch_flows": (
+        "branch",
+        ["p_from_mw", "q_from_mvar", "p_to_mw", "q_to_mvar", "loading_percent"],
+        1,
+    ),
+}
+ARRAYS_DTYPE = "float32"
+
+# Number of hours in each chunk of graphs exported for graph neural networks
+GRAPHS_CHUNK_SIZE = 1024
+
+# Period of compressed shards to save cases to: "day" or "month". Shards are
+# read per case with `SampleShards` or `DatasetReader`. If None, each case is
+# saved to a separate JSON file
+SAMPLES_SHARD_PERIOD = None
+
+# Level of gzip compression of cases in shards from 1 (fastest) to 9
+SAMPLES_COMPRESSION_LEVEL = 6
@@ -0,0 +1,102 @@
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+
+from definitions import DATE_FORMAT, SAMPLE_NAME_FORMAT
+from src.power_flow.shards import SampleShards
+
+
+def get_size_mb(path: str) -> float:
+    """Get the total size of files in the folder.
+
+    Args:
+        path: Path to the folder.
+
+    Returns:
+        Size in megabytes.
+    """
+    with os.scandir(path) as iterator:
+        return sum(entry.stat().st_size for entry in iterator) / 2**20
+
+
+if __name__ == "__main__":
+    # Check params
+    if len(sys.argv) not in (2, 3, 4):
+        raise ValueError(
+            "Incorrect arguments. Usage:\n\tpython "
+            "benchmark_shards.py path_samples [period] [reads_count]\n"
+        )
+    path_samples = sys.argv[1]
+    period = sys.argv[2] if len(sys.argv) >= 3 else "month"
+    reads_count = int(sys.argv[3]) if len(sys.argv) == 4 else 100
+
+    # Serialized samples saved by the builder as JSON files
+    samples = {}
+    for name in sorted(os.listdir(path_samples)):
+        sample_name, extension = os.path.splitext(name)
+        if extension != ".json":
+            continue
+        moment = datetime.strptime(sample_name, SAMPLE_NAME_FORMAT)
+        with open(os.path.join(path_samples, name), "rb") as file:
+            samples[moment.strftime(DATE_FORMAT)] = (name, file.read())
+    data_mb = sum(len(data) for _, data in samples.values()) / 2**20
+    timestamps = random.choices(list(samples), k=reads_count)
+
+    with tempfile.TemporaryDirectory() as path_temp:
+        path_json = os.path.join(path_temp, "json")
+        path_shards = os.path.join(path_temp, "shards")
+        os.makedirs(path_json)
+        os.makedirs(path_shards)
+
+        # Write, files are not synced to disk in both cases
+        start = time.perf_counter()
+        for name, data in samples.values():
+            with open(os.path.join(path_json, name), "wb") as file:
+                file.write(data)
+        json_s = time.perf_counter() - start
+        shards = SampleShards(path_shards, period=period)
+        start = time.perf_counter()
+        for timestamp, (_, data) in samples.items():
+            shards.put(timestamp, data)
+        shards_s = time.perf_counter() - start
+
+        # Read single cases
+        json_latencies = []
+        for timestamp in timestamps:
+            start = time.perf_counter()
+            with open(os.path.join(path_json, samples[timestamp][0]), "rb") as file:
+                file.read()
+            json_latencies.append(time.perf_counter() - start)
+        shards = SampleShards(path_shards)
+        start = time.perf_counter()
+        shards.timestamps
+        index_s = time.perf_counter() - start
+        shards_latencies = []
+        for timestamp in timestamps:
+            start = time.perf_counter()
+            shards.get(timestamp)
+            shards_latencies.append(time.perf_counter() - start)
+
+        # Report
+        json_mb, shards_mb = get_size_mb(path_json), get_size_mb(path_shards)
+        files_count = len(os.listdir(path_shards))
+        print(f"Cases: {len(samples)}, period of shards: {period}")
+        print(f"JSON: {len(samples)} files, {json_mb:.1f} MB")
+        print(f"Shards: {files_count} files, {shards_mb:.1f} MB")
+        print(f"Compression ratio: {json_mb / shards_mb:.1f}")
+        for name, duration in [("JSON", json_s), ("Shards", shards_s)]:
+            print(
+                f"{name} write: {len(samples) / duration:.1f} cases/second, "
+                f"{data_mb / duration:.1f} MB/second"
+            )
+        print(f"Shards index read: {index_s * 1000:.1f} ms")
+        for name, latencies in [("JSON", json_latencies), ("Shards", shards_latencies)]:
+            latencies_ms = np.array(latencies) * 1000
+            for percentile in [50, 99]:
+                value = np.percentile(latencies_ms, percentile)
+                print(f"{name} read p{percentile}: {value:.2f} ms")
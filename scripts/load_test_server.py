@@ -0,0 +1,69 @@
+import json
+import random
+import sys
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+
+def request_case(url: str, timestamp: str, result_format: str) -> float:
+    """Request one power flow case from the server.
+
+    Args:
+        url: Server URL.
+        timestamp: Datetime of the case.
+        result_format: Format of results.
+
+    Returns:
+        Latency of the request in seconds.
+    """
+    body = json.dumps({"timestamp": timestamp, "format": result_format})
+    request = urllib.request.Request(
+        url=f"{url}/case",
+        data=body.encode("utf-8"),
+        headers={"Content-Type": "application/json"},
+        method="POST",
+    )
+    start = time.perf_counter()
+    with urllib.request.urlopen(request) as response:
+        response.read()
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    # Check params
+    if len(sys.argv) not in (4, 5):
+        raise ValueError(
+            "Incorrect arguments. Usage:\n\tpython "
+            "load_test_server.py url requests_count concurrency [format]\n"
+        )
+    url = sys.argv[1].rstrip("/")
+    requests_count = int(sys.argv[2])
+    concurrency = int(sys.argv[3])
+    result_format = sys.argv[4] if len(sys.argv) == 5 else "json"
+
+    # Random timestamps
+    with urllib.request.urlopen(f"{url}/timestamps") as response:
+        timestamps = json.loads(response.read())
+    samples = random.choices(timestamps, k=requests_count)
+
+    # Send requests
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as executor:
+        latencies = list(
+            executor.map(
+                lambda timestamp: request_case(url, timestamp, result_format),
+                samples,
+            )
+        )
+    duration = time.perf_counter() - start
+
+    # Report
+    latencies_ms = np.array(latencies) * 1000
+    print(f"Requests: {requests_count}, concurrency: {concurrency}")
+    print(f"Throughput: {requests_count / duration:.2f} requests/second")
+    for percentile in [50, 90, 99]:
+        value = np.percentile(latencies_ms, percentile)
+        print(f"Latency p{percentile}: {value:.1f} ms")
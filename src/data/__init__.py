@@ -1,4 +1,5 @@
 from .check.branches import check_branches
+from .check.branches_ts import check_branches_ts
 from .check.buses import check_buses
 from .check.gens import check_gens
 from .check.gens_ts import check_gens_ts
@@ -10,6 +11,9 @@ from .parse.jeas118_loads import parse_jeas118_loads
 from .parse.jeas118_trafos import parse_jeas118_trafos
 from .parse.nrel118_buses import parse_nrel118_buses
 from .parse.nrel118_escalators_ts import parse_nrel118_escalators_ts
+from .parse.nrel118_fuel_prices_ts import parse_nrel118_fuel_prices_ts
+from .parse.nrel118_fuels import parse_nrel118_fuels
+from .parse.nrel118_gen_costs import parse_nrel118_gen_costs
 from .parse.nrel118_gens import parse_nrel118_gens
 from .parse.nrel118_hydros_nondisp_ts import parse_nrel118_hydros_nondisp_ts
 from .parse.nrel118_hydros_ts import parse_nrel118_hydros_ts
@@ -19,11 +23,14 @@ from .parse.nrel118_outages_ts import parse_nrel118_outages_ts
 from .parse.nrel118_solars_ts import parse_nrel118_solars_ts
 from .parse.nrel118_winds_ts import parse_nrel118_winds_ts
 from .prepare.branches import prepare_branches
+from .prepare.branches_ts import prepare_branches_ts
 from .prepare.buses import prepare_buses
+from .prepare.gen_costs_ts import prepare_gen_costs_ts
 from .prepare.gens import prepare_gens
 from .prepare.gens_ts import prepare_gens_ts
 from .prepare.loads import prepare_loads
 from .prepare.loads_ts import prepare_loads_ts
+from .prepare.representative_hours import prepare_representative_hours
 from .transform.gens import transform_gens
 from .transform.gens_escalated_ts import transform_gens_escalated_ts
 from .transform.gens_ts import transform_gens_ts
@@ -0,0 +1,85 @@
+import sys
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from scipy.sparse.csgraph import connected_components
+
+from src.utils.data_loaders import load_df_data
+
+
+def check_branches_ts(
+    prepared_branches_ts: str | pd.DataFrame,
+    prepared_branches: str | pd.DataFrame,
+    prepared_buses: str | pd.DataFrame,
+) -> None:
+    """Check that branch time-series values are correct.
+
+    Args:
+        prepared_branches_ts: Path or dataframe to prepared time-series data.
+        prepared_branches: Path or dataframe to prepared branch data.
+        prepared_buses: Path or dataframe to prepared bus data.
+
+    Raises:
+        AssertionError: Some check fails.
+    """
+    # Load data
+    branches = load_df_data(
+        data=prepared_branches,
+        dtypes={"branch_name": str, "from_bus": str, "to_bus": str},
+    )
+    buses = load_df_data(data=prepared_buses, dtypes={"bus_name": str})
+    branches_ts = load_df_data(
+        data=prepared_branches_ts,
+        dtypes={"datetime": str, "branch_name": str, "in_service": bool},
+    )
+
+    # Ensure there are no NaNs
+    assert not branches_ts.isna().values.any(), "There are NaNs in the dataset"
+
+    # Ensure there are time-series values for all branches
+    branches_ts_names = branches_ts["branch_name"].unique()
+    branches_names = branches["branch_name"].unique()
+    assert np.isin(
+        branches_names, branches_ts_names, assume_unique=True
+    ).all(), "Some branches are missed in time-series data"
+    assert np.isin(
+        branches_ts_names, branches_names, assume_unique=True
+    ).all(), "There are some unknown branches in time-series data"
+
+    # Ensure each branch has values for each timestamp
+    pivot = branches_ts.pivot(
+        index="datetime", columns="branch_name", values="in_service"
+    )
+    assert (
+        not pivot.isna().values.any()
+    ), "Values of the branch time-series dataset have different date ranges."
+
+    # Ensure outages do not split the system into islands
+    bus_name_to_id = pd.Series(data=np.arange(len(buses)), index=buses["bus_name"])
+    branches = branches.set_index("branch_name").loc[pivot.columns]
+    from_ids = bus_name_to_id[branches["from_bus"]].values
+    to_ids = bus_name_to_id[branches["to_bus"]].values
+    for status in np.unique(pivot.values.astype(bool), axis=0):
+        graph = sparse.coo_matrix(
+            (np.ones(status.sum()), (from_ids[status], to_ids[status])),
+            shape=(len(buses), len(buses)),
+        )
+        islands_count, _ = connected_components(graph, directed=False)
+        assert islands_count == 1, "Branch outages split the system into islands"
+
+
+if __name__ == "__main__":
+    # Check params
+    if len(sys.argv) != 4:
+        raise ValueError(
+            "Incorrect arguments. Usage:\n\tpython branches_ts.py "
+            "path_prepared_branches_ts path_prepared_branches path_prepared_buses\n"
+        )
+
+    # Run
+    check_branches_ts(
+        prepared_branches_ts=sys.argv[1],
+        prepared_branches=sys.argv[2],
+        prepared_buses=sys.argv[3],
+    )
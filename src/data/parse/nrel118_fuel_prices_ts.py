@@ -0,0 +1,71 @@
+import sys
+from typing import Optional
+
+import pandas as pd
+
+from definitions import DATE_FORMAT, FUEL_TYPES
+from src.utils.data_loaders import load_df_data
+
+
+def parse_nrel118_fuel_prices_ts(
+    raw_data: str | pd.DataFrame, path_parsed_data: Optional[str] = None
+) -> Optional[pd.DataFrame]:
+    """Parse raw monthly fuel prices by regions from the NREL-118 dataset.
+
+    Args:
+        raw_data: Path or dataframe with raw data.
+        path_parsed_data: Path to save parsed data.
+
+    Returns:
+        Parsed data or None if `path_parsed_data` is passed and the data were saved.
+    """
+    # Columns are named as "<fuel> R<region number>"
+    fuel_columns = [
+        "Coal R1",
+        "Oil Distillate R1",
+        "Oil Distillate R2",
+        "Biomass R1",
+        "Biomass R2",
+        "Biomass R3",
+        "Natural Gas R1",
+        "Natural Gas R2",
+        "Natural Gas R3",
+        "Geo R1",
+    ]
+    dtypes = {"Datetime": str, **{col: float for col in fuel_columns}}
+    prices = load_df_data(data=raw_data, dtypes=dtypes)
+
+    # Convert to the long format
+    prices = prices.melt(
+        id_vars="Datetime", var_name="column", value_name="fuel_price_usd_per_mmbtu"
+    )
+    column_pattern = r"^(?P<fuel>[\w\s]+)\sR(?P<region>\d+)$"
+    names = prices["column"].str.extract(pat=column_pattern, expand=True)
+    prices["fuel"] = names["fuel"].replace(FUEL_TYPES)
+    prices["region"] = "r" + names["region"]
+
+    # Convert datetime, the first day of each month is given as "1-Jan"
+    prices["datetime"] = pd.to_datetime(
+        "2024-" + prices["Datetime"], format="%Y-%d-%b"
+    ).dt.strftime(DATE_FORMAT)
+
+    # Return results
+    cols = ["datetime", "fuel", "region", "fuel_price_usd_per_mmbtu"]
+    prices.sort_values(["datetime", "fuel", "region"], inplace=True, ignore_index=True)
+    if path_parsed_data:
+        prices[cols].to_csv(path_parsed_data, header=True, index=False)
+    else:
+        return prices[cols]
+
+
+if __name__ == "__main__":
+    # Check params
+    if len(sys.argv) != 3:
+        raise ValueError(
+            "Incorrect arguments. Usage:\n\tpython "
+            "parse_nrel118_fuel_prices_ts.py path_raw_nrel118_fuel_prices "
+            "path_parsed_data\n"
+        )
+
+    # Run
+    parse_nrel118_fuel_prices_ts(raw_data=sys.argv[1], path_parsed_data=sys.argv[2])
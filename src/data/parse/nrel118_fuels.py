@@ -0,0 +1,53 @@
+import sys
+from typing import Optional
+
+import pandas as pd
+
+from definitions import FUEL_TYPES
+from src.utils.data_loaders import load_df_data
+
+
+def parse_nrel118_fuels(
+    raw_data: str | pd.DataFrame, path_parsed_data: Optional[str] = None
+) -> Optional[pd.DataFrame]:
+    """Parse raw fuel data from the NREL-118 dataset.
+
+    Args:
+        raw_data: Path or dataframe with raw data.
+        path_parsed_data: Path to save parsed data.
+
+    Returns:
+        Parsed data or None if `path_parsed_data` is passed and the data were saved.
+    """
+    # The column with fuel names has no header
+    dtypes = {"Unnamed: 0": str, "Fue price ($/MMBTU)": float}
+    fuels = load_df_data(data=raw_data, dtypes=dtypes)
+
+    # Rename variables
+    fuels.rename(
+        columns={
+            "Unnamed: 0": "fuel",
+            "Fue price ($/MMBTU)": "fuel_price_usd_per_mmbtu",
+        },
+        inplace=True,
+    )
+    fuels["fuel"] = fuels["fuel"].replace(FUEL_TYPES)
+
+    # Return results
+    fuels.sort_values(by="fuel", inplace=True, ignore_index=True)
+    if path_parsed_data:
+        fuels.to_csv(path_parsed_data, header=True, index=False)
+    else:
+        return fuels
+
+
+if __name__ == "__main__":
+    # Check params
+    if len(sys.argv) != 3:
+        raise ValueError(
+            "Incorrect arguments. Usage:\n\tpython "
+            "parse_nrel118_fuels.py path_raw_nrel118_fuels path_parsed_data\n"
+        )
+
+    # Run
+    parse_nrel118_fuels(raw_data=sys.argv[1], path_parsed_data=sys.argv[2])
@@ -0,0 +1,78 @@
+import sys
+from typing import Optional
+
+import pandas as pd
+
+from definitions import GEN_TYPES
+from src.utils.data_loaders import load_df_data
+
+
+def parse_nrel118_gen_costs(
+    raw_data: str | pd.DataFrame, path_parsed_data: Optional[str] = None
+) -> Optional[pd.DataFrame]:
+    """Parse raw cost and ramping data of generators from the NREL-118 dataset.
+
+    Args:
+        raw_data: Path or dataframe with raw data.
+        path_parsed_data: Path to save parsed data.
+
+    Returns:
+        Parsed data or None if `path_parsed_data` is passed and the data were saved.
+    """
+    # Use only the first band of the incremental heat rate, since other bands
+    # are not given for many generators
+    dtypes = {
+        "Generator Name": str,
+        "Heat Rate Inc Band 1 (BTU/kWh)": float,
+        "VO&M Charge ($/MWh)": float,
+        "Max Ramp Up (MW/min)": float,
+        "Max Ramp Down (MW/min)": float,
+    }
+    gens = load_df_data(data=raw_data, dtypes=dtypes, sep=";", decimal=",")
+
+    # Drop empty rows
+    gens.dropna(how="all", inplace=True)
+
+    # Rename variables
+    gens.rename(
+        columns={
+            "Generator Name": "gen_name",
+            "Heat Rate Inc Band 1 (BTU/kWh)": "heat_rate_btu_per_kwh",
+            "VO&M Charge ($/MWh)": "vom_usd_per_mwh",
+            "Max Ramp Up (MW/min)": "max_ramp_up_mw_per_min",
+            "Max Ramp Down (MW/min)": "max_ramp_down_mw_per_min",
+        },
+        inplace=True,
+    )
+
+    # Unify generator names
+    name_pattern = r"^(?P<gen_type>[\w\s]+)\s(?P<gen_number>\d+)$"
+    names = gens["gen_name"].str.extract(pat=name_pattern, expand=True)
+    names["gen_type"].replace(GEN_TYPES, inplace=True)
+    gens["gen_name"] = names["gen_type"] + "_" + names["gen_number"].str.zfill(3)
+
+    # Return results
+    cols = [
+        "gen_name",
+        "heat_rate_btu_per_kwh",
+        "vom_usd_per_mwh",
+        "max_ramp_up_mw_per_min",
+        "max_ramp_down_mw_per_min",
+    ]
+    gens.sort_values(by="gen_name", inplace=True, ignore_index=True)
+    if path_parsed_data:
+        gens[cols].to_csv(path_parsed_data, header=True, index=False)
+    else:
+        return gens[cols]
+
+
+if __name__ == "__main__":
+    # Check params
+    if len(sys.argv) != 3:
+        raise ValueError(
+            "Incorrect arguments. Usage:\n\tpython "
+            "parse_nrel118_gen_costs.py path_raw_nrel118_gens path_parsed_data\n"
+        )
+
+    # Run
+    parse_nrel118_gen_costs(raw_data=sys.argv[1], path_parsed_data=sys.argv[2])
@@ -0,0 +1,89 @@
+import sys
+from typing import Optional
+
+import pandas as pd
+
+from definitions import DATE_FORMAT, DATE_RANGE
+from src.utils.data_loaders import load_df_data
+
+
+def prepare_branches_ts(
+    prepared_branches: str | pd.DataFrame,
+    branch_outages: str | pd.DataFrame,
+    path_prepared_data: Optional[str] = None,
+) -> Optional[pd.DataFrame]:
+    """Prepare final branch time-series data.
+
+    Args:
+        prepared_branches: Path or dataframe with prepared branch data.
+        branch_outages: Path or dataframe with planned branch outages. Each
+          outage lasts from "start_datetime" until "end_datetime" (not included).
+        path_prepared_data: Path to save prepared data.
+
+    Returns:
+        Prepared data or None if `path_prepared_data` is passed and the data were saved.
+    """
+    # Load data
+    branches = load_df_data(
+        data=prepared_branches, dtypes={"branch_name": str, "in_service": bool}
+    )
+    outages = load_df_data(
+        data=branch_outages,
+        dtypes={"branch_name": str, "start_datetime": str, "end_datetime": str},
+    )
+    assert (
+        outages["branch_name"].isin(branches["branch_name"]).all()
+    ), "There are outages of unknown branches"
+
+    # Select by date range
+    start_date, end_date, frequency = DATE_RANGE
+    date_range = pd.date_range(
+        start_date, end_date, freq=frequency, name="datetime", inclusive="left"
+    )
+
+    # Drop Feb 29 since load, wind, and solar data have no this date
+    mask = (date_range.day == 29) & (date_range.month == 2)
+    date_range = date_range[~mask]
+
+    # Branches keep their static status except for outage periods
+    status = pd.DataFrame(
+        data=[branches["in_service"].values] * len(date_range),
+        index=date_range,
+        columns=branches["branch_name"],
+    )
+    for outage in outages.itertuples():
+        start = pd.to_datetime(outage.start_datetime, format=DATE_FORMAT)
+        end = pd.to_datetime(outage.end_datetime, format=DATE_FORMAT)
+        status.loc[
+            (date_range >= start) & (date_range < end), outage.branch_name
+        ] = False
+    branches_ts = status.stack().rename("in_service").reset_index()
+
+    # Return results
+    cols = ["datetime", "branch_name", "in_service"]
+    branches_ts.sort_values(
+        ["datetime", "branch_name"], inplace=True, ignore_index=True
+    )
+    if path_prepared_data:
+        branches_ts[cols].to_csv(
+            path_prepared_data, header=True, index=False, date_format=DATE_FORMAT
+        )
+    else:
+        return branches_ts[cols]
+
+
+if __name__ == "__main__":
+    # Check params
+    if len(sys.argv) != 4:
+        raise ValueError(
+            "Incorrect arguments. Usage:\n\tpython "
+            "branches_ts.py path_prepared_branches path_branch_outages "
+            "path_prepared_data\n"
+        )
+
+    # Run
+    prepare_branches_ts(
+        prepared_branches=sys.argv[1],
+        branch_outages=sys.argv[2],
+        path_prepared_data=sys.argv[3],
+    )
@@ -0,0 +1,152 @@
+import sys
+from typing import Optional
+
+import pandas as pd
+
+from definitions import DATE_FORMAT, DATE_RANGE, FILL_METHOD, GEN_FUELS
+from src.utils.data_loaders import load_df_data
+
+
+def prepare_gen_costs_ts(
+    parsed_nrel118_gen_costs: str | pd.DataFrame,
+    parsed_nrel118_fuel_prices_ts: str | pd.DataFrame,
+    parsed_nrel118_fuels: str | pd.DataFrame,
+    prepared_gens: str | pd.DataFrame,
+    prepared_buses: str | pd.DataFrame,
+    path_prepared_data: Optional[str] = None,
+) -> Optional[pd.DataFrame]:
+    """Prepare final time-series data of marginal costs and ramp limits of gens.
+
+    Marginal costs are estimated as the incremental heat rate multiplied by
+    the fuel price in the region of the generator plus variable O&M charges.
+    Gens without fuel (e.g., dispatchable hydro) have only O&M charges. Only gens
+    optimized at the OPF stage are included.
+
+    Args:
+        parsed_nrel118_gen_costs: Path or dataframe with parsed cost data of gens.
+        parsed_nrel118_fuel_prices_ts: Path or dataframe with parsed monthly fuel
+          prices by regions.
+        parsed_nrel118_fuels: Path or dataframe with parsed fuel data. Their
+          prices are used for regions without monthly prices.
+        prepared_gens: Path or dataframe with prepared generation data.
+        prepared_buses: Path or dataframe with prepared bus data.
+        path_prepared_data: Path to save prepared data.
+
+    Returns:
+        Prepared data or None if `path_prepared_data` is passed and the data were saved.
+    """
+    # Load data
+    gen_costs = load_df_data(
+        data=parsed_nrel118_gen_costs,
+        dtypes={
+            "gen_name": str,
+            "heat_rate_btu_per_kwh": float,
+            "vom_usd_per_mwh": float,
+            "max_ramp_up_mw_per_min": float,
+            "max_ramp_down_mw_per_min": float,
+        },
+    )
+    prices_ts = load_df_data(
+        data=parsed_nrel118_fuel_prices_ts,
+        dtypes={
+            "datetime": str,
+            "fuel": str,
+            "region": str,
+            "fuel_price_usd_per_mmbtu": float,
+        },
+    )
+    fuels = load_df_data(
+        data=parsed_nrel118_fuels,
+        dtypes={"fuel": str, "fuel_price_usd_per_mmbtu": float},
+    )
+    gens = load_df_data(
+        data=prepared_gens,
+        dtypes={"gen_name": str, "bus_name": str, "opt_category": str},
+    )
+    buses = load_df_data(data=prepared_buses, dtypes={"bus_name": str, "region": str})
+
+    # Fuels and regions of optimized gens
+    gens = gens.loc[gens["opt_category"] != "non_optimized"]
+    gens = gens.merge(buses, on="bus_name", how="left")
+    gens["fuel"] = gens["gen_name"].str.replace(r"_\d+$", "", regex=True)
+    gens["fuel"] = gens["fuel"].map(GEN_FUELS)
+    gens = gens.merge(gen_costs, on="gen_name", how="left")
+    gens["vom_usd_per_mwh"] = gens["vom_usd_per_mwh"].fillna(0)
+    fueled = gens.loc[gens["fuel"].notna()]
+
+    # Select by date range
+    # Each price has a value at "2024-01-01 00:00:00"
+    start_date, end_date, frequency = DATE_RANGE
+    date_range = pd.date_range(
+        start_date, end_date, freq=frequency, name="datetime", inclusive="left"
+    )
+
+    # Drop Feb 29 since load, wind, and solar data have no this date
+    mask = (date_range.day == 29) & (date_range.month == 2)
+    date_range = date_range[~mask]
+
+    # Take fuel prices for each region and use base prices for missing ones
+    prices_ts["datetime"] = pd.to_datetime(prices_ts["datetime"], format=DATE_FORMAT)
+    prices_ts = prices_ts.pivot(
+        index="datetime", columns=["fuel", "region"], values="fuel_price_usd_per_mmbtu"
+    )
+    prices_ts = prices_ts.reindex(date_range, method=FILL_METHOD)
+    base_prices = fuels.set_index("fuel")["fuel_price_usd_per_mmbtu"]
+    for fuel, region in fueled[["fuel", "region"]].drop_duplicates().values:
+        if (fuel, region) not in prices_ts.columns:
+            prices_ts[(fuel, region)] = base_prices[fuel]
+    prices = prices_ts[pd.MultiIndex.from_frame(fueled[["fuel", "region"]])]
+    prices.columns = fueled["gen_name"]
+
+    # Heat rates are in BTU/kWh which is equal to MMBTU/MWh / 1000
+    heat_rates = fueled.set_index("gen_name")["heat_rate_btu_per_kwh"] / 1000
+    costs = (prices * heat_rates).reindex(columns=gens["gen_name"], fill_value=0)
+    costs += gens.set_index("gen_name")["vom_usd_per_mwh"]
+    gen_costs_ts = costs.stack().rename("cost_usd_per_mwh").reset_index()
+    gen_costs_ts = gen_costs_ts.merge(
+        gens[["gen_name", "max_ramp_up_mw_per_min", "max_ramp_down_mw_per_min"]],
+        on="gen_name",
+        how="left",
+    )
+
+    # Round values
+    gen_costs_ts["cost_usd_per_mwh"] = gen_costs_ts["cost_usd_per_mwh"].round(
+        decimals=6
+    )
+
+    # Return results
+    cols = [
+        "datetime",
+        "gen_name",
+        "cost_usd_per_mwh",
+        "max_ramp_up_mw_per_min",
+        "max_ramp_down_mw_per_min",
+    ]
+    gen_costs_ts.sort_values(["datetime", "gen_name"], inplace=True, ignore_index=True)
+    if path_prepared_data:
+        gen_costs_ts[cols].to_csv(
+            path_prepared_data, header=True, index=False, date_format=DATE_FORMAT
+        )
+    else:
+        return gen_costs_ts[cols]
+
+
+if __name__ == "__main__":
+    # Check params
+    if len(sys.argv) != 7:
+        raise ValueError(
+            "Incorrect arguments. Usage:\n\tpython prepare_gen_costs_ts.py "
+            "path_parsed_nrel118_gen_costs path_parsed_nrel118_fuel_prices_ts "
+            "path_parsed_nrel118_fuels path_prepared_gens path_prepared_buses "
+            "path_prepared_data\n"
+        )
+
+    # Run
+    prepare_gen_costs_ts(
+        parsed_nrel118_gen_costs=sys.argv[1],
+        parsed_nrel118_fuel_prices_ts=sys.argv[2],
+        parsed_nrel118_fuels=sys.argv[3],
+        prepared_gens=sys.argv[4],
+        prepared_buses=sys.argv[5],
+        path_prepared_data=sys.argv[6],
+    )
@@ -0,0 +1,202 @@
+import sys
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from definitions import DATE_FORMAT, REPRESENTATIVE_HOURS_COUNT
+from src.utils.data_loaders import load_df_data
+
+# Seed of the random generator used to choose initial clusters
+_SEED = 118
+
+# Max number of iterations of the clustering
+_MAX_ITERATIONS = 100
+
+
+def prepare_representative_hours(
+    prepared_loads_ts: str | pd.DataFrame,
+    prepared_gens_ts: str | pd.DataFrame,
+    prepared_branches_ts: str | pd.DataFrame,
+    path_prepared_data: Optional[str] = None,
+) -> Optional[pd.DataFrame]:
+    """Map each timestamp to its representative one.
+
+    Each timestamp is described by active loads, outputs of non-optimized gens
+    (wind, solar, etc.), and max outputs of optimized gens in megawatts.
+    Timestamps with the same statuses of branches are clustered together, and
+    the number of clusters of each topology is proportional to the number of its
+    timestamps. The timestamp closest to the center of a cluster represents all
+    timestamps of the cluster, and its weight is the share of the year covered
+    by the cluster. If `REPRESENTATIVE_HOURS_COUNT` is None, each timestamp
+    represents itself.
+
+    Args:
+        prepared_loads_ts: Path or dataframe with prepared load time-series data.
+        prepared_gens_ts: Path or dataframe with prepared generation time-series data.
+        prepared_branches_ts: Path or dataframe with prepared branch time-series data.
+        path_prepared_data: Path to save prepared data.
+
+    Returns:
+        Prepared data or None if `path_prepared_data` is passed and the data were saved.
+    """
+    # Load data
+    loads_ts = load_df_data(
+        data=prepared_loads_ts,
+        dtypes={"datetime": str, "load_name": str, "in_service": bool, "p_mw": float},
+    )
+    gens_ts = load_df_data(
+        data=prepared_gens_ts,
+        dtypes={
+            "datetime": str,
+            "gen_name": str,
+            "in_service": bool,
+            "p_mw": float,
+            "max_p_mw": float,
+        },
+    )
+    branches_ts = load_df_data(
+        data=prepared_branches_ts,
+        dtypes={"datetime": str, "branch_name": str, "in_service": bool},
+    )
+
+    # Features of timestamps in megawatts
+    loads_ts["p_mw"] = loads_ts["p_mw"].where(loads_ts["in_service"], 0)
+    gens_ts["p_mw"] = gens_ts["p_mw"].fillna(gens_ts["max_p_mw"])
+    gens_ts["p_mw"] = gens_ts["p_mw"].where(gens_ts["in_service"], 0)
+    features = pd.concat(
+        [
+            loads_ts.pivot(index="datetime", columns="load_name", values="p_mw"),
+            gens_ts.pivot(index="datetime", columns="gen_name", values="p_mw"),
+        ],
+        axis=1,
+    ).fillna(0)
+    status = branches_ts.pivot(
+        index="datetime", columns="branch_name", values="in_service"
+    ).reindex(features.index)
+
+    # Cluster timestamps of each topology separately
+    representatives = pd.Series(features.index, index=features.index)
+    if REPRESENTATIVE_HOURS_COUNT is not None:
+        _, topology_ids = np.unique(status.values, axis=0, return_inverse=True)
+        for topology_id in np.unique(topology_ids):
+            mask = topology_ids == topology_id
+            count = round(REPRESENTATIVE_HOURS_COUNT * mask.mean())
+            medoids, labels = _get_clusters(features.values[mask], max(count, 1))
+            names = features.index[mask]
+            representatives[mask] = names[medoids][labels]
+    weights = representatives.map(representatives.value_counts(normalize=True))
+    mapping = pd.DataFrame(
+        {
+            "datetime": features.index,
+            "representative_datetime": representatives.values,
+            "weight": weights.values,
+        }
+    )
+
+    # Round values
+    mapping["weight"] = mapping["weight"].round(decimals=9)
+
+    # Return results
+    cols = ["datetime", "representative_datetime", "weight"]
+    mapping.sort_values("datetime", inplace=True, ignore_index=True)
+    if path_prepared_data:
+        mapping[cols].to_csv(
+            path_prepared_data, header=True, index=False, date_format=DATE_FORMAT
+        )
+    else:
+        return mapping[cols]
+
+
+def _get_clusters(features: np.ndarray, count: int) -> tuple[np.ndarray, np.ndarray]:
+    """Cluster rows of features with k-means and find medoids of clusters.
+
+    Initial centers are chosen with the k-means++ algorithm.
+
+    Args:
+        features: Features of timestamps (rows).
+        count: Number of clusters.
+
+    Returns:
+        Indices of medoids of clusters and cluster labels of rows.
+    """
+    rng = np.random.default_rng(_SEED)
+    count = min(count, len(features))
+    norms = np.einsum("ij,ij->i", features, features)
+
+    # Choose initial centers far from each other
+    centers = np.empty((count, features.shape[1]))
+    centers[0] = features[rng.integers(len(features))]
+    distances = _get_distances(features, norms, centers[:1])[:, 0]
+    for i in range(1, count):
+        total = distances.sum()
+        if total > 0:
+            index = rng.choice(len(features), p=distances / total)
+        else:
+            index = rng.integers(len(features))
+        centers[i] = features[index]
+        distances = np.minimum(
+            distances, _get_distances(features, norms, centers[i : i + 1])[:, 0]
+        )
+
+    # Move centers to means of their clusters until labels are stable
+    labels = np.full(len(features), -1)
+    for _ in range(_MAX_ITERATIONS):
+        distances = _get_distances(features, norms, centers)
+        new_labels = distances.argmin(axis=1)
+        if np.array_equal(new_labels, labels):
+            break
+        labels = new_labels
+        sizes = np.bincount(labels, minlength=count)
+        sums = np.zeros_like(centers)
+        np.add.at(sums, labels, features)
+        filled = sizes > 0
+        centers[filled] = sums[filled] / sizes[filled, None]
+
+    # Medoids are rows closest to centers of their clusters
+    own_distances = distances[np.arange(len(features)), labels]
+    order = np.lexsort((own_distances, labels))
+    first = np.r_[True, labels[order][1:] != labels[order][:-1]]
+    medoids = np.full(count, -1)
+    medoids[labels[order][first]] = order[first]
+
+    # Labels are renumbered to skip empty clusters
+    used = medoids >= 0
+    new_ids = np.cumsum(used) - 1
+    return medoids[used], new_ids[labels]
+
+
+def _get_distances(
+    features: np.ndarray, norms: np.ndarray, centers: np.ndarray
+) -> np.ndarray:
+    """Calculate squared euclidean distances between rows and centers.
+
+    Args:
+        features: Features of timestamps (rows).
+        norms: Squared norms of rows.
+        centers: Centers of clusters.
+
+    Returns:
+        Matrix of distances with rows corresponding to features.
+    """
+    distances = norms[:, None] - 2 * features @ centers.T
+    distances += np.einsum("ij,ij->i", centers, centers)
+    return np.maximum(distances, 0)
+
+
+if __name__ == "__main__":
+    # Check params
+    if len(sys.argv) != 5:
+        raise ValueError(
+            "Incorrect arguments. Usage:\n\tpython "
+            "representative_hours.py path_prepared_loads_ts path_prepared_gens_ts "
+            "path_prepared_branches_ts path_prepared_data\n"
+        )
+
+    # Run
+    prepare_representative_hours(
+        prepared_loads_ts=sys.argv[1],
+        prepared_gens_ts=sys.argv[2],
+        prepared_branches_ts=sys.argv[3],
+        path_prepared_data=sys.argv[4],
+    )
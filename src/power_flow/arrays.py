@@ -0,0 +1,136 @@
+import json
+import os
+from typing import Optional
+
+import numpy as np
+
+from definitions import ARRAYS_DTYPE, ARRAYS_EXPORT
+
+# Name of the file with metadata of arrays
+_META_FILE = "meta.json"
+
+
+class ArraysWriter:
+    """Write results of cases to fixed-shape arrays while cases are built.
+
+    Each array has the shape (hours, elements, features) and is saved as a
+    `.npy` file, which is preallocated and filled in place as cases are
+    solved, so results are not kept in memory and cases do not have to be
+    saved. Rows of cases which did not converge or were not built are NaNs.
+    Arrays are loaded with `np.load(..., mmap_mode="r")` or `load_arrays`.
+
+    Args:
+        path: Path to the folder of arrays.
+        timestamps: Timestamps of cases in the order of rows.
+        element_names: Names of elements for each element type in the order
+          used in results (see `_get_element_names` of the builder).
+        weights: Weights of timestamps, e.g. numbers of timestamps represented
+          by them. Timestamps which are not listed have the weight of 1.
+        arrays: Element types, variables, and scales of values for each array
+          in the format {<array>: (<element type>, [<variables>], <scale>)}.
+        dtype: Type of values.
+
+    Attributes:
+        path: Path to the folder of arrays.
+        timestamps: Timestamps of cases in the order of rows.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        timestamps: list[str],
+        element_names: dict[str, list[str]],
+        weights: Optional[dict[str, float]] = None,
+        arrays: dict = ARRAYS_EXPORT,
+        dtype: str = ARRAYS_DTYPE,
+    ) -> None:
+        """Write results of cases to fixed-shape arrays while cases are built."""
+        self.path = path
+        self.timestamps = list(timestamps)
+        self._positions = {
+            timestamp: position for position, timestamp in enumerate(self.timestamps)
+        }
+        self._arrays = arrays
+        os.makedirs(path, exist_ok=True)
+        self._files = {}
+        for name, (element, variables, _) in arrays.items():
+            shape = (len(self.timestamps), len(element_names[element]), len(variables))
+            array = np.lib.format.open_memmap(
+                os.path.join(path, f"{name}.npy"), mode="w+", dtype=dtype, shape=shape
+            )
+            array[:] = np.nan
+            self._files[name] = array
+        self._is_converged = np.lib.format.open_memmap(
+            os.path.join(path, "is_converged.npy"),
+            mode="w+",
+            dtype=bool,
+            shape=(len(self.timestamps),),
+        )
+        np.save(os.path.join(path, "timestamps.npy"), np.array(self.timestamps))
+        weights = weights or {}
+        np.save(
+            os.path.join(path, "weights.npy"),
+            np.array([float(weights.get(timestamp, 1)) for timestamp in timestamps]),
+        )
+        meta = {
+            "shape": {name: array.shape for name, array in self._files.items()},
+            "dtype": dtype,
+            "arrays": {
+                name: {
+                    "element_type": element,
+                    "features": variables,
+                    "scale": scale,
+                    "element_names": element_names[element],
+                }
+                for name, (element, variables, scale) in arrays.items()
+            },
+        }
+        with open(os.path.join(path, _META_FILE), "w") as file:
+            json.dump(meta, file, indent=2)
+
+    def update(self, record: dict) -> None:
+        """Write results of a case to its rows.
+
+        Args:
+            record: Timestamp, convergence flags, and result arrays for each
+              element type (see `_get_record` of the builder).
+        """
+        position = self._positions[record["timestamp"]]
+        self._is_converged[position] = record["is_pf_converged"]
+        if not record["is_pf_converged"]:
+            return
+        for name, (element, variables, scale) in self._arrays.items():
+            results = record[element]
+            array = self._files[name]
+            for feature, variable in enumerate(variables):
+                array[position, :, feature] = scale * results[variable]
+
+    def close(self) -> None:
+        """Flush arrays to disk."""
+        for array in [*self._files.values(), self._is_converged]:
+            array.flush()
+        self._files = {}
+
+
+def load_arrays(
+    path: str, mmap_mode: Optional[str] = "r"
+) -> tuple[dict[str, np.ndarray], dict]:
+    """Load arrays saved by `ArraysWriter`.
+
+    Args:
+        path: Path to the folder of arrays.
+        mmap_mode: Mode of memory mapping (see `np.load`). If None, arrays are
+          read into memory.
+
+    Returns:
+        Arrays by names including "timestamps", "weights", and "is_converged",
+          and metadata with element names and features of each array.
+    """
+    with open(os.path.join(path, _META_FILE)) as file:
+        meta = json.load(file)
+    arrays = {
+        name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mmap_mode)
+        for name in [*meta["arrays"], "is_converged", "weights"]
+    }
+    arrays["timestamps"] = np.load(os.path.join(path, "timestamps.npy"))
+    return arrays, meta
@@ -1,36 +1,268 @@
+import asyncio
+import hashlib
+import inspect
+import logging
+import mmap
 import os
+import pickle
+import resource
+import signal
+import time
 from abc import ABC, abstractmethod
+from collections import deque
+from collections.abc import AsyncIterator, Iterator
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime
-from multiprocessing import Manager, Pool, Queue, current_process
-from threading import Thread
+from multiprocessing import Pipe, Pool, Process, Queue, current_process
+from multiprocessing.connection import Connection, wait
+from queue import SimpleQueue
+from threading import current_thread, main_thread
 from typing import Any, Optional
 
 import numpy as np
 import pandas as pd
-from tqdm import tqdm
 
 from definitions import DATE_FORMAT, SAMPLE_NAME_FORMAT
-from src.utils.app_logger import get_logger, get_queue_logger, queue_listener
+from src.power_flow.case_cache import CaseCache
+from src.power_flow.shards import SampleShards, is_sharded
+from src.utils.app_logger import (
+    get_logger,
+    get_queue_logger,
+    start_queue_listener,
+    stop_queue_listener,
+)
 from src.utils.data_loaders import load_df_data
+from src.utils.metrics import MetricsRegistry, get_metrics
+from src.utils.progress import ProgressTracker
+
+# State of a worker process shared by all its tasks
+_worker_state = {}
+
+# Max number of attempts to build a case if workers are lost
+_MAX_CASE_ATTEMPTS = 3
+
+# Period to check workers of the pool
+_POOL_POLL_S = 1.0
+
+# Delay before killing workers which do not respond after the case timeout
+_POOL_KILL_DELAY_S = 10.0
+
+
+def _init_worker(
+    builder: "BasePowerFlowBuilder", template: bytes, queue: Optional[Queue]
+) -> None:
+    """Initialize a worker process.
+
+    With the "fork" start method, arguments are inherited by worker processes
+    without pickling, so the builder data are not copied through pipes.
+
+    Args:
+        builder: Builder with prepared data.
+        template: Serialized base model.
+        queue: Queue for logs.
+    """
+    _worker_state["builder"] = builder
+    _worker_state["template"] = template
+    _worker_state["queue"] = queue
+
+
+def _solve_worker(timestamp: str, path_samples: Optional[str] = None) -> dict:
+    """Solve one power flow case in a worker process.
+
+    Args:
+        timestamp: Datetime of the case.
+        path_samples: Path if it is necessary to save power flow cases.
+
+    Returns:
+        Convergence flags and result arrays for each element type.
+    """
+    builder = _worker_state["builder"]
+    if "model" not in _worker_state:
+        _worker_state["model"] = builder.restore_template(_worker_state["template"])
+        _worker_state["logger"] = builder._get_process_logger(_worker_state["queue"])
+    model, flags = builder._solve_case(
+        _worker_state["model"], timestamp, _worker_state["logger"]
+    )
+    _worker_state["model"] = model
+    if path_samples:
+        builder._save_case(model, path_samples, timestamp)
+    return builder._get_record(model, timestamp, *flags)
+
+
+def _pool_worker(
+    builder: "BasePowerFlowBuilder",
+    template: bytes,
+    connection: Connection,
+    queue: Optional[Queue],
+) -> None:
+    """Solve cases sent by the parent process until the worker is recycled.
+
+    The worker stops after `worker_max_cases` cases or if its resident memory
+    exceeds `worker_max_rss_mb`, so memory accumulated by a long-lived process
+    is released.
+
+    Args:
+        builder: Builder with prepared data.
+        template: Serialized base model.
+        connection: Connection to the parent process. It receives timestamps
+          with paths to save cases and flags if to return results, or None to
+          stop. It sends back the timestamp, convergence flags, solver
+          statistics, resident memory in megabytes, results of the case or
+          None, and if the worker stops after the case.
+        queue: Queue for logs.
+    """
+    model = builder.restore_template(template)
+    logger = builder._get_process_logger(queue)
+    cases_count = 0
+    while True:
+        task = connection.recv()
+        if task is None:
+            break
+        timestamp, path_samples, with_record = task
+        builder.stats = {}
+        model, flags = builder._solve_case(model, timestamp, logger)
+        if path_samples:
+            builder._save_case(model, path_samples, timestamp)
+        record = builder._get_record(model, timestamp, *flags) if with_record else None
+        cases_count += 1
+        rss_mb = _get_rss_mb()
+        is_recycled = (
+            builder.worker_max_cases is not None
+            and cases_count >= builder.worker_max_cases
+        ) or (
+            builder.worker_max_rss_mb is not None and rss_mb > builder.worker_max_rss_mb
+        )
+        connection.send((timestamp, flags, builder.stats, rss_mb, record, is_recycled))
+        if is_recycled:
+            break
+    connection.close()
+
+
+def _get_rss_mb() -> float:
+    """Get resident memory of the current process.
+
+    Returns:
+        Resident memory in megabytes. If the current value is not available,
+          the peak value is returned.
+    """
+    try:
+        with open("/proc/self/statm") as file:
+            pages = int(file.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError, IndexError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 2**10
+
+
+@contextmanager
+def _case_timeout(timeout_s: Optional[float]) -> Iterator[None]:
+    """Raise `TimeoutError` if the block takes longer than the timeout.
+
+    The timer uses signals, so it works only in the main thread of a process.
+    Otherwise, the block is not limited.
+
+    Args:
+        timeout_s: Max wall-clock time in seconds. None means no limit.
+
+    Yields:
+        Nothing.
+    """
+    if timeout_s is None or current_thread() is not main_thread():
+        yield
+        return
+
+    def _raise_timeout(signum: int, frame: Any) -> None:
+        raise TimeoutError
+
+    handler = signal.signal(signal.SIGALRM, _raise_timeout)
+    signal.setitimer(signal.ITIMER_REAL, timeout_s)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, handler)
+
+
+def merge_stats(total: dict, stats: dict) -> None:
+    """Add statistics of solvers to the total ones.
+
+    Args:
+        total: Total statistics in the format of `stats` of the builder. They
+          are updated in place.
+        stats: Statistics to add.
+    """
+    for stage, stage_stats in stats.items():
+        for solver, solver_stats in stage_stats.items():
+            total_solver = total.setdefault(stage, {}).setdefault(solver, {})
+            for key, value in solver_stats.items():
+                total_solver[key] = total_solver.get(key, 0) + value
 
 
 class BasePowerFlowBuilder(ABC):
     """Base class for building power flow cases.
 
+    Args:
+        cache_path: Path to the folder to cache solved cases across runs. Cases
+          are keyed by the hash of their inputs, so identical inputs are solved
+          only once. If None, solved cases are not cached.
+        cache_size_mb: Max total size of cached cases in megabytes.
+        case_timeout_s: Max wall-clock time to build one case. Cases which
+          take longer are aborted and marked as not converged. If None, time
+          is not limited.
+        worker_max_cases: Number of cases after which a worker process is
+          replaced with a new one. If None, workers are not recycled by
+          the number of cases.
+        worker_max_rss_mb: Resident memory of a worker process in megabytes
+          above which it is replaced with a new one. If None, workers are not
+          recycled by memory.
+        shard_period: Period of compressed shards to save cases to: "day" or
+          "month" (see `SampleShards`). If None, each case is saved to a
+          separate file.
+
     Attributes:
+        case_timeout_s: Max wall-clock time to build one case.
+        worker_max_cases: Number of cases after which workers are recycled.
+        worker_max_rss_mb: Resident memory above which workers are recycled.
+        shard_period: Period of shards of saved cases.
         timestamps: List of timestamps loaded with data.
+        stats: Statistics of solvers collected during the last run in the form
+          `{<stage>: {<solver>: {"calls": ..., "converged": ..., "time_s": ...}}}`.
+          Lookups of the case cache are counted in the form
+          `{"cache": {"cases": {"hits": ..., "misses": ..., "time_s": ...}}}`.
     """
 
-    def __init__(self) -> None:
+    def __init__(
+        self,
+        cache_path: Optional[str] = None,
+        cache_size_mb: float = 1024,
+        case_timeout_s: Optional[float] = None,
+        worker_max_cases: Optional[int] = None,
+        worker_max_rss_mb: Optional[float] = None,
+        shard_period: Optional[str] = None,
+    ) -> None:
         """Base class for building power flow cases."""
+        self.case_timeout_s = case_timeout_s
+        self.worker_max_cases = worker_max_cases
+        self.worker_max_rss_mb = worker_max_rss_mb
+        self.shard_period = shard_period
+        self._shards = {}
         self.timestamps = None
+        self.stats = {}
         self._logger = get_logger(__name__)
+        self._cache = None
+        self._template = None
+        if cache_path is not None:
+            self._cache = CaseCache(path=cache_path, max_size_mb=cache_size_mb)
+        self._cache_salt = None
         self._buses = None
         self._branches = None
+        self._branches_ts = None
         self._loads = None
         self._loads_ts = None
         self._gens = None
         self._gens_ts = None
+        self._gens_dispatch_ts = None
+        self._is_prepared = False
 
     def load_data(
         self,
@@ -40,6 +272,8 @@ class BasePowerFlowBuilder(ABC):
         loads_ts: str | pd.DataFrame,
         gens: str | pd.DataFrame,
         gens_ts: str | pd.DataFrame,
+        gens_dispatch_ts: Optional[str | pd.DataFrame] = None,
+        branches_ts: Optional[str | pd.DataFrame] = None,
     ) -> None:
         """Load data for building power flow cases.
 
@@ -50,10 +284,16 @@ class BasePowerFlowBuilder(ABC):
             loads_ts: Path or DataFrame with load time-series data.
             gens: Path or DataFrame with generation data.
             gens_ts: Path or DataFrame with generation time-series data.
+            gens_dispatch_ts: Path or DataFrame with outputs of optimized gens
+              found by economic dispatch (see `dispatching`). They are used as
+              a starting point of OPF.
+            branches_ts: Path or DataFrame with branch time-series data. If
+              None, statuses of branches from branch data are used for all
+              timestamps.
 
         Raises:
-            AssertionError: Error if timestamps of load and gen time-series
-              are different.
+            AssertionError: Error if timestamps of branch, load, and gen
+              time-series are different.
         """
         # Load raw data
         self._buses = load_df_data(
@@ -123,14 +363,38 @@ class BasePowerFlowBuilder(ABC):
                 "min_p_mw": float,
             },
         )
+        self._gens_dispatch_ts = None
+        if gens_dispatch_ts is not None:
+            self._gens_dispatch_ts = load_df_data(
+                data=gens_dispatch_ts,
+                dtypes={"datetime": str, "gen_name": str, "p_mw": float},
+            )
 
-        # Assume datetime ranges in load and gen time-series are equal
+        # Assume datetime ranges in all time-series are equal
         gen_timestamps = np.sort(self._gens_ts["datetime"].unique())
+        if branches_ts is None:
+            branches_ts = pd.DataFrame(
+                {
+                    "datetime": np.repeat(gen_timestamps, len(self._branches)),
+                    "branch_name": np.tile(
+                        self._branches["branch_name"].values, len(gen_timestamps)
+                    ),
+                    "in_service": np.tile(
+                        self._branches["in_service"].values, len(gen_timestamps)
+                    ),
+                }
+            )
+        self._branches_ts = load_df_data(
+            data=branches_ts,
+            dtypes={"datetime": str, "branch_name": str, "in_service": bool},
+        )
         load_timestamps = np.sort(self._loads_ts["datetime"].unique())
-        assert np.array_equal(
-            gen_timestamps, load_timestamps
+        branch_timestamps = np.sort(self._branches_ts["datetime"].unique())
+        assert np.array_equal(gen_timestamps, load_timestamps) and np.array_equal(
+            gen_timestamps, branch_timestamps
         ), "Time-series data have different date ranges"
         self.timestamps = gen_timestamps
+        self._is_prepared = False
 
     def run(
         self,
@@ -138,6 +402,9 @@ class BasePowerFlowBuilder(ABC):
         path_sample: Optional[str] = None,
         display: bool = False,
         workers: int = 1,
+        stream: bool = False,
+        max_pending: Optional[int] = None,
+        collectors: Optional[list[Any]] = None,
     ) -> Optional[Any]:
         """Run the building process.
 
@@ -146,49 +413,128 @@ class BasePowerFlowBuilder(ABC):
             path_sample: Path if it is necessary to save power flow cases.
             display: If to show a progress bar.
             workers: Number of workers to use.
+            stream: If to return an iterator over results of cases.
+            max_pending: Max number of solved cases waiting to be consumed
+              in the stream mode. Defaults to twice the number of workers.
+            collectors: Objects with the `update` method called with results
+              of each case (see `_get_record`), e.g. running statistics or the
+              results index, so cases do not have to be saved. Not used in the
+              stream mode, where results are returned to the caller.
 
         Returns:
             Power flow cases corresponding to the timestamp of the provided data.
+              In the stream mode, iterator over results of cases in the order
+              of completion (see `_get_record`).
         """
         # If one timestamp or one worker
-        timestamps = self.timestamps if timestamp is None else timestamp
-        timestamps = [timestamps] if isinstance(timestamps, str) else timestamps
-        if len(timestamps) > 1 and (path_sample is None):
-            self._logger.warning(
-                "Samples will not be saved because `path_sample` is `None`."
-            )
-        workers_count = workers if workers > 0 else os.cpu_count()
-        workers_count = min([workers_count, len(timestamps), os.cpu_count()])
-        if workers != workers_count:
-            self._logger.warning(
-                f"The number of workers was changed to {workers_count}."
+        timestamps = self._get_timestamps(timestamp)
+        if len(timestamps) > 1 and (path_sample is None) and not stream:
+            if not collectors:
+                self._logger.warning(
+                    "Samples will not be saved because `path_sample` is `None`."
+                )
+        workers_count = self._get_workers_count(workers, len(timestamps))
+        self._ensure_prepared()
+        self.stats = {}
+        if stream:
+            return self._stream(
+                timestamps=timestamps,
+                path_samples=path_sample,
+                display=display,
+                workers_count=workers_count,
+                max_pending=max_pending or 2 * workers_count,
             )
-        self._prepare_data()
         if workers_count == 1:
-            return self._run(
-                timestamps=timestamps, display=display, path_samples=path_sample
+            model = self._run(
+                timestamps=timestamps,
+                display=display,
+                path_samples=path_sample,
+                collectors=collectors,
             )
+            self._log_stats()
+            return model
 
         # Thread to capture logs
-        manager = Manager()
-        log_queue = manager.Queue(-1)
-        log_thread = Thread(target=queue_listener, args=(__name__, log_queue))
-        log_thread.start()
-
-        # Start processes
-        # Show progress bar only for the last worker
-        args = []
-        for worker_id, time_samples in enumerate(
-            np.array_split(timestamps, workers_count)
-        ):
-            to_display = display * (worker_id + 1 == workers_count)
-            args.append((time_samples.tolist(), path_sample, to_display, log_queue))
-        with Pool(workers_count) as pool:
-            pool.starmap(self._run, args)
+        log_queue, log_thread = start_queue_listener(__name__)
+
+        # Build the base model once and share it with workers
+        template = self.create_template()
+        self._run_pool(
+            timestamps=timestamps,
+            path_samples=path_sample,
+            display=display,
+            workers_count=workers_count,
+            template=template,
+            queue=log_queue,
+            collectors=collectors,
+        )
 
         # Finish logging thread
-        log_queue.put_nowait(None)
-        log_thread.join()
+        stop_queue_listener(log_queue, log_thread)
+        self._log_stats()
+
+    async def arun(
+        self,
+        timestamp: Optional[str | list[str]] = None,
+        workers: int = 1,
+        ordered: bool = False,
+        max_pending: Optional[int] = None,
+    ) -> AsyncIterator[dict]:
+        """Run the building process asynchronously yielding results of cases.
+
+        Cases are solved in a pool of worker processes, so the event loop is not
+        blocked. If the iteration is stopped or the consuming task is cancelled,
+        cases which are not started yet are cancelled.
+
+        Args:
+            timestamp: Timestamps of power flow cases to calculate.
+            workers: Number of workers to use.
+            ordered: If to yield results in the order of timestamps. Otherwise,
+              results are yielded in the order of completion.
+            max_pending: Max number of submitted cases which results are not
+              yielded yet. It also bounds the buffer to reorder results.
+              Defaults to twice the number of workers.
+
+        Yields:
+            Convergence flags and result arrays for each element type
+              (see `_get_record`).
+        """
+        timestamps = self._get_timestamps(timestamp)
+        workers_count = self._get_workers_count(workers, len(timestamps))
+        max_pending = max_pending or 2 * workers_count
+        template = self.create_template()
+
+        # Submit new cases only when results are consumed
+        loop = asyncio.get_running_loop()
+        executor = ProcessPoolExecutor(
+            workers_count, initializer=_init_worker, initargs=(self, template, None)
+        )
+        samples = iter(timestamps)
+        pending = deque()
+        try:
+            while True:
+                while len(pending) < max_pending:
+                    time_sample = next(samples, None)
+                    if time_sample is None:
+                        break
+                    pending.append(
+                        loop.run_in_executor(executor, _solve_worker, time_sample)
+                    )
+                if not pending:
+                    break
+                if ordered:
+                    yield await pending.popleft()
+                else:
+                    done, _ = await asyncio.wait(
+                        pending, return_when=asyncio.FIRST_COMPLETED
+                    )
+                    for future in done:
+                        pending.remove(future)
+                        yield future.result()
+        finally:
+            for future in pending:
+                future.cancel()
+            executor.shutdown(wait=False, cancel_futures=True)
 
     def _run(
         self,
@@ -196,6 +542,8 @@ class BasePowerFlowBuilder(ABC):
         path_samples: Optional[str] = None,
         display: bool = False,
         queue: Optional[Queue] = None,
+        template: Optional[bytes | str] = None,
+        collectors: Optional[list[Any]] = None,
     ) -> Optional[Any]:
         """Run the building process.
 
@@ -204,47 +552,691 @@ class BasePowerFlowBuilder(ABC):
             path_samples: Path if it is necessary to save power flow cases.
             display: If to show a progress bar.
             queue: Queue for logs.
+            template: Serialized base model or path to it.
+            collectors: Objects updated with results of each case.
 
         Returns:
             Power flow cases corresponding to the timestamp of the provided data.
         """
         # Create base model
-        model = self._build_base_model()
-
-        # Prepare logger
-        if queue is None:
-            logger = self._logger
+        if template is None:
+            model = self._build_base_model()
         else:
-            proc_name = current_process().name.lower()
-            logger_name = f"{__name__}.{proc_name}"
-            logger = get_queue_logger(logger_name, queue)
+            model = self.restore_template(template)
+        logger = self._get_process_logger(queue)
 
         # Timestamps are equal for all time-series data
         to_return = (len(timestamps) == 1) and (path_samples is None)
-        for time_sample in tqdm(timestamps, disable=not display):
-
-            # Refresh sample data in accordance to the current datetime
-            self._apply_next_timestamp(model, time_sample)
-
-            # Calculate power flows
-            is_opf_converged = self._calculate_opf(model)
-            if is_opf_converged:
-                is_pf_converged = self._calculate_power_flow(model)
-                if not is_pf_converged:
-                    logger.info(
-                        f"Power flow estimation at {time_sample}" f" did not converge."
-                    )
-            else:
-                logger.info(f"OPF estimation at {time_sample} did not converge.")
+        progress = ProgressTracker(len(timestamps), display, logger)
+        metrics = get_metrics()
+        for time_sample in timestamps:
+            start = time.perf_counter()
+            stats, self.stats = self.stats, {}
+            model, flags = self._solve_case(model, time_sample, logger)
 
             # Save created case
             if path_samples:
-                sample_name = datetime.strptime(time_sample, DATE_FORMAT).strftime(
-                    SAMPLE_NAME_FORMAT
+                self._save_case(model, path_samples, time_sample)
+            if collectors:
+                record = self._get_record(model, time_sample, *flags)
+                for collector in collectors:
+                    collector.update(record)
+            progress.update(failed=not flags[1])
+            if metrics is not None:
+                self._observe_case(
+                    metrics, flags, time.perf_counter() - start, _get_rss_mb()
                 )
-                self._save_sample(model, path=path_samples, sample_name=sample_name)
+            stats, self.stats = self.stats, stats
+            self._merge_stats(stats)
+        progress.close()
+        if metrics is not None:
+            metrics.flush(force=True)
         return model if to_return else None
 
+    def _run_pool(
+        self,
+        timestamps: list[str],
+        path_samples: Optional[str],
+        display: bool,
+        workers_count: int,
+        template: bytes,
+        queue: Queue,
+        collectors: Optional[list[Any]] = None,
+    ) -> None:
+        """Solve cases in worker processes which take timestamps one by one.
+
+        Workers are replaced with new ones when they are recycled or lost.
+        Cases of lost workers are assigned to other workers, and a worker which
+        does not respond long after the case timeout is killed.
+
+        Args:
+            timestamps: Timestamps of power flow cases to calculate.
+            path_samples: Path if it is necessary to save power flow cases.
+            display: If to show a progress bar.
+            workers_count: Number of workers to use.
+            template: Serialized base model.
+            queue: Queue for logs.
+            collectors: Objects updated with results of each case. Workers
+              send results to the parent process, which updates them.
+        """
+        remaining = deque(timestamps)
+        attempts = {}
+        workers = {}
+        recycled_count, reassigned_count = 0, 0
+        progress = ProgressTracker(len(timestamps), display, self._logger)
+        metrics = get_metrics()
+
+        def start_worker() -> None:
+            connection, child_connection = Pipe()
+            process = Process(
+                target=_pool_worker,
+                args=(self, template, child_connection, queue),
+                daemon=True,
+            )
+            process.start()
+            child_connection.close()
+            workers[connection] = [process, None, 0.0]
+            assign_case(connection)
+
+        def assign_case(connection: Connection) -> None:
+            if not remaining:
+                connection.send(None)
+                workers[connection][1] = None
+                return
+            timestamp = remaining.popleft()
+            attempts[timestamp] = attempts.get(timestamp, 0) + 1
+            connection.send((timestamp, path_samples, bool(collectors)))
+            workers[connection][1:] = [timestamp, time.monotonic()]
+
+        try:
+            for _ in range(workers_count):
+                start_worker()
+            while any(worker[1] is not None for worker in workers.values()):
+                for connection in wait(list(workers), timeout=_POOL_POLL_S):
+                    process, timestamp, start = workers[connection]
+                    try:
+                        message = connection.recv()
+                    except (EOFError, OSError):
+                        # The worker is lost, so its case is assigned again
+                        if metrics is not None:
+                            metrics.remove(
+                                "power_flow_worker_rss_bytes", worker=str(process.pid)
+                            )
+                        del workers[connection]
+                        connection.close()
+                        process.join()
+                        if timestamp is not None:
+                            if attempts[timestamp] < _MAX_CASE_ATTEMPTS:
+                                reassigned_count += 1
+                                remaining.appendleft(timestamp)
+                            else:
+                                self._logger.error(
+                                    f"Case at {timestamp} was not built after "
+                                    f"{attempts[timestamp]} attempts."
+                                )
+                                progress.update(failed=1)
+                        if remaining:
+                            start_worker()
+                        continue
+                    _, flags, stats, rss_mb, record, is_recycled = message
+                    self._merge_stats(stats)
+                    for collector in collectors or []:
+                        collector.update(record)
+                    progress.update(failed=not flags[1])
+                    if metrics is not None:
+                        self._observe_case(
+                            metrics,
+                            flags,
+                            time.monotonic() - start,
+                            rss_mb,
+                            stats,
+                            str(process.pid),
+                        )
+                    if is_recycled:
+                        if metrics is not None:
+                            metrics.remove(
+                                "power_flow_worker_rss_bytes", worker=str(process.pid)
+                            )
+                        recycled_count += 1
+                        del workers[connection]
+                        connection.close()
+                        process.join()
+                        if remaining:
+                            start_worker()
+                    else:
+                        assign_case(connection)
+
+                if metrics is not None:
+                    metrics.set("power_flow_queue_cases", len(remaining))
+                    metrics.set("power_flow_workers", len(workers))
+                    metrics.flush()
+
+                # Kill workers stuck in code which is not interrupted by timers
+                if self.case_timeout_s is not None:
+                    deadline = 2 * self.case_timeout_s + _POOL_KILL_DELAY_S
+                    now = time.monotonic()
+                    for process, timestamp, start in workers.values():
+                        if timestamp is not None and now - start > deadline:
+                            process.kill()
+        finally:
+            progress.close()
+            for connection, (process, _, _) in workers.items():
+                process.join(timeout=_POOL_KILL_DELAY_S)
+                if process.is_alive():
+                    process.kill()
+                connection.close()
+                if metrics is not None:
+                    metrics.remove(
+                        "power_flow_worker_rss_bytes", worker=str(process.pid)
+                    )
+            if metrics is not None:
+                metrics.set("power_flow_queue_cases", 0)
+                metrics.set("power_flow_workers", 0)
+                metrics.flush(force=True)
+        self._logger.info(
+            f"{recycled_count} workers were recycled, {reassigned_count} cases "
+            "of lost workers were assigned again."
+        )
+
+    def _stream(
+        self,
+        timestamps: list[str],
+        path_samples: Optional[str],
+        display: bool,
+        workers_count: int,
+        max_pending: int,
+    ) -> Iterator[dict]:
+        """Yield results of cases as soon as they are solved.
+
+        Args:
+            timestamps: Timestamps of power flow cases to calculate.
+            path_samples: Path if it is necessary to save power flow cases.
+            display: If to show a progress bar.
+            workers_count: Number of workers to use.
+            max_pending: Max number of submitted cases which results are not
+              consumed yet.
+
+        Yields:
+            Convergence flags and result arrays for each element type.
+        """
+        if workers_count == 1:
+            model = self._build_base_model()
+            progress = ProgressTracker(len(timestamps), display, self._logger)
+            try:
+                for time_sample in timestamps:
+                    model, flags = self._solve_case(model, time_sample, self._logger)
+                    if path_samples:
+                        self._save_case(model, path_samples, time_sample)
+                    progress.update(failed=not flags[1])
+                    yield self._get_record(model, time_sample, *flags)
+            finally:
+                progress.close()
+            return
+
+        # Thread to capture logs
+        log_queue, log_thread = start_queue_listener(__name__)
+
+        # Results are put to the queue by the result handler thread of the pool
+        results = SimpleQueue()
+        pool = Pool(
+            workers_count,
+            initializer=_init_worker,
+            initargs=(self, self.create_template(), log_queue),
+        )
+        progress = ProgressTracker(len(timestamps), display, self._logger)
+        samples = iter(timestamps)
+        pending = 0
+        try:
+            while True:
+                while pending < max_pending:
+                    time_sample = next(samples, None)
+                    if time_sample is None:
+                        break
+                    pool.apply_async(
+                        _solve_worker,
+                        (time_sample, path_samples),
+                        callback=results.put,
+                        error_callback=results.put,
+                    )
+                    pending += 1
+                if pending == 0:
+                    break
+                result = results.get()
+                pending -= 1
+                if isinstance(result, BaseException):
+                    raise result
+                progress.update(failed=not result["is_pf_converged"])
+                yield result
+        finally:
+            progress.close()
+            pool.terminate()
+            pool.join()
+            stop_queue_listener(log_queue, log_thread)
+
+    def create_template(self, path: Optional[str] = None) -> Optional[bytes]:
+        """Build the base model and serialize it to restore in other processes.
+
+        Args:
+            path: Path to save the serialized model.
+
+        Returns:
+            Serialized model or None if `path` is passed and the model was saved.
+        """
+        self._ensure_prepared()
+        template = pickle.dumps(
+            self._build_base_model(), protocol=pickle.HIGHEST_PROTOCOL
+        )
+        if path:
+            with open(path, "wb") as file:
+                file.write(template)
+        else:
+            return template
+
+    def restore_template(self, template: bytes | str) -> Any:
+        """Restore the base model serialized by `create_template`.
+
+        The template is kept to restore the model again if a case is aborted.
+        Each process unpickles its own copy of the model, so memory of models
+        is not shared between processes.
+
+        Args:
+            template: Serialized model or path to it. The file is read through
+              a memory map without copying it to a buffer first.
+
+        Returns:
+            Model with predefined parameters.
+        """
+        self._template = template
+        if isinstance(template, bytes):
+            return pickle.loads(template)
+        with open(template, "rb") as file:
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+                return pickle.loads(buffer)
+
+    def _get_timestamps(self, timestamp: Optional[str | list[str]]) -> list[str]:
+        """Get the list of timestamps to calculate.
+
+        Args:
+            timestamp: Timestamps of power flow cases or None to take all of them.
+
+        Returns:
+            List of timestamps.
+        """
+        timestamps = self.timestamps if timestamp is None else timestamp
+        return [timestamps] if isinstance(timestamps, str) else list(timestamps)
+
+    def _get_workers_count(self, workers: int, timestamps_count: int) -> int:
+        """Limit the number of workers by the number of CPUs and timestamps.
+
+        Args:
+            workers: Number of workers requested. All CPUs are used if it is
+              not positive.
+            timestamps_count: Number of timestamps to calculate.
+
+        Returns:
+            Number of workers to use.
+        """
+        workers_count = workers if workers > 0 else os.cpu_count()
+        workers_count = min([workers_count, timestamps_count, os.cpu_count()])
+        if workers != workers_count:
+            self._logger.warning(
+                f"The number of workers was changed to {workers_count}."
+            )
+        return workers_count
+
+    def _get_process_logger(self, queue: Optional[Queue]) -> logging.Logger:
+        """Get logger for the current process.
+
+        Args:
+            queue: Queue for logs if the process is a worker.
+
+        Returns:
+            Logger.
+        """
+        if queue is None:
+            return self._logger
+        proc_name = current_process().name.lower()
+        return get_queue_logger(f"{__name__}.{proc_name}", queue)
+
+    def _save_case(self, model: Any, path: str, timestamp: str) -> None:
+        """Save the power flow case with the name composed from its timestamp.
+
+        Args:
+            model: Power system model.
+            path: Path to save the sample.
+            timestamp: Datetime of the case.
+        """
+        if self.shard_period is not None:
+            shards = self._get_shards(path)
+            shards.put(timestamp, self._serialize_sample(model))
+            return
+        sample_name = self._get_sample_name(timestamp)
+        self._save_sample(model, path=path, sample_name=sample_name)
+
+    def _load_case(self, path: str, timestamp: str) -> Any:
+        """Load the power flow case saved by `_save_case`.
+
+        Args:
+            path: Path to saved samples.
+            timestamp: Datetime of the case.
+
+        Returns:
+            Power system model.
+        """
+        if is_sharded(path):
+            return self._deserialize_sample(self._get_shards(path).get(timestamp))
+        sample_name = self._get_sample_name(timestamp)
+        return self._load_sample(path=path, sample_name=sample_name)
+
+    def _get_saved_timestamps(self, path: str) -> list[str]:
+        """Get timestamps of cases saved by `_save_case`.
+
+        Args:
+            path: Path to saved samples.
+
+        Returns:
+            Timestamps of saved cases in the order of timestamps of the builder.
+        """
+        if is_sharded(path):
+            saved = set(self._get_shards(path).timestamps)
+            return [timestamp for timestamp in self.timestamps if timestamp in saved]
+        sample_names = {os.path.splitext(file)[0] for file in os.listdir(path)}
+        return [
+            timestamp
+            for timestamp in self.timestamps
+            if self._get_sample_name(timestamp) in sample_names
+        ]
+
+    def _get_shards(self, path: str) -> SampleShards:
+        """Get shards of saved cases, their indexes are read only once.
+
+        Args:
+            path: Path to saved samples.
+
+        Returns:
+            Shards of the folder.
+        """
+        shards = self._shards.get(path)
+        if shards is None:
+            shards = SampleShards(path, period=self.shard_period or "month")
+            self._shards[path] = shards
+        return shards
+
+    @staticmethod
+    def _get_sample_name(timestamp: str) -> str:
+        """Compose the sample name from the timestamp of the case.
+
+        Args:
+            timestamp: Datetime of the case.
+
+        Returns:
+            Sample name without extension.
+        """
+        return datetime.strptime(timestamp, DATE_FORMAT).strftime(SAMPLE_NAME_FORMAT)
+
+    def _solve_case(
+        self,
+        model: Any,
+        timestamp: str,
+        logger: logging.Logger,
+        overrides: Optional[dict] = None,
+    ) -> tuple[Any, tuple[bool, bool]]:
+        """Build the power flow case within the case timeout.
+
+        If the timeout is exceeded, the case is aborted and marked as not
+        converged. The model can be left in an inconsistent state, so it is
+        restored from the template (or built if no template was restored) with
+        data of the timestamp.
+
+        Args:
+            model: Power system model.
+            timestamp: Current datetime.
+            logger: Logger to report convergence issues.
+            overrides: Custom values of load and gen variables (see
+              `_apply_overrides`).
+
+        Returns:
+            Model with the case and flags whether OPF and power flow
+              estimations converged.
+        """
+        start = time.perf_counter()
+        try:
+            with _case_timeout(self.case_timeout_s):
+                flags = self._process_timestamp(model, timestamp, logger, overrides)
+                return model, flags
+        except TimeoutError:
+            logger.warning(
+                f"Case at {timestamp} was aborted after {self.case_timeout_s} s."
+            )
+            self._record_stats("case", "timeout", False, time.perf_counter() - start)
+            if self._template is None:
+                model = self._build_base_model()
+            else:
+                model = self.restore_template(self._template)
+            self._apply_next_timestamp(model, timestamp)
+            if overrides:
+                self._apply_overrides(model, overrides)
+            return model, (False, False)
+
+    def _process_timestamp(
+        self,
+        model: Any,
+        timestamp: str,
+        logger: logging.Logger,
+        overrides: Optional[dict] = None,
+    ) -> tuple[bool, bool]:
+        """Build the power flow case for one timestamp.
+
+        Args:
+            model: Power system model.
+            timestamp: Current datetime.
+            logger: Logger to report convergence issues.
+            overrides: Custom values of load and gen variables (see
+              `_apply_overrides`).
+
+        Returns:
+            Flags whether OPF and power flow estimations converged.
+        """
+        # Refresh sample data in accordance to the current datetime
+        self._apply_next_timestamp(model, timestamp)
+        if overrides:
+            self._apply_overrides(model, overrides)
+
+        # Take results from the cache if the same inputs were already solved
+        key = None
+        if self._cache is not None:
+            start = time.perf_counter()
+            key = self._get_case_key(model)
+            cached = self._cache.get(key)
+            self._record_cache_stats(cached is not None, time.perf_counter() - start)
+            if cached is not None:
+                state, is_opf_converged, is_pf_converged = cached
+                self._set_solved_state(model, state)
+                return is_opf_converged, is_pf_converged
+
+        # Calculate power flows
+        is_pf_converged = False
+        is_opf_converged = self._calculate_opf(model)
+        if is_opf_converged:
+            is_pf_converged = self._calculate_power_flow(model)
+            if not is_pf_converged:
+                logger.info(f"Power flow estimation at {timestamp} did not converge.")
+        else:
+            logger.info(f"OPF estimation at {timestamp} did not converge.")
+        if key is not None:
+            state = self._get_solved_state(model)
+            self._cache.put(key, (state, is_opf_converged, is_pf_converged))
+        return is_opf_converged, is_pf_converged
+
+    def _get_case_key(self, model: Any) -> str:
+        """Calculate the hash of inputs of the power flow case.
+
+        Inputs of the case are mixed with the hash of static data, settings,
+        and code of the builder, so cached cases are not reused if they change.
+
+        Args:
+            model: Power system model with data of the case.
+
+        Returns:
+            Hex digest of the hash.
+        """
+        if self._cache_salt is None:
+            digest = hashlib.sha256()
+            for table in [self._buses, self._branches, self._loads, self._gens]:
+                digest.update(table.to_csv(index=False).encode("utf-8"))
+            digest.update(repr(self._get_settings()).encode("utf-8"))
+            for cls in type(self).__mro__:
+                if cls.__module__.startswith("src."):
+                    digest.update(inspect.getsource(inspect.getmodule(cls)).encode())
+            self._cache_salt = digest.digest()
+        digest = hashlib.sha256(self._cache_salt)
+        for values in self._get_case_inputs(model):
+            digest.update(np.ascontiguousarray(values, dtype=float).tobytes())
+        return digest.hexdigest()
+
+    def _record_cache_stats(self, is_hit: bool, time_s: float) -> None:
+        """Add a lookup of the case cache to the statistics.
+
+        Args:
+            is_hit: If the case was found in the cache.
+            time_s: Time spent on the lookup.
+        """
+        cache_stats = self.stats.setdefault("cache", {}).setdefault(
+            "cases", {"hits": 0, "misses": 0, "time_s": 0.0}
+        )
+        cache_stats["hits" if is_hit else "misses"] += 1
+        cache_stats["time_s"] += time_s
+
+    def _record_stats(
+        self,
+        stage: str,
+        solver: str,
+        is_converged: bool,
+        time_s: float,
+        iterations: Optional[int] = None,
+    ) -> None:
+        """Add a solver call to the statistics.
+
+        Args:
+            stage: Calculation stage, e.g. "power_flow".
+            solver: Name of the solver tier.
+            is_converged: If the solver converged.
+            time_s: Time spent by the solver.
+            iterations: Number of iterations of the solver if it is known.
+        """
+        solver_stats = self.stats.setdefault(stage, {}).setdefault(
+            solver, {"calls": 0, "converged": 0, "time_s": 0.0}
+        )
+        solver_stats["calls"] += 1
+        solver_stats["converged"] += int(is_converged)
+        solver_stats["time_s"] += time_s
+        if iterations is not None:
+            solver_stats["iterations"] = solver_stats.get("iterations", 0) + iterations
+
+    def _merge_stats(self, stats: dict) -> None:
+        """Add statistics collected by another process.
+
+        Args:
+            stats: Statistics in the format of the `stats` attribute.
+        """
+        merge_stats(self.stats, stats)
+
+    def _observe_case(
+        self,
+        metrics: MetricsRegistry,
+        flags: tuple[bool, bool],
+        time_s: float,
+        rss_mb: float,
+        stats: Optional[dict] = None,
+        worker: Optional[str] = None,
+    ) -> None:
+        """Add results of one case to exported metrics.
+
+        Args:
+            metrics: Registry of metrics.
+            flags: Flags whether OPF and power flow converged.
+            time_s: Wall-clock time to build the case.
+            rss_mb: Resident memory of the process which built the case.
+            stats: Statistics of solvers of the case. Defaults to `stats`.
+            worker: Name of the worker process. Defaults to the current one.
+        """
+        status = "solved" if flags[1] else "failed"
+        metrics.inc("power_flow_cases_total", status=status)
+        metrics.observe("power_flow_case_seconds", time_s)
+        metrics.observe_stats(self.stats if stats is None else stats)
+        metrics.set(
+            "power_flow_worker_rss_bytes",
+            rss_mb * 2**20,
+            worker=worker or str(os.getpid()),
+        )
+
+    def _log_stats(self) -> None:
+        """Report statistics of solvers.
+
+        The first solver of each stage is called for every case, and other
+        solvers are called only if previous ones failed.
+        """
+        cache_stats = self.stats.get("cache", {}).get("cases")
+        if cache_stats:
+            lookups = cache_stats["hits"] + cache_stats["misses"]
+            self._logger.info(
+                f"Case cache: {cache_stats['hits']} hits, "
+                f"{cache_stats['misses']} misses, "
+                f"{100 * cache_stats['hits'] / lookups:.1f}% hit ratio, "
+                f"{1e3 * cache_stats['time_s'] / lookups:.1f} ms per lookup."
+            )
+        for stage, stage_stats in self.stats.items():
+            if stage == "cache":
+                continue
+            for solver, solver_stats in stage_stats.items():
+                calls = solver_stats["calls"]
+                self._logger.info(
+                    f"Solver {solver} at the {stage} stage: {calls} calls, "
+                    f"{solver_stats['converged']} converged, "
+                    f"{1e3 * solver_stats['time_s'] / calls:.1f} ms per call."
+                )
+            solvers_stats = list(stage_stats.values())
+            failed = solvers_stats[0]["calls"] - sum(
+                solver_stats["converged"] for solver_stats in solvers_stats
+            )
+            retry_time_s = sum(solver_stats["time_s"] for solver_stats in solvers_stats)
+            retry_time_s -= solvers_stats[0]["time_s"]
+            self._logger.info(
+                f"At the {stage} stage, {failed} cases failed, "
+                f"{retry_time_s:.1f} s were spent on retries."
+            )
+
+    def _get_record(
+        self,
+        model: Any,
+        timestamp: str,
+        is_opf_converged: bool,
+        is_pf_converged: bool,
+    ) -> dict:
+        """Compose a record with results of the power flow case.
+
+        Args:
+            model: Power system model.
+            timestamp: Datetime of the case.
+            is_opf_converged: Whether OPF estimation converged.
+            is_pf_converged: Whether power flow estimation converged.
+
+        Returns:
+            Convergence flags and result arrays for each element type.
+        """
+        return {
+            "timestamp": timestamp,
+            "is_opf_converged": is_opf_converged,
+            "is_pf_converged": is_pf_converged,
+            **self._get_results(model),
+        }
+
+    def _ensure_prepared(self) -> None:
+        """Prepare loaded data only once since preparation is expensive."""
+        if not self._is_prepared:
+            self._prepare_data()
+            self._is_prepared = True
+
     @abstractmethod
     def _build_base_model(self) -> Any:
         """Create power flow model.
@@ -265,6 +1257,68 @@ class BasePowerFlowBuilder(ABC):
         """
         raise NotImplementedError
 
+    @abstractmethod
+    def _load_sample(self, path: str, sample_name: str) -> Any:
+        """Load sample saved by `_save_sample`.
+
+        Args:
+            path: Path to the saved sample.
+            sample_name: Sample name.
+
+        Returns:
+            Power system model.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def _serialize_sample(self, model: Any) -> bytes:
+        """Serialize the sample in the format of `_save_sample`.
+
+        Args:
+            model: Power system model.
+
+        Returns:
+            Serialized sample.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def _deserialize_sample(self, data: bytes) -> Any:
+        """Restore the sample serialized by `_serialize_sample`.
+
+        Args:
+            data: Serialized sample.
+
+        Returns:
+            Power system model.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def _get_branch_status(self, model: Any) -> np.ndarray:
+        """Get current statuses of branches.
+
+        Args:
+            model: Power system model.
+
+        Returns:
+            Statuses in the order of branch names.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def _set_branch_in_service(
+        self, model: Any, branch_id: int, in_service: bool
+    ) -> None:
+        """Change status of the branch.
+
+        Args:
+            model: Power system model.
+            branch_id: Position of the branch in the order of branch names.
+            in_service: New status of the branch.
+        """
+        raise NotImplementedError
+
     @abstractmethod
     def _apply_next_timestamp(self, model: Any, timestamp: str) -> None:
         """Refresh data in accordance to the timestamp.
@@ -275,6 +1329,83 @@ class BasePowerFlowBuilder(ABC):
         """
         raise NotImplementedError
 
+    @abstractmethod
+    def _apply_overrides(self, model: Any, overrides: dict) -> None:
+        """Replace data of the current timestamp with custom values.
+
+        Args:
+            model: Power system model.
+            overrides: Values of load and gen variables by element names, e.g.
+              `{"loads": {"load_001": {"p_mw": 10}}, "gens": {"wind_001": {...}}}`.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def _get_settings(self) -> dict:
+        """Get settings of the builder which affect results of cases.
+
+        Returns:
+            Values of settings by names.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def _get_case_inputs(self, model: Any) -> list[np.ndarray]:
+        """Get inputs of the power flow case which define its results.
+
+        Args:
+            model: Power system model with data of the case.
+
+        Returns:
+            Arrays of input values.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def _get_solved_state(self, model: Any) -> Any:
+        """Get the part of the solved model which is changed by calculations.
+
+        Args:
+            model: Solved power system model.
+
+        Returns:
+            Picklable state to restore by `_set_solved_state`.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def _set_solved_state(self, model: Any, state: Any) -> None:
+        """Restore results of calculations saved by `_get_solved_state`.
+
+        Args:
+            model: Power system model with data of the same case.
+            state: Saved state.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def _get_results(self, model: Any) -> dict[str, dict[str, np.ndarray]]:
+        """Extract main results of the power flow case.
+
+        Args:
+            model: Power system model.
+
+        Returns:
+            Arrays of result variables for each element type. Elements are ordered
+              as names returned by `_get_element_names`. Values are NaNs if
+              the case did not converge.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def _get_element_names(self) -> dict[str, list[str]]:
+        """Get names of elements in the order used in results.
+
+        Returns:
+            Element names for each element type.
+        """
+        raise NotImplementedError
+
     @abstractmethod
     def _calculate_power_flow(self, model: Any) -> bool:
         """Calculate power flows.
@@ -1,11 +1,14 @@
 import logging
 import math
 import os
+import time
 import warnings
+from typing import Optional
 
 import numpy as np
 import pandapower as pp
 import pandas as pd
+import scipy
 from pandapower import LoadflowNotConverged, OPFNotConverged
 
 from src.power_flow.builders.base import BasePowerFlowBuilder
@@ -21,22 +24,75 @@ class PandaPowerFlowBuilder(BasePowerFlowBuilder):
     Args:
         s_base_mva: Base power.
         f_hz: Power system frequency.
+        power_flow_solvers: Power flow solvers to try in order until one
+          converges in the format `[(<algorithm>, <init>), ...]` (see
+          `pandapower.runpp`). Defaults to Newton-Raphson with flat start.
+        opf_strategies: OPF strategies to try in order until one converges
+          (see `_run_opf_strategy`). Defaults to AC OPF with flat start.
+        opf_voltage_relaxation_pu: Extension of bus voltage limits used by
+          the "relaxed_voltage" strategy.
+        cache_path: Path to the folder to cache solved cases across runs. If
+          None, solved cases are not cached.
+        cache_size_mb: Max total size of cached cases in megabytes.
+        case_timeout_s: Max wall-clock time to build one case. If None, time
+          is not limited.
+        worker_max_cases: Number of cases after which a worker process is
+          replaced with a new one. If None, the number is not limited.
+        worker_max_rss_mb: Resident memory of a worker process in megabytes
+          above which it is replaced with a new one. If None, memory is not
+          limited.
+        shard_period: Period of compressed shards to save cases to: "day" or
+          "month". If None, each case is saved to a separate file.
 
     Attributes:
         s_base_mva: Base power of the system.
         f_hz: System frequency.
+        power_flow_solvers: Power flow solvers to try in order.
+        opf_strategies: OPF strategies to try in order.
+        opf_voltage_relaxation_pu: Extension of bus voltage limits used by
+          the "relaxed_voltage" strategy.
     """
 
-    def __init__(self, s_base_mva: float, f_hz: float) -> None:
+    def __init__(
+        self,
+        s_base_mva: float,
+        f_hz: float,
+        power_flow_solvers: Optional[list[tuple[str, str]]] = None,
+        opf_strategies: Optional[list[str]] = None,
+        opf_voltage_relaxation_pu: float = 0.02,
+        cache_path: Optional[str] = None,
+        cache_size_mb: float = 1024,
+        case_timeout_s: Optional[float] = None,
+        worker_max_cases: Optional[int] = None,
+        worker_max_rss_mb: Optional[float] = None,
+        shard_period: Optional[str] = None,
+    ) -> None:
         """Class for creating power flow cases using PandaPower."""
-        super().__init__()
+        super().__init__(
+            cache_path=cache_path,
+            cache_size_mb=cache_size_mb,
+            case_timeout_s=case_timeout_s,
+            worker_max_cases=worker_max_cases,
+            worker_max_rss_mb=worker_max_rss_mb,
+            shard_period=shard_period,
+        )
         self.s_base_mva = s_base_mva
         self.f_hz = f_hz
+        self.power_flow_solvers = power_flow_solvers or [("nr", "flat")]
+        self.opf_strategies = opf_strategies or ["flat"]
+        self.opf_voltage_relaxation_pu = opf_voltage_relaxation_pu
         self._bus_name_to_id = None
         self._bus_name_to_v_rated = None
         self._slack_bus = None
         self._slack_bus_id = None
+        self._load_name_to_id = None
+        self._gen_name_to_id = None
+        self._is_line = None
+        self._branch_id_to_element_id = None
         self._gen_slice = None
+        self._timestamp = None
+        self._previous_timestamps = None
+        self._warm_start = None
         self._load_vars = ["in_service", "p_mw", "q_mvar"]
         self._gen_vars_model = [
             "in_service",
@@ -76,10 +132,27 @@ class PandaPowerFlowBuilder(BasePowerFlowBuilder):
             self._bus_name_to_id
         )
         self._branches["to_bus_id"] = self._branches["to_bus"].map(self._bus_name_to_id)
+        self._is_line = self._branches["trafo_ratio_rel"].isna().values
+
+        # Lines and trafos are stored in separate tables of the model
+        self._branch_id_to_element_id = np.empty(len(self._branches), dtype=int)
+        self._branch_id_to_element_id[self._is_line] = np.arange(self._is_line.sum())
+        self._branch_id_to_element_id[~self._is_line] = np.arange(
+            (~self._is_line).sum()
+        )
+
+        # Prepare branches ts as a table of statuses in the order of branches
+        if "branch_name" in self._branches_ts.columns:
+            self._branches_ts = self._branches_ts.pivot(
+                index="datetime", columns="branch_name", values="in_service"
+            )[self._branches["branch_name"]]
 
         # Prepare loads
         self._loads.sort_values("load_name", inplace=True, ignore_index=True)
         self._loads["bus_id"] = self._loads["bus_name"].map(self._bus_name_to_id)
+        self._load_name_to_id = pd.Series(
+            data=np.arange(len(self._loads)), index=self._loads["load_name"].values
+        )
 
         # Prepare loads ts
         self._loads_ts[self._load_vars] = self._loads_ts[self._load_vars].astype(float)
@@ -93,6 +166,9 @@ class PandaPowerFlowBuilder(BasePowerFlowBuilder):
         self._gens.loc[mask, "is_optimized"] = False
         self._gens.sort_values("gen_name", inplace=True)
         self._gens["bus_id"] = self._gens["bus_name"].map(self._bus_name_to_id)
+        self._gen_name_to_id = pd.Series(
+            data=np.arange(len(self._gens)), index=self._gens["gen_name"].values
+        )
 
         # Prepare gens ts
         optimized_names = self._gens.loc[self._gens["is_optimized"], "gen_name"]
@@ -114,6 +190,25 @@ class PandaPowerFlowBuilder(BasePowerFlowBuilder):
         if "datetime" not in self._gens_ts.index.names:
             self._gens_ts.set_index("datetime", inplace=True)
 
+        # Prepare dispatch as a table of outputs in the order of gens
+        if (
+            self._gens_dispatch_ts is not None
+            and "gen_name" in self._gens_dispatch_ts.columns
+        ):
+            self._gens_dispatch_ts = self._gens_dispatch_ts.pivot(
+                index="datetime", columns="gen_name", values="p_mw"
+            ).reindex(columns=self._gens["gen_name"])
+
+        # The chronologically previous timestamp of each one for warm starts
+        self._previous_timestamps = dict(zip(self.timestamps[1:], self.timestamps[:-1]))
+
+        # The first lookup builds index structures, so do it before workers start
+        self._loads_ts.loc[self.timestamps[0]]
+        self._gens_ts.loc[self.timestamps[0]]
+        self._branches_ts.loc[self.timestamps[0]]
+        if self._gens_dispatch_ts is not None:
+            self._gens_dispatch_ts.loc[self.timestamps[0]]
+
     def _build_base_model(self) -> pp.pandapowerNet:
         """Create power flow model.
 
@@ -293,13 +388,33 @@ class PandaPowerFlowBuilder(BasePowerFlowBuilder):
             model: Power system model.
             timestamp: Current datetime.
         """
+        self._timestamp = timestamp
+
+        # Topology changes rarely, so tables are updated only if statuses differ
+        status = self._branches_ts.loc[timestamp].values
+        changed = status != self._get_branch_status(model)
+        if changed[self._is_line].any():
+            model.line["in_service"] = status[self._is_line]
+        if changed[~self._is_line].any():
+            model.trafo["in_service"] = status[~self._is_line]
+
         # Assume that load_ts is sorted by datetime and load_name
         model.load[self._load_vars] = self._loads_ts.loc[
             timestamp, self._load_vars
         ].values
 
         # Assume that gen_ts_prep is sorted by datetime and gen_name
-        self._gen_slice = self._gens_ts.loc[timestamp]
+        gen_slice = self._gens_ts.loc[timestamp]
+
+        # Outputs of optimized gens are taken from the economic dispatch, the
+        # slice is copied, so time-series are not changed
+        if self._gens_dispatch_ts is not None:
+            dispatch = self._gens_dispatch_ts.loc[timestamp].values
+            gen_slice = gen_slice.copy()
+            gen_slice["p_mw"] = np.where(
+                np.isnan(dispatch), gen_slice["p_mw"].values, dispatch
+            )
+        self._gen_slice = gen_slice
         model.gen[self._gen_vars_model] = self._gen_slice[self._gen_vars_ts].values
 
         # Need to refresh values after the previous run
@@ -307,6 +422,231 @@ class PandaPowerFlowBuilder(BasePowerFlowBuilder):
         model.gen["vm_pu"] = 1.0
         model.ext_grid["vm_pu"] = 1.0
 
+    def _apply_overrides(self, model: pp.pandapowerNet, overrides: dict) -> None:
+        """Replace data of the current timestamp with custom values.
+
+        Args:
+            model: Power system model.
+            overrides: Values of load and gen variables by element names, e.g.
+              `{"loads": {"load_001": {"p_mw": 10}}, "gens": {"wind_001": {...}}}`.
+        """
+        # Loads
+        loads = self._get_overrides_table(
+            values=overrides.get("loads", {}),
+            name_to_id=self._load_name_to_id,
+            variables=self._load_vars,
+        )
+        for col in loads.columns:
+            values = loads[col].dropna()
+            model.load.loc[values.index, col] = values.values
+
+        # Gens
+        gens = self._get_overrides_table(
+            values=overrides.get("gens", {}),
+            name_to_id=self._gen_name_to_id,
+            variables=self._gen_vars_model,
+        )
+        if gens.empty:
+            return
+        gen_slice = self._gen_slice.copy()
+        for col in gens.columns:
+            values = gens[col].dropna()
+            gen_slice.iloc[values.index, gen_slice.columns.get_loc(col)] = values.values
+
+        # Output of non-optimized gens is fixed at the OPF stage
+        gen_slice["max_opf_p_mw"] = np.where(
+            gen_slice["is_optimized"], gen_slice["max_p_mw"], gen_slice["p_mw"]
+        )
+        gen_slice["min_opf_p_mw"] = np.where(
+            gen_slice["is_optimized"], gen_slice["min_p_mw"], gen_slice["p_mw"]
+        )
+        self._gen_slice = gen_slice
+        model.gen[self._gen_vars_model] = self._gen_slice[self._gen_vars_ts].values
+
+    @staticmethod
+    def _get_overrides_table(
+        values: dict, name_to_id: pd.Series, variables: list[str]
+    ) -> pd.DataFrame:
+        """Convert overrides of one element type to a table.
+
+        Args:
+            values: Values of variables by element names.
+            name_to_id: Element ids in the model by names.
+            variables: Variables allowed to be changed.
+
+        Returns:
+            Table with values indexed by element ids in the model.
+
+        Raises:
+            ValueError: Error if element names or variables are unknown.
+        """
+        table = pd.DataFrame.from_dict(values, orient="index", dtype=float)
+        unknown_names = table.index.difference(name_to_id.index)
+        if len(unknown_names) > 0:
+            raise ValueError(f"Unknown element names: {', '.join(unknown_names)}.")
+        unknown_vars = table.columns.difference(variables)
+        if len(unknown_vars) > 0:
+            raise ValueError(f"Unknown variables: {', '.join(unknown_vars)}.")
+        table.index = name_to_id[table.index].values
+        return table
+
+    def _get_settings(self) -> dict:
+        """Get settings of the builder which affect results of cases.
+
+        Returns:
+            Values of settings by names.
+        """
+        return {
+            "pandapower": pp.__version__,
+            "numpy": np.__version__,
+            "scipy": scipy.__version__,
+            "s_base_mva": self.s_base_mva,
+            "f_hz": self.f_hz,
+            "power_flow_solvers": self.power_flow_solvers,
+            "opf_strategies": self.opf_strategies,
+            "opf_voltage_relaxation_pu": self.opf_voltage_relaxation_pu,
+            "gens_dispatch_ts": self._gens_dispatch_ts is not None,
+        }
+
+    def _get_case_inputs(self, model: pp.pandapowerNet) -> list[np.ndarray]:
+        """Get inputs of the power flow case which define its results.
+
+        Args:
+            model: Power system model with data of the case.
+
+        Returns:
+            Arrays of input values.
+        """
+        return [
+            self._get_branch_status(model),
+            model.load[self._load_vars].values,
+            model.gen[self._gen_vars_model].values,
+        ]
+
+    def _get_solved_state(self, model: pp.pandapowerNet) -> dict[str, pd.DataFrame]:
+        """Get the part of the solved model which is changed by calculations.
+
+        Args:
+            model: Solved power system model.
+
+        Returns:
+            Gen and slack tables with optimized values and result tables.
+        """
+        tables = ["gen", "ext_grid"] + [
+            table for table in model.keys() if table.startswith("res_")
+        ]
+        return {table: model[table] for table in tables}
+
+    def _set_solved_state(
+        self, model: pp.pandapowerNet, state: dict[str, pd.DataFrame]
+    ) -> None:
+        """Restore results of calculations saved by `_get_solved_state`.
+
+        Args:
+            model: Power system model with data of the same case.
+            state: Saved tables.
+        """
+        for table, values in state.items():
+            model[table] = values
+        self._keep_warm_start(model)
+
+    def _keep_warm_start(self, model: pp.pandapowerNet) -> None:
+        """Keep converged results of the current timestamp to warm-start OPF.
+
+        Args:
+            model: Solved power system model.
+        """
+        if self._timestamp is None or not model.res_bus["vm_pu"].notna().all():
+            return
+        self._warm_start = (
+            self._timestamp,
+            model.res_bus.copy(),
+            model.res_gen.copy(),
+        )
+
+    def _get_warm_start(self) -> Optional[tuple[pd.DataFrame, pd.DataFrame]]:
+        """Get converged results of the timestamp before the current one.
+
+        Returns:
+            Bus and gen result tables or None if the previous timestamp was not
+              solved by this process just before the current one.
+        """
+        previous = self._previous_timestamps.get(self._timestamp)
+        if self._warm_start is None or self._warm_start[0] != previous:
+            return None
+        return self._warm_start[1:]
+
+    def _get_results(self, model: pp.pandapowerNet) -> dict[str, dict[str, np.ndarray]]:
+        """Extract main results of the power flow case.
+
+        Args:
+            model: Power system model.
+
+        Returns:
+            Arrays of result variables for each element type. Elements are ordered
+              as names returned by `_get_element_names`. Values are NaNs if
+              the case did not converge.
+        """
+        # Result tables are empty if calculations did not converge
+        res_bus = model.res_bus.reindex(model.bus.index)
+        res_gen = model.res_gen.reindex(model.gen.index)
+        res_ext_grid = model.res_ext_grid.reindex(model.ext_grid.index)
+        res_line = model.res_line.reindex(model.line.index)
+        res_trafo = model.res_trafo.reindex(model.trafo.index)
+
+        # Combine lines and trafos in the order of branches
+        branch = {}
+        for col, line_col, trafo_col in [
+            ("p_from_mw", "p_from_mw", "p_hv_mw"),
+            ("q_from_mvar", "q_from_mvar", "q_hv_mvar"),
+            ("p_to_mw", "p_to_mw", "p_lv_mw"),
+            ("q_to_mvar", "q_to_mvar", "q_lv_mvar"),
+            ("loading_percent", "loading_percent", "loading_percent"),
+        ]:
+            values = np.empty(len(self._is_line))
+            values[self._is_line] = res_line[line_col].values
+            values[~self._is_line] = res_trafo[trafo_col].values
+            branch[col] = values
+
+        # Output limits only of gens which are optimized, others are fixed. They
+        # are taken from the model, where they are restored after OPF, so they
+        # belong to the case also for cached and loaded cases
+        gen = {
+            col: res_gen[col].to_numpy(dtype=float)
+            for col in ["p_mw", "q_mvar", "vm_pu"]
+        }
+        is_optimized = model.gen["controllable"].to_numpy(dtype=bool)
+        is_limited = is_optimized & model.gen["in_service"].to_numpy(dtype=bool)
+        for col in ["min_p_mw", "max_p_mw"]:
+            limits = model.gen[col].to_numpy(dtype=float)
+            gen[col] = np.where(is_limited, limits, np.nan)
+
+        return {
+            "bus": {
+                col: res_bus[col].to_numpy(dtype=float)
+                for col in ["vm_pu", "va_degree", "p_mw", "q_mvar"]
+            },
+            "branch": branch,
+            "gen": gen,
+            "ext_grid": {
+                col: res_ext_grid[col].to_numpy(dtype=float)
+                for col in ["p_mw", "q_mvar"]
+            },
+        }
+
+    def _get_element_names(self) -> dict[str, list[str]]:
+        """Get names of elements in the order used in results.
+
+        Returns:
+            Element names for each element type.
+        """
+        return {
+            "bus": self._buses["bus_name"].tolist(),
+            "branch": self._branches["branch_name"].tolist(),
+            "gen": self._gens["gen_name"].tolist(),
+            "ext_grid": [self._slack_bus],
+        }
+
     def _save_sample(
         self, model: pp.pandapowerNet, path: str, sample_name: str
     ) -> None:
@@ -320,25 +660,104 @@ class PandaPowerFlowBuilder(BasePowerFlowBuilder):
         sample_path = os.path.join(path, f"{sample_name}.json")
         pp.to_json(model, sample_path)
 
+    def _load_sample(self, path: str, sample_name: str) -> pp.pandapowerNet:
+        """Load sample saved by `_save_sample`.
+
+        Args:
+            path: Path to the saved sample.
+            sample_name: Sample name.
+
+        Returns:
+            Power system model.
+        """
+        return pp.from_json(os.path.join(path, f"{sample_name}.json"))
+
+    def _serialize_sample(self, model: pp.pandapowerNet) -> bytes:
+        """Serialize the sample in the format of `_save_sample`.
+
+        Args:
+            model: Power system model.
+
+        Returns:
+            Serialized sample.
+        """
+        return pp.to_json(model).encode("utf-8")
+
+    def _deserialize_sample(self, data: bytes) -> pp.pandapowerNet:
+        """Restore the sample serialized by `_serialize_sample`.
+
+        Args:
+            data: Serialized sample.
+
+        Returns:
+            Power system model.
+        """
+        return pp.from_json_string(data.decode("utf-8"))
+
+    def _set_branch_in_service(
+        self, model: pp.pandapowerNet, branch_id: int, in_service: bool
+    ) -> None:
+        """Change status of the branch.
+
+        Args:
+            model: Power system model.
+            branch_id: Position of the branch in the order of branch names.
+            in_service: New status of the branch.
+        """
+        table = "line" if self._is_line[branch_id] else "trafo"
+        element_id = self._branch_id_to_element_id[branch_id]
+        model[table].loc[element_id, "in_service"] = in_service
+
+    def _get_branch_status(self, model: pp.pandapowerNet) -> np.ndarray:
+        """Get current statuses of branches.
+
+        Args:
+            model: Power system model.
+
+        Returns:
+            Statuses in the order of branch names.
+        """
+        status = np.empty(len(self._is_line), dtype=bool)
+        status[self._is_line] = model.line["in_service"].values
+        status[~self._is_line] = model.trafo["in_service"].values
+        return status
+
     def _calculate_opf(self, model: pp.pandapowerNet) -> bool:
         """Solve optimal power flow task.
 
+        Recovery strategies are tried in order until one converges.
+
         Args:
             model: Power system model.
 
         Returns:
             True if the calculation was successful, False otherwise.
         """
+        # Results of the previous timestamp are taken before strategies change
+        # result tables
+        warm_start = self._get_warm_start()
         try:
-            # Run OPF
-            pp.runopp(model, init="flat")
+            for strategy in self.opf_strategies:
+                if strategy == "dispatch" and self._gens_dispatch_ts is None:
+                    continue
+                start = time.perf_counter()
+                is_converged = self._run_opf_strategy(model, strategy, warm_start)
+                self._record_stats(
+                    "opf",
+                    strategy,
+                    is_converged,
+                    time.perf_counter() - start,
+                    self._get_iterations(model),
+                )
+                if is_converged:
+                    break
+            else:
+                pp.clear_result_tables(model)
+                return False
 
             # Add optimized values to the model
             model.gen[["p_mw", "vm_pu"]] = model.res_gen[["p_mw", "vm_pu"]].values
             model.ext_grid["vm_pu"] = model.res_bus.loc[self._slack_bus_id, "vm_pu"]
-        except OPFNotConverged:
-            pp.clear_result_tables(model)
-            return False
 
         finally:
 
@@ -350,24 +769,135 @@ class PandaPowerFlowBuilder(BasePowerFlowBuilder):
 
         return True
 
-    def _calculate_power_flow(self, model: pp.pandapowerNet) -> bool:
-        """Calculate power flows.
+    @staticmethod
+    def _get_iterations(model: pp.pandapowerNet) -> Optional[int]:
+        """Get the number of iterations of the last calculation.
+
+        Args:
+            model: Power system model.
+
+        Returns:
+            Number of iterations of the interior point solver of OPF or of the
+              power flow solver. None if the calculation did not start.
+        """
+        ppc = model.get("_ppc")
+        if not ppc:
+            return None
+        if "raw" in ppc:
+            return int(ppc["raw"]["output"]["iterations"])
+        if "iterations" in ppc:
+            return int(ppc["iterations"])
+        return None
+
+    def _run_opf_strategy(
+        self,
+        model: pp.pandapowerNet,
+        strategy: str,
+        warm_start: Optional[tuple[pd.DataFrame, pd.DataFrame]] = None,
+    ) -> bool:
+        """Solve optimal power flow task using one of the strategies.
+
+        Strategies:
+            dispatch: AC OPF starting from DC power flow with gen outputs found
+              by economic dispatch. It is skipped if the dispatch is not loaded.
+            flat: AC OPF with flat start.
+            previous: AC OPF starting from converged results of the previous
+              timestamp. It is skipped if the previous timestamp was not
+              solved by this process just before the current one, e.g. when
+              timestamps are split between workers.
+            dc: AC OPF starting from results of DC OPF.
+            relaxed_voltage: AC OPF with flat start and bus voltage limits
+              extended by `opf_voltage_relaxation_pu`.
+            dc_opf: Only DC OPF, so gen outputs are taken from the DC dispatch
+              and voltages are calculated at the power flow stage.
 
         Args:
             model: Power system model.
+            strategy: Name of the strategy.
+            warm_start: Bus and gen results of the previous timestamp (see
+              `_get_warm_start`).
 
         Returns:
             True if the calculation was successful, False otherwise.
         """
         try:
-            pp.runpp(
-                net=model,
-                algorithm="nr",
-                calculate_voltage_angles=True,
-                init="flat",
-                enforce_q_lims=True,
-            )
-        except LoadflowNotConverged:
-            pp.clear_result_tables(model)
+            match strategy:
+                case "dispatch":
+                    # AC power flow with DC dispatch often diverges, so DC
+                    # power flow with flat voltage magnitudes is used
+                    p_mw = model.gen.loc[model.gen["in_service"], "p_mw"]
+                    if p_mw.isna().any():
+                        return False
+                    pp.rundcpp(model)
+                    model.res_bus["vm_pu"] = 1.0
+                    pp.runopp(model, init="results")
+                case "flat":
+                    pp.runopp(model, init="flat")
+                case "previous":
+                    # Failed calculations leave NaNs in result tables, so
+                    # results of the previous timestamp are restored
+                    if warm_start is None:
+                        return False
+                    model.res_bus, model.res_gen = (
+                        table.copy() for table in warm_start
+                    )
+                    if not model.res_bus["vm_pu"].notna().all():
+                        return False
+                    pp.runopp(model, init="results")
+                case "dc":
+                    pp.rundcopp(model)
+                    pp.runopp(model, init="results")
+                case "relaxed_voltage":
+                    limits = model.bus[["min_vm_pu", "max_vm_pu"]].copy()
+                    model.bus["min_vm_pu"] -= self.opf_voltage_relaxation_pu
+                    model.bus["max_vm_pu"] += self.opf_voltage_relaxation_pu
+                    try:
+                        pp.runopp(model, init="flat")
+                    finally:
+                        model.bus[["min_vm_pu", "max_vm_pu"]] = limits
+                case "dc_opf":
+                    # DC OPF assumes flat voltage magnitudes
+                    pp.rundcopp(model)
+                    model.res_bus["vm_pu"] = 1.0
+                case _:
+                    raise AttributeError(f"Unknown OPF strategy: {strategy}.")
+        except (OPFNotConverged, LoadflowNotConverged):
             return False
         return True
+
+    def _calculate_power_flow(self, model: pp.pandapowerNet) -> bool:
+        """Calculate power flows.
+
+        Args:
+            model: Power system model.
+
+        Returns:
+            True if the calculation was successful, False otherwise.
+        """
+        # With the "results" init, a solver starts from results of OPF or
+        # the last converged calculation, since failed ones do not write results
+        for algorithm, init in self.power_flow_solvers:
+            start = time.perf_counter()
+            try:
+                pp.runpp(
+                    net=model,
+                    algorithm=algorithm,
+                    calculate_voltage_angles=True,
+                    init=init,
+                    enforce_q_lims=True,
+                )
+                is_converged = True
+            except LoadflowNotConverged:
+                is_converged = False
+            self._record_stats(
+                "power_flow",
+                f"{algorithm}/{init}",
+                is_converged,
+                time.perf_counter() - start,
+                self._get_iterations(model),
+            )
+            if is_converged:
+                self._keep_warm_start(model)
+                return True
+        pp.clear_result_tables(model)
+        return False
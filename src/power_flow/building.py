@@ -1,75 +1,164 @@
 import os
 import sys
 
+import numpy as np
 import pandas as pd
 
-from definitions import F_HZ, POWER_FLOW_ENGINE, S_BASE_MVA, WORKERS_COUNT
+from definitions import (
+    CASE_CACHE_PATH,
+    CASE_CACHE_SIZE_MB,
+    CASE_TIMEOUT_S,
+    F_HZ,
+    OPF_STRATEGIES,
+    OPF_VOLTAGE_RELAXATION_PU,
+    POWER_FLOW_ENGINE,
+    POWER_FLOW_SOLVERS,
+    S_BASE_MVA,
+    SAMPLES_SHARD_PERIOD,
+    SAVE_CASES,
+    WORKER_MAX_CASES,
+    WORKER_MAX_RSS_MB,
+    WORKERS_COUNT,
+)
+from src.power_flow.arrays import ArraysWriter
+from src.power_flow.builders.base import BasePowerFlowBuilder
+from src.power_flow.results_index import ResultsIndexWriter
+from src.power_flow.statistics import StreamingStatistics, save_statistics
+from src.utils.data_loaders import load_df_data
+
+
+def get_builder() -> BasePowerFlowBuilder:
+    """Create builder of power flow cases using the engine from definitions.
+
+    Returns:
+        Builder without data.
+
+    Raises:
+        AttributeError: Error if `POWER_FLOW_ENGINE` is unknown.
+    """
+    match POWER_FLOW_ENGINE:
+        case "pandapower":
+
+            from src.power_flow.builders import PandaPowerFlowBuilder
+
+            return PandaPowerFlowBuilder(
+                f_hz=F_HZ,
+                s_base_mva=S_BASE_MVA,
+                power_flow_solvers=POWER_FLOW_SOLVERS,
+                opf_strategies=OPF_STRATEGIES,
+                opf_voltage_relaxation_pu=OPF_VOLTAGE_RELAXATION_PU,
+                cache_path=CASE_CACHE_PATH,
+                cache_size_mb=CASE_CACHE_SIZE_MB,
+                case_timeout_s=CASE_TIMEOUT_S,
+                worker_max_cases=WORKER_MAX_CASES,
+                worker_max_rss_mb=WORKER_MAX_RSS_MB,
+                shard_period=SAMPLES_SHARD_PERIOD,
+            )
+        case _:
+            raise AttributeError(f"Unknown power flow engine: {POWER_FLOW_ENGINE}.")
 
 
 def building(
     buses: str | pd.DataFrame,
     branches: str | pd.DataFrame,
+    branches_ts: str | pd.DataFrame,
     loads: str | pd.DataFrame,
     loads_ts: str | pd.DataFrame,
     gens: str | pd.DataFrame,
     gens_ts: str | pd.DataFrame,
+    gens_dispatch_ts: str | pd.DataFrame,
+    representative_hours: str | pd.DataFrame,
     path_samples: str,
+    path_statistics: str,
+    path_results_index: str,
+    path_arrays: str,
 ) -> None:
     """Start building power flow cases.
 
+    Cases are built only for representative timestamps. Statistics, the index
+    of results, and arrays of results are collected while cases are solved,
+    and each case is weighted by the number of timestamps represented by it.
+    Cases are saved only if `SAVE_CASES` is True.
+
     Args:
         buses: Path or DataFrame with bus data.
         branches: Path or DataFrame with branch data.
+        branches_ts: Path or DataFrame with branch time-series data.
         loads: Path or DataFrame with load data.
         loads_ts: Path or DataFrame with load time-series data.
         gens: Path or DataFrame with generation data.
         gens_ts: Path or DataFrame with generation time-series data.
+        gens_dispatch_ts: Path or DataFrame with economic dispatch of gens.
+        representative_hours: Path or DataFrame with mapping of timestamps to
+          their representative ones.
         path_samples: Path to save created power flow cases.
-
-    Raises:
-        AttributeError: Error if `POWER_FLOW_ENGINE` is unknown.
+        path_statistics: Path to save statistics of results.
+        path_results_index: Path to the folder to save the index of results.
+        path_arrays: Path to the folder to save arrays of results.
     """
-    # Create builder
-    match POWER_FLOW_ENGINE:
-        case "pandapower":
-
-            from src.power_flow.builders import PandaPowerFlowBuilder
-
-            builder = PandaPowerFlowBuilder(f_hz=F_HZ, s_base_mva=S_BASE_MVA)
-        case _:
-            raise AttributeError(f"Unknown power flow engine: {POWER_FLOW_ENGINE}.")
-
-    # Load data
+    # Create builder and load data
+    builder = get_builder()
     builder.load_data(
         buses=buses,
         branches=branches,
+        branches_ts=branches_ts,
         loads=loads,
         loads_ts=loads_ts,
         gens=gens,
         gens_ts=gens_ts,
+        gens_dispatch_ts=gens_dispatch_ts,
     )
 
+    # Take representative timestamps
+    mapping = load_df_data(
+        data=representative_hours,
+        dtypes={"datetime": str, "representative_datetime": str, "weight": float},
+    )
+    timestamps = np.sort(mapping["representative_datetime"].unique())
+    weights = mapping["representative_datetime"].value_counts().to_dict()
+
     # Start building process
     os.makedirs(path_samples)
-    builder.run(path_sample=path_samples, workers=WORKERS_COUNT)
+    builder._ensure_prepared()
+    element_names = builder._get_element_names()
+    statistics = StreamingStatistics(element_names, weights=weights)
+    results_index = ResultsIndexWriter(element_names, weights=weights)
+    arrays = ArraysWriter(path_arrays, timestamps, element_names, weights=weights)
+    builder.run(
+        timestamp=timestamps,
+        path_sample=path_samples if SAVE_CASES else None,
+        workers=WORKERS_COUNT,
+        collectors=[statistics, results_index, arrays],
+    )
+    save_statistics(statistics, path_statistics)
+    results_index.save(path_results_index)
+    arrays.close()
 
 
 if __name__ == "__main__":
     # Check params
-    if len(sys.argv) != 8:
+    if len(sys.argv) != 14:
         raise ValueError(
             "Incorrect arguments. Usage:\n\tpython "
-            "building.py path_buses path_branches path_loads "
-            "path_loads_ts path_gens path_gens_ts path_samples\n"
+            "building.py path_buses path_branches path_branches_ts path_loads "
+            "path_loads_ts path_gens path_gens_ts path_gens_dispatch_ts "
+            "path_representative_hours path_samples path_statistics "
+            "path_results_index path_arrays\n"
         )
 
     # Run
     building(
         buses=sys.argv[1],
         branches=sys.argv[2],
-        loads=sys.argv[3],
-        loads_ts=sys.argv[4],
-        gens=sys.argv[5],
-        gens_ts=sys.argv[6],
-        path_samples=sys.argv[7],
+        branches_ts=sys.argv[3],
+        loads=sys.argv[4],
+        loads_ts=sys.argv[5],
+        gens=sys.argv[6],
+        gens_ts=sys.argv[7],
+        gens_dispatch_ts=sys.argv[8],
+        representative_hours=sys.argv[9],
+        path_samples=sys.argv[10],
+        path_statistics=sys.argv[11],
+        path_results_index=sys.argv[12],
+        path_arrays=sys.argv[13],
     )
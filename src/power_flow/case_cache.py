@@ -0,0 +1,141 @@
+import os
+import pickle
+import tempfile
+from typing import Any, Optional
+
+from src.utils.app_logger import get_logger
+
+# Extension of files with cached values
+_EXTENSION = ".pkl"
+
+# Share of the max size which is kept after eviction, so eviction is not
+# triggered by each new value
+_EVICTION_SHARE = 0.9
+
+
+class CaseCache:
+    """Persistent cache of solved power flow cases shared by processes.
+
+    Each value is saved to a separate file named by its key. Files are written
+    to a temporary file and then renamed, so other processes never read
+    incomplete values. When the total size exceeds the limit, least recently
+    used values are removed.
+
+    Args:
+        path: Path to the cache folder.
+        max_size_mb: Max total size of cached values in megabytes.
+
+    Attributes:
+        path: Path to the cache folder.
+        max_size_mb: Max total size of cached values in megabytes.
+    """
+
+    def __init__(self, path: str, max_size_mb: float) -> None:
+        """Persistent cache of solved power flow cases shared by processes."""
+        self.path = path
+        self.max_size_mb = max_size_mb
+        self._logger = get_logger(__name__)
+        os.makedirs(path, exist_ok=True)
+        self._size = sum(size for _, _, size in self._scan())
+
+    def get(self, key: str) -> Optional[Any]:
+        """Get the cached value.
+
+        Args:
+            key: Key of the value.
+
+        Returns:
+            Value or None if it is not cached.
+        """
+        path_value = self._get_path(key)
+        try:
+            with open(path_value, "rb") as file:
+                value = pickle.load(file)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+
+        # Modification time is used to find least recently used values
+        try:
+            os.utime(path_value)
+        except OSError:
+            pass
+        return value
+
+    def put(self, key: str, value: Any) -> None:
+        """Save the value to the cache.
+
+        Args:
+            key: Key of the value.
+            value: Value to save.
+        """
+        handle, path_temp = tempfile.mkstemp(dir=self.path, suffix=".tmp")
+        with os.fdopen(handle, "wb") as file:
+            pickle.dump(value, file, protocol=pickle.HIGHEST_PROTOCOL)
+        self._size += os.path.getsize(path_temp)
+        os.replace(path_temp, self._get_path(key))
+        if self._size > self.max_size_mb * 2**20:
+            self._evict()
+
+    def clear(self) -> None:
+        """Remove all cached values."""
+        for path_value, _, _ in self._scan():
+            self._remove(path_value)
+        self._size = 0
+
+    def _evict(self) -> None:
+        """Remove least recently used values until the size is below the limit.
+
+        Other processes add values too, so the actual size is calculated.
+        """
+        entries = sorted(self._scan(), key=lambda entry: entry[1])
+        self._size = sum(size for _, _, size in entries)
+        max_size = _EVICTION_SHARE * self.max_size_mb * 2**20
+        removed = 0
+        for path_value, _, size in entries:
+            if self._size <= max_size:
+                break
+            self._remove(path_value)
+            self._size -= size
+            removed += 1
+        self._logger.debug(f"{removed} values were evicted from the case cache.")
+
+    def _scan(self) -> list[tuple[str, float, int]]:
+        """List cached values.
+
+        Returns:
+            Paths, modification times, and sizes of files with values.
+        """
+        entries = []
+        with os.scandir(self.path) as iterator:
+            for entry in iterator:
+                if not entry.name.endswith(_EXTENSION):
+                    continue
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                entries.append((entry.path, stat.st_mtime, stat.st_size))
+        return entries
+
+    def _get_path(self, key: str) -> str:
+        """Get the path to the file with the value.
+
+        Args:
+            key: Key of the value.
+
+        Returns:
+            Path to the file.
+        """
+        return os.path.join(self.path, f"{key}{_EXTENSION}")
+
+    @staticmethod
+    def _remove(path_value: str) -> None:
+        """Remove the file with the value if it still exists.
+
+        Args:
+            path_value: Path to the file.
+        """
+        try:
+            os.remove(path_value)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,324 @@
+import sys
+from multiprocessing import Pool
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+from tqdm import tqdm
+
+from definitions import CONTINGENCY_SCREENING_THRESHOLD, WORKERS_COUNT
+from src.power_flow.builders.base import BasePowerFlowBuilder
+from src.power_flow.building import get_builder
+from src.power_flow.sensitivities import get_outage_sensitivities, load_sensitivities
+from src.utils.app_logger import get_logger
+
+# State of a worker process shared by all its tasks
+_worker_state = {}
+
+# LODF matrices of topologies with branch outages which were already met
+_lodf_cache = {}
+
+
+def _init_worker(
+    builder: BasePowerFlowBuilder,
+    path_samples: str,
+    sensitivities: dict,
+    ratings_mva: np.ndarray,
+    threshold: float,
+) -> None:
+    """Initialize a worker process.
+
+    Args:
+        builder: Builder with prepared data.
+        path_samples: Path to built power flow cases.
+        sensitivities: Matrices of the network with all branches in service
+          (see `load_sensitivities`).
+        ratings_mva: Branch ratings.
+        threshold: Share of ratings to select contingencies for AC calculations.
+    """
+    _worker_state["builder"] = builder
+    _worker_state["path_samples"] = path_samples
+    _worker_state["sensitivities"] = sensitivities
+    _worker_state["ratings_mva"] = ratings_mva
+    _worker_state["threshold"] = threshold
+
+
+def _screen_worker(
+    timestamp: str,
+) -> tuple[list[dict], int, Optional[tuple[tuple[int, ...], tuple[int, ...]]]]:
+    """Analyze N-1 contingencies of one power flow case in a worker process.
+
+    Args:
+        timestamp: Datetime of the case.
+
+    Returns:
+        Found violations, the number of contingencies calculated with AC power
+          flow, and the topology of the case (see `screen_case`).
+    """
+    return screen_case(timestamp=timestamp, **_worker_state)
+
+
+def screen_case(
+    builder: BasePowerFlowBuilder,
+    path_samples: str,
+    timestamp: str,
+    sensitivities: dict,
+    ratings_mva: np.ndarray,
+    threshold: float,
+) -> tuple[list[dict], int, Optional[tuple[tuple[int, ...], tuple[int, ...]]]]:
+    """Analyze N-1 contingencies of one power flow case.
+
+    Post-contingency flows are estimated using LODF of the case topology, and
+    only outages of branches in service which lead to loadings above
+    `threshold` are calculated with AC power flow. Outages splitting the system
+    into islands depend only on the topology, so they are returned with it
+    instead of violations of the case.
+
+    Args:
+        builder: Builder with prepared data.
+        path_samples: Path to built power flow cases.
+        timestamp: Datetime of the case.
+        sensitivities: Matrices of the network with all branches in service
+          (see `load_sensitivities`).
+        ratings_mva: Branch ratings.
+        threshold: Share of ratings to select contingencies for AC calculations.
+
+    Returns:
+        Found violations, the number of contingencies calculated with AC power
+          flow, and the topology of the case: positions of branches out of
+          service and of branches which outages split the system into islands.
+          The topology is None if the case was not analyzed.
+    """
+    model = builder._load_case(path_samples, timestamp)
+    flows = builder._get_results(model)["branch"]["p_from_mw"]
+    if np.isnan(flows).all():
+        return [_get_violation(timestamp, None, None, "base_not_converged")], 0, None
+
+    # Take into account branches which are out of service in this case
+    status = builder._get_branch_status(model)
+    outages = tuple(np.flatnonzero(~status).tolist())
+    lodf = _get_lodf(sensitivities, outages)
+    if lodf is None:
+        return [_get_violation(timestamp, None, None, "base_islanding")], 0, None
+
+    # Estimate flows after outage of each branch (in columns)
+    post_loadings = np.abs(flows[:, None] + lodf * flows[None, :])
+    post_loadings /= ratings_mva[:, None]
+    np.fill_diagonal(post_loadings, 0)
+
+    # Branches which are already out of service are not analyzed
+    violations = []
+    branch_names = builder._get_element_names()["branch"]
+    bus_names = np.array(builder._get_element_names()["bus"])
+    is_island = np.isnan(lodf).all(axis=0)
+    islands = tuple(np.flatnonzero(is_island).tolist())
+    is_flagged = status & ~is_island & (post_loadings.max(axis=0) > threshold)
+    flagged = np.flatnonzero(is_flagged)
+
+    # Check flagged contingencies using AC power flow
+    min_v_pu = model.bus["min_vm_pu"].values
+    max_v_pu = model.bus["max_vm_pu"].values
+    for branch_id in flagged:
+        outage = branch_names[branch_id]
+        builder._set_branch_in_service(model, branch_id, False)
+        if not builder._calculate_power_flow(model):
+            violations.append(_get_violation(timestamp, outage, None, "not_converged"))
+        else:
+            results = builder._get_results(model)
+            loadings = results["branch"]["loading_percent"]
+            for element_id in np.where(loadings > 100)[0]:
+                violations.append(
+                    _get_violation(
+                        timestamp,
+                        outage,
+                        branch_names[element_id],
+                        "overload",
+                        loadings[element_id],
+                    )
+                )
+            vm_pu = results["bus"]["vm_pu"]
+            for name, mask in [
+                ("undervoltage", vm_pu < min_v_pu),
+                ("overvoltage", vm_pu > max_v_pu),
+            ]:
+                for bus_name, value in zip(bus_names[mask], vm_pu[mask]):
+                    violations.append(
+                        _get_violation(timestamp, outage, bus_name, name, value)
+                    )
+        builder._set_branch_in_service(model, branch_id, status[branch_id])
+    return violations, len(flagged), (outages, islands)
+
+
+def _get_lodf(sensitivities: dict, outages: tuple[int, ...]) -> Optional[np.ndarray]:
+    """Get LODF of the topology with outages of the branches.
+
+    Args:
+        sensitivities: Matrices of the network with all branches in service.
+        outages: Positions of outaged branches in the order of branch names.
+
+    Returns:
+        LODF matrix or None if the outages split the system into islands.
+    """
+    key = (id(sensitivities), outages)
+    if key not in _lodf_cache:
+        try:
+            lodf = get_outage_sensitivities(sensitivities, outages)["lodf"]
+        except ValueError:
+            lodf = None
+        _lodf_cache[key] = lodf
+    return _lodf_cache[key]
+
+
+def _get_violation(
+    timestamp: str,
+    outage: Optional[str],
+    element: Optional[str],
+    violation: str,
+    value: float = np.nan,
+) -> dict:
+    """Compose a row of the violation table.
+
+    Args:
+        timestamp: Datetime of the case.
+        outage: Name of the outaged branch.
+        element: Name of the element with the violation.
+        violation: Type of the violation.
+        value: Loading in percents or voltage in per units.
+
+    Returns:
+        Row of the violation table.
+    """
+    return {
+        "datetime": timestamp,
+        "outage": outage,
+        "element": element,
+        "violation": violation,
+        "value": value,
+    }
+
+
+def screening(
+    buses: str | pd.DataFrame,
+    branches: str | pd.DataFrame,
+    branches_ts: str | pd.DataFrame,
+    loads: str | pd.DataFrame,
+    loads_ts: str | pd.DataFrame,
+    gens: str | pd.DataFrame,
+    gens_ts: str | pd.DataFrame,
+    path_samples: str,
+    path_contingencies: Optional[str] = None,
+) -> Optional[pd.DataFrame]:
+    """Analyze N-1 contingencies (outages of single branches) of built cases.
+
+    Args:
+        buses: Path or DataFrame with bus data.
+        branches: Path or DataFrame with branch data.
+        branches_ts: Path or DataFrame with branch time-series data.
+        loads: Path or DataFrame with load data.
+        loads_ts: Path or DataFrame with load time-series data.
+        gens: Path or DataFrame with generation data.
+        gens_ts: Path or DataFrame with generation time-series data.
+        path_samples: Path to built power flow cases.
+        path_contingencies: Path to save the violation table.
+
+    Returns:
+        Violation table or None if `path_contingencies` is passed and
+          the table was saved.
+    """
+    logger = get_logger(__name__)
+
+    # Create builder and load data
+    builder = get_builder()
+    builder.load_data(
+        buses=buses,
+        branches=branches,
+        branches_ts=branches_ts,
+        loads=loads,
+        loads_ts=loads_ts,
+        gens=gens,
+        gens_ts=gens_ts,
+    )
+    builder._ensure_prepared()
+
+    # Sensitivities and ratings of branches
+    bus_data, branch_data = builder._buses, builder._branches
+    sensitivities = load_sensitivities(bus_data, branch_data)
+    v_rated_kv = bus_data.set_index("bus_name").loc[branch_data["from_bus"]]
+    ratings_mva = (
+        3**0.5
+        * v_rated_kv["v_rated_kv"].values
+        * branch_data["max_i_ka"].values
+        * branch_data["parallel"].values
+    )
+
+    # Only built cases are analyzed
+    timestamps = builder._get_saved_timestamps(path_samples)
+    workers_count = builder._get_workers_count(WORKERS_COUNT, len(timestamps))
+    initargs = (
+        builder,
+        path_samples,
+        sensitivities,
+        ratings_mva,
+        CONTINGENCY_SCREENING_THRESHOLD,
+    )
+    violations, flagged_count = [], 0
+    topologies = {}
+    with Pool(workers_count, initializer=_init_worker, initargs=initargs) as pool:
+        for timestamp, (case_violations, case_flagged, topology) in zip(
+            timestamps,
+            tqdm(
+                pool.imap(_screen_worker, timestamps, chunksize=4),
+                total=len(timestamps),
+            ),
+        ):
+            violations.extend(case_violations)
+            flagged_count += case_flagged
+            if topology is not None:
+                topologies.setdefault(topology, timestamp)
+
+    # Islanding is reported once per topology at its first timestamp
+    branch_names = builder._get_element_names()["branch"]
+    for (_, islands), timestamp in topologies.items():
+        for branch_id in islands:
+            violations.append(
+                _get_violation(timestamp, branch_names[branch_id], None, "islanding")
+            )
+    logger.info(
+        f"N-1 contingencies of {len(timestamps)} cases were screened: "
+        f"{flagged_count} of {len(timestamps) * len(branch_data)} contingencies "
+        f"were calculated with AC power flow, {len(violations)} violations found."
+    )
+
+    # Return results
+    result = pd.DataFrame(
+        violations, columns=["datetime", "outage", "element", "violation", "value"]
+    )
+    result.sort_values(["datetime", "outage", "element"], inplace=True)
+    if path_contingencies:
+        result.to_csv(path_contingencies, header=True, index=False)
+    else:
+        return result
+
+
+if __name__ == "__main__":
+    # Check params
+    if len(sys.argv) != 10:
+        raise ValueError(
+            "Incorrect arguments. Usage:\n\tpython "
+            "contingency.py path_buses path_branches path_branches_ts path_loads "
+            "path_loads_ts path_gens path_gens_ts path_samples "
+            "path_contingencies\n"
+        )
+
+    # Run
+    screening(
+        buses=sys.argv[1],
+        branches=sys.argv[2],
+        branches_ts=sys.argv[3],
+        loads=sys.argv[4],
+        loads_ts=sys.argv[5],
+        gens=sys.argv[6],
+        gens_ts=sys.argv[7],
+        path_samples=sys.argv[8],
+        path_contingencies=sys.argv[9],
+    )
@@ -0,0 +1,319 @@
+import json
+import os
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Iterator, Optional
+
+import numpy as np
+import pandas as pd
+
+from definitions import DATASET_CACHE_SIZE, DATE_FORMAT, SAMPLE_NAME_FORMAT
+from src.power_flow.arrays import load_arrays
+from src.power_flow.results_index import ResultsIndex
+from src.power_flow.shards import SampleShards, is_sharded
+
+
+class DatasetReader:
+    """Random access to built power flow cases.
+
+    The folder is scanned once to index timestamps of cases. Only requested
+    tables of cases are decoded, and recently decoded cases are kept in an LRU
+    cache. Supported folders:
+
+    - samples saved by the builder as JSON files of pandapower. Tables are
+      named as in pandapower, e.g. "res_bus" or "gen".
+    - samples saved by the builder in compressed shards (see `SampleShards`).
+      Tables are the same as in JSON files.
+    - the results index (see `ResultsIndexWriter`). Tables are element types
+      with result variables as columns, e.g. "bus", and "summary".
+    - arrays of results (see `ArraysWriter`). Tables are arrays with features
+      as columns, e.g. "bus_voltages".
+
+    Args:
+        path: Path to the folder of the dataset.
+        cache_size: Number of recently decoded cases to keep.
+
+    Attributes:
+        path: Path to the folder of the dataset.
+        cache_size: Max number of decoded cases in the cache.
+        timestamps: Sorted timestamps of available cases.
+    """
+
+    def __init__(self, path: str, cache_size: int = DATASET_CACHE_SIZE) -> None:
+        """Random access to built power flow cases."""
+        self.path = path
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        path_meta = os.path.join(path, "meta.json")
+        if is_sharded(path):
+            self._source = _ShardSource(path)
+        elif not os.path.isfile(path_meta):
+            self._source = _JsonSource(path)
+        else:
+            with open(path_meta) as file:
+                is_arrays = "arrays" in json.load(file)
+            self._source = _ArraysSource(path) if is_arrays else _IndexSource(path)
+        self.timestamps = self._source.timestamps
+        self._timestamps = set(self.timestamps)
+
+    @property
+    def tables(self) -> list[str]:
+        """Names of tables available in cases."""
+        return self._source.get_tables()
+
+    def __len__(self) -> int:
+        """Number of available cases."""
+        return len(self.timestamps)
+
+    def read(
+        self, timestamp: str, tables: Optional[list[str]] = None
+    ) -> dict[str, Any]:
+        """Get tables of the case.
+
+        Args:
+            timestamp: Datetime of the case.
+            tables: Names of tables to decode. If None, all tables are decoded.
+
+        Returns:
+            Decoded tables by names. Cached tables are shared between calls,
+              so they must not be modified.
+
+        Raises:
+            ValueError: Error if there is no case for the timestamp.
+        """
+        if timestamp not in self._timestamps:
+            raise ValueError(f"There is no case for the timestamp {timestamp}.")
+        tables = self.tables if tables is None else tables
+        case = self._cache.get(timestamp)
+        if case is None:
+            case = {}
+            self._cache[timestamp] = case
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        else:
+            self._cache.move_to_end(timestamp)
+
+        # Decode only tables which are not cached yet
+        missing = [table for table in tables if table not in case]
+        if missing:
+            case.update(self._source.read(timestamp, missing))
+        return {table: case[table] for table in tables}
+
+    def read_range(
+        self,
+        start: Optional[str] = None,
+        end: Optional[str] = None,
+        tables: Optional[list[str]] = None,
+    ) -> Iterator[tuple[str, dict[str, Any]]]:
+        """Iterate over cases within the range of timestamps.
+
+        Args:
+            start: First timestamp of the range (inclusive).
+            end: Last timestamp of the range (inclusive).
+            tables: Names of tables to decode. If None, all tables are decoded.
+
+        Yields:
+            Timestamp and decoded tables of each case in the order of time.
+        """
+        for timestamp in self.timestamps:
+            if start is not None and timestamp < start:
+                continue
+            if end is not None and timestamp > end:
+                break
+            yield timestamp, self.read(timestamp, tables)
+
+    def clear_cache(self) -> None:
+        """Remove all decoded cases from the cache."""
+        self._cache.clear()
+
+
+class _JsonSource:
+    """Cases saved as JSON files of pandapower.
+
+    Tables are serialized as separate strings within the file, so the file is
+    parsed without tables, and only requested tables are decoded.
+
+    Args:
+        path: Path to the folder with samples.
+    """
+
+    def __init__(self, path: str) -> None:
+        """Cases saved as JSON files of pandapower."""
+        self._path = path
+        self._tables = None
+        names = {}
+        with os.scandir(path) as iterator:
+            for entry in iterator:
+                sample_name, extension = os.path.splitext(entry.name)
+                if extension != ".json":
+                    continue
+                try:
+                    moment = datetime.strptime(sample_name, SAMPLE_NAME_FORMAT)
+                except ValueError:
+                    continue
+                names[moment.strftime(DATE_FORMAT)] = entry.name
+        self._names = names
+        self.timestamps = sorted(names)
+
+    def get_tables(self) -> list[str]:
+        """Get names of tables of the first case.
+
+        Returns:
+            Names of tables.
+        """
+        if self._tables is None:
+            self._tables = list(self._load(self.timestamps[0])) if self._names else []
+        return self._tables
+
+    def read(self, timestamp: str, tables: list[str]) -> dict[str, Any]:
+        """Decode tables of the case.
+
+        Args:
+            timestamp: Datetime of the case.
+            tables: Names of tables.
+
+        Returns:
+            Decoded tables by names.
+        """
+        from pandapower.io_utils import pp_hook
+
+        serialized = self._load(timestamp)
+        decoded = {}
+        for table in tables:
+            value = serialized[table]
+            decoded[table] = pp_hook(value) if isinstance(value, dict) else value
+        return decoded
+
+    def _load(self, timestamp: str) -> dict[str, Any]:
+        """Parse the file of the case without decoding tables.
+
+        Args:
+            timestamp: Datetime of the case.
+
+        Returns:
+            Serialized tables by names.
+        """
+        with open(os.path.join(self._path, self._names[timestamp])) as file:
+            return json.load(file)["_object"]
+
+
+class _ShardSource(_JsonSource):
+    """Cases saved in compressed shards.
+
+    Only the case is decompressed, and its tables are decoded as in JSON files.
+
+    Args:
+        path: Path to the folder with shards.
+    """
+
+    def __init__(self, path: str) -> None:
+        """Cases saved in compressed shards."""
+        self._shards = SampleShards(path)
+        self._tables = None
+        self.timestamps = self._shards.timestamps
+        self._names = set(self.timestamps)
+
+    def _load(self, timestamp: str) -> dict[str, Any]:
+        """Decompress and parse the case without decoding tables.
+
+        Args:
+            timestamp: Datetime of the case.
+
+        Returns:
+            Serialized tables by names.
+        """
+        return json.loads(self._shards.get(timestamp))["_object"]
+
+
+class _IndexSource:
+    """Cases stored in the results index.
+
+    Args:
+        path: Path to the folder of the index.
+    """
+
+    def __init__(self, path: str) -> None:
+        """Cases stored in the results index."""
+        self._index = ResultsIndex(path)
+        self.timestamps = self._index.timestamps.tolist()
+
+    def get_tables(self) -> list[str]:
+        """Get names of tables.
+
+        Returns:
+            Names of tables.
+        """
+        return ["summary", *self._index.variables]
+
+    def read(self, timestamp: str, tables: list[str]) -> dict[str, Any]:
+        """Take rows of the case from memory-mapped columns.
+
+        Args:
+            timestamp: Datetime of the case.
+            tables: Names of tables.
+
+        Returns:
+            Summary of the case and result variables of elements by element
+              types.
+        """
+        index = self._index
+        position = int(np.searchsorted(index.timestamps, timestamp))
+        decoded = {}
+        for table in tables:
+            if table == "summary":
+                decoded[table] = index.summary.iloc[position]
+                continue
+            decoded[table] = pd.DataFrame(
+                {
+                    variable: index._load(f"values/{table}.{variable}")[position]
+                    for variable in index.variables[table]
+                },
+                index=pd.Index(index.element_names[table], name="element_name"),
+            )
+        return decoded
+
+
+class _ArraysSource:
+    """Cases stored in arrays of results.
+
+    Args:
+        path: Path to the folder of arrays.
+    """
+
+    def __init__(self, path: str) -> None:
+        """Cases stored in arrays of results."""
+        self._arrays, self._meta = load_arrays(path)
+        self._positions = {
+            timestamp: position
+            for position, timestamp in enumerate(self._arrays["timestamps"].tolist())
+        }
+        self.timestamps = sorted(self._positions)
+
+    def get_tables(self) -> list[str]:
+        """Get names of tables.
+
+        Returns:
+            Names of tables.
+        """
+        return list(self._meta["arrays"])
+
+    def read(self, timestamp: str, tables: list[str]) -> dict[str, Any]:
+        """Take rows of the case from memory-mapped arrays.
+
+        Args:
+            timestamp: Datetime of the case.
+            tables: Names of tables.
+
+        Returns:
+            Features of elements by names of arrays.
+        """
+        position = self._positions[timestamp]
+        decoded = {}
+        for table in tables:
+            meta = self._meta["arrays"][table]
+            decoded[table] = pd.DataFrame(
+                np.asarray(self._arrays[table][position]),
+                index=pd.Index(meta["element_names"], name="element_name"),
+                columns=meta["features"],
+            )
+        return decoded
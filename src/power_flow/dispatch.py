@@ -0,0 +1,435 @@
+import sys
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from scipy.optimize import linprog
+
+from definitions import (
+    DATE_FORMAT,
+    DISPATCH_HORIZON_HOURS,
+    DISPATCH_PENALTY_USD_PER_MWH,
+)
+from src.power_flow.sensitivities import get_outage_sensitivities, load_sensitivities
+from src.utils.app_logger import get_logger
+from src.utils.data_loaders import load_df_data
+
+# Violations of constraints which are ignored
+_TOLERANCE_MW = 1e-3
+
+# Share of ratings above which branch flows are limited in the dispatch problem
+_MONITORED_SHARE = 0.95
+
+
+def dispatching(
+    buses: str | pd.DataFrame,
+    branches: str | pd.DataFrame,
+    branches_ts: str | pd.DataFrame,
+    loads: str | pd.DataFrame,
+    loads_ts: str | pd.DataFrame,
+    gens: str | pd.DataFrame,
+    gens_ts: str | pd.DataFrame,
+    gen_costs_ts: str | pd.DataFrame,
+    path_dispatch: Optional[str] = None,
+) -> Optional[pd.DataFrame]:
+    """Find outputs of optimized gens by multi-period economic dispatch.
+
+    All timestamps (or windows of `DISPATCH_HORIZON_HOURS`) are formulated as
+    one sparse DC OPF linear problem which minimizes generation costs subject
+    to power balances, branch ratings, and ramp limits between timestamps (see
+    `solve_dispatch`). The problem is solved with HiGHS. Outputs of
+    non-optimized gens are fixed, and branch flows are estimated using PTDF of
+    the topology of each timestamp.
+
+    Args:
+        buses: Path or DataFrame with bus data.
+        branches: Path or DataFrame with branch data.
+        branches_ts: Path or DataFrame with branch time-series data.
+        loads: Path or DataFrame with load data.
+        loads_ts: Path or DataFrame with load time-series data.
+        gens: Path or DataFrame with generation data.
+        gens_ts: Path or DataFrame with generation time-series data.
+        gen_costs_ts: Path or DataFrame with time-series data of marginal costs
+          and ramp limits of optimized gens.
+        path_dispatch: Path to save outputs of optimized gens.
+
+    Returns:
+        Outputs of optimized gens or None if `path_dispatch` is passed and
+          the data were saved.
+    """
+    logger = get_logger(__name__)
+
+    # Load data
+    buses = load_df_data(
+        data=buses,
+        dtypes={
+            "bus_name": str,
+            "in_service": bool,
+            "v_rated_kv": float,
+            "is_slack": bool,
+        },
+    )
+    branches = load_df_data(
+        data=branches,
+        dtypes={
+            "branch_name": str,
+            "from_bus": str,
+            "to_bus": str,
+            "parallel": int,
+            "in_service": bool,
+            "r_ohm": float,
+            "x_ohm": float,
+            "b_µs": float,
+            "trafo_ratio_rel": float,
+            "max_i_ka": float,
+        },
+    )
+    branches_ts = load_df_data(
+        data=branches_ts,
+        dtypes={"datetime": str, "branch_name": str, "in_service": bool},
+    )
+    loads = load_df_data(data=loads, dtypes={"load_name": str, "bus_name": str})
+    loads_ts = load_df_data(
+        data=loads_ts,
+        dtypes={"datetime": str, "load_name": str, "in_service": bool, "p_mw": float},
+    )
+    gens = load_df_data(
+        data=gens, dtypes={"gen_name": str, "bus_name": str, "opt_category": str}
+    )
+    gens_ts = load_df_data(
+        data=gens_ts,
+        dtypes={
+            "datetime": str,
+            "gen_name": str,
+            "in_service": bool,
+            "p_mw": float,
+            "max_p_mw": float,
+            "min_p_mw": float,
+        },
+    )
+    gen_costs_ts = load_df_data(
+        data=gen_costs_ts,
+        dtypes={
+            "datetime": str,
+            "gen_name": str,
+            "cost_usd_per_mwh": float,
+            "max_ramp_up_mw_per_min": float,
+            "max_ramp_down_mw_per_min": float,
+        },
+    )
+
+    # Network matrices are ordered by bus and branch names
+    sensitivities = load_sensitivities(buses, branches)
+    bus_names = pd.Index(sensitivities["bus_names"])
+    branches = branches.set_index("branch_name").loc[sensitivities["branch_names"]]
+    v_rated_kv = buses.set_index("bus_name").loc[branches["from_bus"], "v_rated_kv"]
+    ratings_mw = (
+        3**0.5
+        * v_rated_kv.values
+        * branches["max_i_ka"].values
+        * branches["parallel"]
+    ).values
+
+    # Time-series as tables of timestamps x elements
+    status = branches_ts.pivot(
+        index="datetime", columns="branch_name", values="in_service"
+    )[branches.index]
+    timestamps = status.index
+    loads_ts["p_mw"] = loads_ts["p_mw"].where(loads_ts["in_service"], 0)
+    load_p = loads_ts.pivot(index="datetime", columns="load_name", values="p_mw")
+    gens_ts.loc[~gens_ts["in_service"], ["p_mw", "max_p_mw", "min_p_mw"]] = 0
+    is_optimized = gens["opt_category"] != "non_optimized"
+    gen_p = gens_ts.pivot(index="datetime", columns="gen_name", values="p_mw")
+
+    # Fixed injections of loads and non-optimized gens at buses
+    loads = loads.set_index("load_name").loc[load_p.columns]
+    fixed_gens = gens.loc[~is_optimized].set_index("gen_name")
+    load_injections = load_p.loc[timestamps].T.groupby(loads["bus_name"]).sum().T
+    gen_injections = (
+        gen_p.loc[timestamps, fixed_gens.index]
+        .T.groupby(fixed_gens["bus_name"])
+        .sum()
+        .T
+    )
+    injections = gen_injections.reindex(
+        columns=bus_names, fill_value=0
+    ) - load_injections.reindex(columns=bus_names, fill_value=0)
+
+    # Limits, costs, and ramps of optimized gens
+    opt_gens = gens.loc[is_optimized].sort_values("gen_name")
+    gen_names = opt_gens["gen_name"].values
+    max_p = gens_ts.pivot(index="datetime", columns="gen_name", values="max_p_mw")
+    min_p = gens_ts.pivot(index="datetime", columns="gen_name", values="min_p_mw")
+    costs = gen_costs_ts.pivot(
+        index="datetime", columns="gen_name", values="cost_usd_per_mwh"
+    ).reindex(index=timestamps, columns=gen_names, fill_value=0)
+    ramps = gen_costs_ts.groupby("gen_name")[
+        ["max_ramp_up_mw_per_min", "max_ramp_down_mw_per_min"]
+    ].first()
+    ramps = ramps.reindex(gen_names)
+    gen_buses = sparse.csr_matrix(
+        (
+            np.ones(len(opt_gens)),
+            (bus_names.get_indexer(opt_gens["bus_name"]), np.arange(len(opt_gens))),
+        ),
+        shape=(len(bus_names), len(opt_gens)),
+    )
+
+    # Minutes between consecutive timestamps to scale ramp limits
+    minutes = pd.to_datetime(timestamps, format=DATE_FORMAT).to_series().diff()
+    minutes = (minutes.dt.total_seconds() / 60).values
+
+    # PTDF of each topology in relation to gen outputs
+    topologies, topology_ids = np.unique(status.values, axis=0, return_inverse=True)
+    ptdfs, base_flows = [], np.empty((len(timestamps), len(branches)))
+    for topology_id, topology in enumerate(topologies):
+        ptdf = get_outage_sensitivities(sensitivities, np.flatnonzero(~topology))
+        ptdf = ptdf["ptdf"]
+        mask = topology_ids == topology_id
+        base_flows[mask] = injections.values[mask] @ ptdf.T
+        ptdfs.append(np.asarray(gen_buses.T @ ptdf.T).T)
+    ptdfs = np.stack(ptdfs)
+    demand_mw = -injections.values.sum(axis=1)
+    ramp_up = ramps["max_ramp_up_mw_per_min"].values[None, :] * minutes[:, None]
+    ramp_down = ramps["max_ramp_down_mw_per_min"].values[None, :] * minutes[:, None]
+    max_p = max_p.loc[timestamps, gen_names].values
+    min_p = min_p.loc[timestamps, gen_names].values
+
+    # Solve windows in order, each starts from outputs of the previous one
+    horizon = DISPATCH_HORIZON_HOURS or len(timestamps)
+    outputs = np.empty((len(timestamps), len(gen_names)))
+    previous = None
+    for start in range(0, len(timestamps), horizon):
+        window = slice(start, start + horizon)
+        outputs[window] = solve_dispatch(
+            ptdfs=ptdfs,
+            topology_ids=topology_ids[window],
+            base_flows=base_flows[window],
+            ratings_mw=ratings_mw,
+            demand_mw=demand_mw[window],
+            max_p=max_p[window],
+            min_p=min_p[window],
+            costs=costs.values[window],
+            ramp_up=ramp_up[window],
+            ramp_down=ramp_down[window],
+            previous=previous,
+        )
+        previous = outputs[window][-1]
+    logger.info(f"Dispatch of {len(timestamps)} timestamps was found.")
+
+    # Return results
+    result = pd.DataFrame(outputs.round(6), index=timestamps, columns=gen_names)
+    result = result.stack(dropna=False).rename("p_mw").reset_index()
+    result.columns = ["datetime", "gen_name", "p_mw"]
+    if path_dispatch:
+        result.to_csv(path_dispatch, header=True, index=False)
+    else:
+        return result
+
+
+def solve_dispatch(
+    ptdfs: np.ndarray,
+    topology_ids: np.ndarray,
+    base_flows: np.ndarray,
+    ratings_mw: np.ndarray,
+    demand_mw: np.ndarray,
+    max_p: np.ndarray,
+    min_p: np.ndarray,
+    costs: np.ndarray,
+    ramp_up: np.ndarray,
+    ramp_down: np.ndarray,
+    previous: Optional[np.ndarray] = None,
+) -> np.ndarray:
+    """Solve the multi-period DC OPF linear problem for consecutive timestamps.
+
+    Variables of each timestamp are gen outputs and positive and negative
+    outputs of the slack. Ramp limits are added for pairs of timestamps where
+    they can be binding. Since only few branch ratings are binding, they are
+    added iteratively: ratings which are violated or close to be binding are
+    added until the solution satisfies all of them. Branch ratings are soft,
+    so their violations are penalized at `DISPATCH_PENALTY_USD_PER_MWH` as
+    well as slack outputs. Ramp limits which are not given (NaN or zero) are
+    not taken into account.
+
+    Args:
+        ptdfs: PTDF matrices of topologies in relation to gen outputs
+          (topologies x branches x gens).
+        topology_ids: Positions of topologies of timestamps in `ptdfs`.
+        base_flows: Branch flows caused by fixed injections of loads and
+          non-optimized gens (timestamps x branches).
+        ratings_mw: Branch ratings.
+        demand_mw: Fixed demand which is not covered by non-optimized gens.
+        max_p: Max outputs of optimized gens (timestamps x gens).
+        min_p: Min outputs of optimized gens (timestamps x gens).
+        costs: Marginal costs of optimized gens (timestamps x gens).
+        ramp_up: Max increase of outputs since the previous timestamp
+          (timestamps x gens). Min outputs of optimized gens are zeros, so ramp
+          limits are always feasible.
+        ramp_down: Max decrease of outputs since the previous timestamp
+          (timestamps x gens).
+        previous: Outputs of optimized gens at the timestamp before the first one.
+
+    Returns:
+        Outputs of optimized gens (timestamps x gens).
+    """
+    periods, gens_count = max_p.shape
+    width = gens_count + 2
+
+    # Power balance of each timestamp, DC flows are lossless
+    balance = np.hstack([np.ones(gens_count), [1, -1]])
+    a_eq = sparse.kron(sparse.identity(periods), balance[None, :], format="csr")
+
+    # Bounds of gen outputs and slack outputs
+    lower = np.zeros((periods, width))
+    upper = np.full((periods, width), np.inf)
+    lower[:, :gens_count], upper[:, :gens_count] = min_p, max_p
+
+    # The first timestamp is limited by outputs before the window
+    if previous is not None:
+        first_lower = np.maximum(min_p[0], previous - _get_ramp_limit(ramp_down[0]))
+        first_upper = np.minimum(max_p[0], previous + _get_ramp_limit(ramp_up[0]))
+        is_valid = first_lower <= first_upper
+        lower[0, :gens_count] = np.where(is_valid, first_lower, min_p[0])
+        upper[0, :gens_count] = np.where(is_valid, first_upper, max_p[0])
+
+    cost = np.zeros((periods, width))
+    cost[:, :gens_count] = costs
+    cost[:, gens_count:] = DISPATCH_PENALTY_USD_PER_MWH
+
+    # Ramp limits of pairs of timestamps where they can be binding, they are
+    # checked only if gens are in service at both timestamps
+    rows, cols, data, b_ramp = [], [], [], []
+    is_in_service = (max_p[1:] > 0) & (max_p[:-1] > 0)
+    for sign, ramp, span in [
+        (1, ramp_up[1:], max_p[1:] - min_p[:-1]),
+        (-1, ramp_down[1:], max_p[:-1] - min_p[1:]),
+    ]:
+        period_ids, gen_ids = np.nonzero(is_in_service & (ramp > 0) & (ramp < span))
+        row_ids = sum(len(b) for b in b_ramp) + np.arange(len(period_ids))
+        rows.extend([row_ids, row_ids])
+        cols.extend([(period_ids + 1) * width + gen_ids, period_ids * width + gen_ids])
+        data.extend([np.full(len(row_ids), sign), np.full(len(row_ids), -sign)])
+        b_ramp.append(ramp[period_ids, gen_ids])
+    b_ramp = np.concatenate(b_ramp)
+    a_ramp = sparse.csr_matrix(
+        (np.concatenate(data), (np.concatenate(rows), np.concatenate(cols))),
+        shape=(len(b_ramp), periods * width),
+    )
+
+    # Add violated branch ratings until all of them are satisfied
+    blocks, b_flow = [], []
+    is_added = np.zeros((2,) + base_flows.shape, dtype=bool)
+    while True:
+        penalties_count = sum(block.shape[0] for block in blocks)
+        a_ub = sparse.hstack(
+            [a_ramp, sparse.csr_matrix((len(b_ramp), penalties_count))], format="csr"
+        )
+        if blocks:
+            a_ub = sparse.vstack([a_ub, _get_soft_constraints(blocks)], format="csr")
+        result = linprog(
+            c=np.concatenate(
+                [cost.ravel(), np.full(penalties_count, DISPATCH_PENALTY_USD_PER_MWH)]
+            ),
+            A_ub=a_ub,
+            b_ub=np.concatenate([b_ramp] + b_flow),
+            A_eq=sparse.hstack(
+                [a_eq, sparse.csr_matrix((periods, penalties_count))], format="csr"
+            ),
+            b_eq=demand_mw,
+            bounds=np.vstack(
+                [
+                    np.column_stack([lower.ravel(), upper.ravel()]),
+                    np.tile([0, np.inf], (penalties_count, 1)),
+                ]
+            ),
+            method="highs",
+        )
+        if result.status != 0:
+            raise ValueError(f"Dispatch is not found: {result.message}")
+        outputs = result.x[: periods * width].reshape(periods, width)[:, :gens_count]
+
+        # Branch flows
+        flows = base_flows + np.einsum(
+            "tbg,tg->tb", ptdfs[topology_ids], outputs, optimize=True
+        )
+        is_violated = [
+            (sign * flows > ratings_mw + _TOLERANCE_MW) & ~is_added[direction]
+            for direction, sign in enumerate([1, -1])
+        ]
+        if not any(mask.any() for mask in is_violated):
+            return outputs
+
+        # Ratings close to be binding are added together with violated ones
+        rows, cols, data, bounds = [], [], [], []
+        for direction, sign in enumerate([1, -1]):
+            to_add = is_violated[direction] | (
+                sign * flows > _MONITORED_SHARE * ratings_mw
+            )
+            to_add &= ~is_added[direction]
+            is_added[direction] |= to_add
+            period_ids, branch_ids = np.nonzero(to_add)
+            row_ids = len(bounds) + np.arange(len(period_ids))
+            coefficients = ptdfs[topology_ids[period_ids], branch_ids]
+            rows.append(np.repeat(row_ids, gens_count))
+            cols.append((period_ids[:, None] * width + np.arange(gens_count)).ravel())
+            data.append(sign * coefficients.ravel())
+            bounds.extend(
+                ratings_mw[branch_ids] - sign * base_flows[period_ids, branch_ids]
+            )
+        blocks.append(
+            sparse.csr_matrix(
+                (np.concatenate(data), (np.concatenate(rows), np.concatenate(cols))),
+                shape=(len(bounds), periods * width),
+            )
+        )
+        b_flow.append(np.asarray(bounds))
+
+
+def _get_soft_constraints(blocks: list[sparse.csr_matrix]) -> sparse.csr_matrix:
+    """Compose the matrix of soft constraints with penalty variables.
+
+    Args:
+        blocks: Constraints added at each iteration.
+
+    Returns:
+        Matrix of constraints where each row has its own penalty variable.
+    """
+    constraints = sparse.vstack(blocks, format="csr")
+    penalties = -sparse.identity(constraints.shape[0], format="csr")
+    return sparse.hstack([constraints, penalties], format="csr")
+
+
+def _get_ramp_limit(ramp: np.ndarray) -> np.ndarray:
+    """Replace ramp limits which are not given with infinite ones.
+
+    Args:
+        ramp: Ramp limits.
+
+    Returns:
+        Ramp limits with infinite values instead of NaNs and zeros.
+    """
+    return np.where(ramp > 0, ramp, np.inf)
+
+
+if __name__ == "__main__":
+    # Check params
+    if len(sys.argv) != 10:
+        raise ValueError(
+            "Incorrect arguments. Usage:\n\tpython "
+            "dispatch.py path_buses path_branches path_branches_ts path_loads "
+            "path_loads_ts path_gens path_gens_ts path_gen_costs_ts path_dispatch\n"
+        )
+
+    # Run
+    dispatching(
+        buses=sys.argv[1],
+        branches=sys.argv[2],
+        branches_ts=sys.argv[3],
+        loads=sys.argv[4],
+        loads_ts=sys.argv[5],
+        gens=sys.argv[6],
+        gens_ts=sys.argv[7],
+        gen_costs_ts=sys.argv[8],
+        path_dispatch=sys.argv[9],
+    )
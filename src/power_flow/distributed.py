@@ -0,0 +1,563 @@
+import json
+import os
+import socket
+import struct
+import sys
+import threading
+import time
+from collections import deque
+from multiprocessing import Process
+from socketserver import StreamRequestHandler, ThreadingTCPServer
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from definitions import (
+    COORDINATOR_ADDRESS,
+    COORDINATOR_CHUNK_SIZE,
+    COORDINATOR_LEASE_S,
+    COORDINATOR_MAX_ATTEMPTS,
+)
+from src.power_flow.builders.base import BasePowerFlowBuilder, merge_stats
+from src.power_flow.building import get_builder
+from src.utils.app_logger import get_logger
+from src.utils.data_loaders import load_df_data
+from src.utils.metrics import get_metrics
+from src.utils.progress import ProgressTracker
+
+# Format of the length prefix of messages (unsigned 4 bytes, network order)
+_LENGTH_FORMAT = "!I"
+
+# Delay before the next request if all chunks are assigned to other workers
+_WAIT_DELAY_S = 1.0
+
+# Attempts to connect to the coordinator if it is not started yet
+_CONNECT_ATTEMPTS = 30
+
+
+def send_message(sock: socket.socket, message: dict) -> None:
+    """Send a JSON message prefixed with its length.
+
+    Args:
+        sock: Connected socket.
+        message: Message to send.
+    """
+    body = json.dumps(message).encode("utf-8")
+    sock.sendall(struct.pack(_LENGTH_FORMAT, len(body)) + body)
+
+
+def receive_message(sock: socket.socket) -> Optional[dict]:
+    """Receive a JSON message sent by `send_message`.
+
+    Args:
+        sock: Connected socket.
+
+    Returns:
+        Message or None if the connection was closed.
+    """
+    header = _receive_exactly(sock, struct.calcsize(_LENGTH_FORMAT))
+    if header is None:
+        return None
+    body = _receive_exactly(sock, struct.unpack(_LENGTH_FORMAT, header)[0])
+    if body is None:
+        return None
+    return json.loads(body)
+
+
+def _receive_exactly(sock: socket.socket, size: int) -> Optional[bytes]:
+    """Receive the exact number of bytes.
+
+    Args:
+        sock: Connected socket.
+        size: Number of bytes.
+
+    Returns:
+        Received bytes or None if the connection was closed before.
+    """
+    buffer = bytearray()
+    while len(buffer) < size:
+        chunk = sock.recv(size - len(buffer))
+        if not chunk:
+            return None
+        buffer.extend(chunk)
+    return bytes(buffer)
+
+
+class Coordinator(ThreadingTCPServer):
+    """TCP coordinator which serves chunks of timestamps to worker hosts.
+
+    Protocol: each message is a JSON object prefixed with its length in 4 bytes.
+    A worker sends {"type": "request"} and receives one of
+    {"type": "chunk", "chunk_id": ..., "timestamps": [...]}, {"type": "wait",
+    "delay_s": ...} if all remaining chunks are assigned to other workers, or
+    {"type": "stop"} if all chunks are finished. After solving a chunk, the
+    worker sends {"type": "result", "chunk_id": ..., "failed": [...],
+    "stats": {...}} with timestamps which did not converge and statistics of
+    solvers. Cases are saved by workers to the shared store.
+
+    Chunks of disconnected workers and chunks which are not finished during
+    the lease are assigned again until the number of attempts is exceeded.
+
+    Args:
+        timestamps: Timestamps of power flow cases to calculate.
+        address: Host and port to listen.
+        chunk_size: Number of timestamps in each chunk.
+        lease_s: Time for a worker to finish a chunk.
+        max_attempts: Max number of assignments of each chunk.
+
+    Attributes:
+        stats: Statistics of solvers merged from all workers (see `stats` of
+          the builder).
+        failed: Timestamps which did not converge or were not solved.
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(
+        self,
+        timestamps: list[str],
+        address: tuple[str, int],
+        chunk_size: int = 24,
+        lease_s: float = 3600,
+        max_attempts: int = 3,
+    ) -> None:
+        """TCP coordinator which serves chunks of timestamps to worker hosts."""
+        self.stats = {}
+        self.failed = []
+        self.lease_s = lease_s
+        self.max_attempts = max_attempts
+        self._logger = get_logger(__name__)
+        self._chunks = [
+            chunk.tolist()
+            for chunk in np.array_split(
+                timestamps, max(1, int(np.ceil(len(timestamps) / chunk_size)))
+            )
+            if len(chunk) > 0
+        ]
+        self._todo = deque(range(len(self._chunks)))
+        self._assigned = {}
+        self._attempts = [0] * len(self._chunks)
+        self._finished = set()
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+        self._start_time = time.perf_counter()
+        self._progress = ProgressTracker(len(timestamps), logger=self._logger)
+        self._metrics = get_metrics()
+        if not self._chunks:
+            self._done.set()
+        super().__init__(address, _WorkerHandler)
+        self._logger.info(
+            f"Coordinator of {len(timestamps)} timestamps in {len(self._chunks)} "
+            f"chunks is listening on {self.server_address[0]}:"
+            f"{self.server_address[1]}."
+        )
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Wait until all chunks are finished.
+
+        Args:
+            timeout: Max time to wait in seconds.
+
+        Returns:
+            True if all chunks are finished.
+        """
+        return self._done.wait(timeout)
+
+    def assign_chunk(self, worker: str) -> dict:
+        """Choose the next chunk for the worker.
+
+        Args:
+            worker: Address of the worker.
+
+        Returns:
+            Message for the worker.
+        """
+        with self._lock:
+            self._release_expired()
+            if self._done.is_set():
+                return {"type": "stop"}
+            if not self._todo:
+                return {"type": "wait", "delay_s": _WAIT_DELAY_S}
+            chunk_id = self._todo.popleft()
+            self._attempts[chunk_id] += 1
+            self._assigned[chunk_id] = (worker, time.monotonic())
+            return {
+                "type": "chunk",
+                "chunk_id": chunk_id,
+                "timestamps": self._chunks[chunk_id],
+            }
+
+    def finish_chunk(self, worker: str, message: dict) -> None:
+        """Save results of the chunk.
+
+        Args:
+            worker: Address of the worker.
+            message: Result message of the worker.
+        """
+        chunk_id = message["chunk_id"]
+        with self._lock:
+            # Results of reassigned chunks can come twice
+            if chunk_id in self._finished:
+                return
+            self._assigned.pop(chunk_id, None)
+            if chunk_id in self._todo:
+                self._todo.remove(chunk_id)
+            self._finished.add(chunk_id)
+            self.failed.extend(message["failed"])
+            merge_stats(self.stats, message["stats"])
+            self._progress.update(
+                len(self._chunks[chunk_id]), failed=len(message["failed"])
+            )
+            self._observe_chunk(chunk_id, len(message["failed"]), message["stats"])
+            self._logger.debug(f"Chunk {chunk_id} was finished by {worker}.")
+            self._check_done()
+
+    def release_worker(self, worker: str) -> None:
+        """Return chunks of the lost worker to the queue.
+
+        Args:
+            worker: Address of the worker.
+        """
+        with self._lock:
+            for chunk_id, (assignee, _) in list(self._assigned.items()):
+                if assignee == worker:
+                    self._logger.warning(
+                        f"Worker {worker} was lost with chunk {chunk_id}."
+                    )
+                    self._release_chunk(chunk_id)
+            self._check_done()
+
+    def _release_expired(self) -> None:
+        """Return chunks which are not finished during the lease to the queue."""
+        now = time.monotonic()
+        for chunk_id, (worker, start) in list(self._assigned.items()):
+            if now - start > self.lease_s:
+                self._logger.warning(
+                    f"Lease of chunk {chunk_id} assigned to {worker} expired."
+                )
+                self._release_chunk(chunk_id)
+        self._check_done()
+
+    def _release_chunk(self, chunk_id: int) -> None:
+        """Assign the chunk again or mark its timestamps as failed.
+
+        Args:
+            chunk_id: Number of the chunk.
+        """
+        del self._assigned[chunk_id]
+        if self._attempts[chunk_id] < self.max_attempts:
+            self._todo.appendleft(chunk_id)
+            return
+        self._logger.error(
+            f"Chunk {chunk_id} failed {self._attempts[chunk_id]} attempts."
+        )
+        self._finished.add(chunk_id)
+        self.failed.extend(self._chunks[chunk_id])
+        self._progress.update(
+            len(self._chunks[chunk_id]), failed=len(self._chunks[chunk_id])
+        )
+        self._observe_chunk(chunk_id, len(self._chunks[chunk_id]))
+
+    def _observe_chunk(
+        self, chunk_id: int, failed_count: int, stats: Optional[dict] = None
+    ) -> None:
+        """Add results of the finished chunk to exported metrics.
+
+        Args:
+            chunk_id: Number of the chunk.
+            failed_count: Number of failed cases of the chunk.
+            stats: Statistics of solvers of the chunk.
+        """
+        if self._metrics is None:
+            return
+        cases_count = len(self._chunks[chunk_id])
+        self._metrics.inc(
+            "power_flow_cases_total", cases_count - failed_count, status="solved"
+        )
+        self._metrics.inc("power_flow_cases_total", failed_count, status="failed")
+        if stats:
+            self._metrics.observe_stats(stats, per_case=False)
+        self._metrics.set(
+            "power_flow_queue_cases",
+            sum(len(self._chunks[todo_id]) for todo_id in self._todo),
+        )
+        self._metrics.flush()
+
+    def _check_done(self) -> None:
+        """Report results if all chunks are finished."""
+        if self._done.is_set() or len(self._finished) < len(self._chunks):
+            return
+        time_s = time.perf_counter() - self._start_time
+        cases_count = sum(len(chunk) for chunk in self._chunks)
+        self._logger.info(
+            f"{cases_count} cases were built in {time_s:.1f} s "
+            f"({cases_count / time_s:.2f} cases per second), "
+            f"{len(self.failed)} failed, "
+            f"{sum(self._attempts) - len(self._chunks)} chunks were reassigned."
+        )
+        self._progress.close()
+        self._done.set()
+
+
+class _WorkerHandler(StreamRequestHandler):
+    """Handler of the connection of one worker."""
+
+    server: Coordinator
+
+    def handle(self) -> None:
+        """Serve requests of the worker until it disconnects."""
+        worker = f"{self.client_address[0]}:{self.client_address[1]}"
+        try:
+            while True:
+                message = receive_message(self.connection)
+                if message is None:
+                    break
+                match message["type"]:
+                    case "request":
+                        send_message(self.connection, self.server.assign_chunk(worker))
+                    case "result":
+                        self.server.finish_chunk(worker, message)
+                    case _:
+                        raise ValueError(f"Unknown message: {message['type']}.")
+        except (OSError, ValueError, KeyError) as error:
+            self.server._logger.warning(f"Connection of {worker} failed: {error}")
+        finally:
+            self.server.release_worker(worker)
+
+
+def run_worker(
+    builder: BasePowerFlowBuilder,
+    address: tuple[str, int],
+    path_samples: Optional[str] = None,
+) -> int:
+    """Solve chunks of timestamps served by the coordinator.
+
+    The base model is built once, and power flow cases are saved to the shared
+    store.
+
+    Args:
+        builder: Builder with loaded data.
+        address: Host and port of the coordinator.
+        path_samples: Path to save power flow cases.
+
+    Returns:
+        Number of solved cases.
+    """
+    logger = get_logger(__name__)
+    builder._ensure_prepared()
+    model = builder._build_base_model()
+    if path_samples:
+        os.makedirs(path_samples, exist_ok=True)
+    sock = _connect(address)
+    cases_count = 0
+    with sock:
+        while True:
+            send_message(sock, {"type": "request"})
+            message = receive_message(sock)
+            if message is None or message["type"] == "stop":
+                break
+            if message["type"] == "wait":
+                time.sleep(message["delay_s"])
+                continue
+
+            # Solve the chunk
+            builder.stats = {}
+            failed = []
+            for timestamp in message["timestamps"]:
+                model, flags = builder._solve_case(model, timestamp, logger)
+                if path_samples:
+                    builder._save_case(model, path_samples, timestamp)
+                if not all(flags):
+                    failed.append(timestamp)
+            cases_count += len(message["timestamps"])
+            send_message(
+                sock,
+                {
+                    "type": "result",
+                    "chunk_id": message["chunk_id"],
+                    "failed": failed,
+                    "stats": builder.stats,
+                },
+            )
+    return cases_count
+
+
+def _connect(address: tuple[str, int]) -> socket.socket:
+    """Connect to the coordinator waiting for it to start.
+
+    Args:
+        address: Host and port of the coordinator.
+
+    Returns:
+        Connected socket.
+
+    Raises:
+        ConnectionError: Error if the coordinator is not available.
+    """
+    for _ in range(_CONNECT_ATTEMPTS):
+        try:
+            return socket.create_connection(address)
+        except ConnectionRefusedError:
+            time.sleep(_WAIT_DELAY_S)
+    raise ConnectionError(f"Coordinator at {address[0]}:{address[1]} is not available.")
+
+
+def run_local(
+    builder: BasePowerFlowBuilder,
+    path_samples: Optional[str] = None,
+    timestamp: Optional[list[str]] = None,
+    workers: int = 2,
+    chunk_size: int = 24,
+) -> Coordinator:
+    """Run the coordinator and local worker processes as stand-ins for hosts.
+
+    Args:
+        builder: Builder with loaded data.
+        path_samples: Path to save power flow cases.
+        timestamp: Timestamps of power flow cases to calculate. If None, all
+          timestamps are calculated.
+        workers: Number of worker processes.
+        chunk_size: Number of timestamps in each chunk.
+
+    Returns:
+        Finished coordinator with statistics and failed timestamps.
+    """
+    timestamps = builder._get_timestamps(timestamp)
+    builder._ensure_prepared()
+    coordinator = Coordinator(
+        timestamps=timestamps,
+        address=("127.0.0.1", 0),
+        chunk_size=chunk_size,
+        lease_s=COORDINATOR_LEASE_S,
+        max_attempts=COORDINATOR_MAX_ATTEMPTS,
+    )
+    thread = threading.Thread(target=coordinator.serve_forever, daemon=True)
+    thread.start()
+    processes = [
+        Process(
+            target=run_worker,
+            args=(builder, coordinator.server_address, path_samples),
+        )
+        for _ in range(workers)
+    ]
+    try:
+        for process in processes:
+            process.start()
+
+        # Workers are restarted if they are lost
+        while not coordinator.wait(timeout=_WAIT_DELAY_S):
+            for i, process in enumerate(processes):
+                if not process.is_alive() and process.exitcode != 0:
+                    processes[i] = Process(
+                        target=run_worker,
+                        args=(builder, coordinator.server_address, path_samples),
+                    )
+                    processes[i].start()
+    finally:
+        for process in processes:
+            process.join(timeout=10 * _WAIT_DELAY_S)
+            if process.is_alive():
+                process.terminate()
+        coordinator.shutdown()
+        coordinator.server_close()
+    return coordinator
+
+
+def coordinating(representative_hours: str | pd.DataFrame) -> None:
+    """Serve chunks of representative timestamps to worker hosts.
+
+    Args:
+        representative_hours: Path or DataFrame with mapping of timestamps to
+          their representative ones.
+    """
+    mapping = load_df_data(
+        data=representative_hours,
+        dtypes={"datetime": str, "representative_datetime": str, "weight": float},
+    )
+    coordinator = Coordinator(
+        timestamps=np.sort(mapping["representative_datetime"].unique()).tolist(),
+        address=COORDINATOR_ADDRESS,
+        chunk_size=COORDINATOR_CHUNK_SIZE,
+        lease_s=COORDINATOR_LEASE_S,
+        max_attempts=COORDINATOR_MAX_ATTEMPTS,
+    )
+    thread = threading.Thread(target=coordinator.serve_forever, daemon=True)
+    thread.start()
+    try:
+        coordinator.wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        coordinator.shutdown()
+        coordinator.server_close()
+
+
+def working(
+    buses: str | pd.DataFrame,
+    branches: str | pd.DataFrame,
+    branches_ts: str | pd.DataFrame,
+    loads: str | pd.DataFrame,
+    loads_ts: str | pd.DataFrame,
+    gens: str | pd.DataFrame,
+    gens_ts: str | pd.DataFrame,
+    gens_dispatch_ts: str | pd.DataFrame,
+    path_samples: str,
+    host: str = COORDINATOR_ADDRESS[0],
+) -> int:
+    """Start a worker which solves chunks served by the coordinator.
+
+    Args:
+        buses: Path or DataFrame with bus data.
+        branches: Path or DataFrame with branch data.
+        branches_ts: Path or DataFrame with branch time-series data.
+        loads: Path or DataFrame with load data.
+        loads_ts: Path or DataFrame with load time-series data.
+        gens: Path or DataFrame with generation data.
+        gens_ts: Path or DataFrame with generation time-series data.
+        gens_dispatch_ts: Path or DataFrame with economic dispatch of gens.
+        path_samples: Path to the shared store of power flow cases.
+        host: Host of the coordinator.
+
+    Returns:
+        Number of solved cases.
+    """
+    builder = get_builder()
+    builder.load_data(
+        buses=buses,
+        branches=branches,
+        branches_ts=branches_ts,
+        loads=loads,
+        loads_ts=loads_ts,
+        gens=gens,
+        gens_ts=gens_ts,
+        gens_dispatch_ts=gens_dispatch_ts,
+    )
+    return run_worker(
+        builder=builder,
+        address=(host, COORDINATOR_ADDRESS[1]),
+        path_samples=path_samples,
+    )
+
+
+if __name__ == "__main__":
+    # Check params
+    usage = (
+        "Incorrect arguments. Usage:\n\tpython "
+        "distributed.py coordinator path_representative_hours\n\tpython "
+        "distributed.py worker path_buses path_branches path_branches_ts "
+        "path_loads path_loads_ts path_gens path_gens_ts path_gens_dispatch_ts "
+        "path_samples [coordinator_host]\n"
+    )
+    if len(sys.argv) < 2:
+        raise ValueError(usage)
+
+    # Run
+    match sys.argv[1]:
+        case "coordinator" if len(sys.argv) == 3:
+            coordinating(representative_hours=sys.argv[2])
+        case "worker" if len(sys.argv) in [11, 12]:
+            working(*sys.argv[2:])
+        case _:
+            raise ValueError(usage)
@@ -0,0 +1,279 @@
+import json
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+from definitions import GRAPHS_CHUNK_SIZE, S_BASE_MVA
+from src.power_flow.arrays import load_arrays
+from src.utils.app_logger import get_logger
+from src.utils.data_loaders import load_df_data
+
+# Name of the file with metadata of graphs
+_META_FILE = "meta.json"
+
+# Static attributes of edges
+_EDGE_ATTRIBUTES = ["r_pu", "x_pu", "b_pu", "rating_mva", "trafo_ratio"]
+
+
+def get_graph_structure(
+    buses: pd.DataFrame, branches: pd.DataFrame, s_base_mva: float = S_BASE_MVA
+) -> dict[str, np.ndarray]:
+    """Compose the edge index and static attributes of edges.
+
+    Buses and branches are ordered by their names as in results of the
+    builder. Each branch is an edge from its from bus to its to bus, and
+    parameters of parallel circuits are combined.
+
+    Args:
+        buses: Bus data.
+        branches: Branch data.
+        s_base_mva: Base power.
+
+    Returns:
+        Arrays:
+          - "edge_index": Positions of from and to buses (2 x branches).
+          - "edge_attr": Resistance, reactance, and susceptance in per units,
+            rating in MVA, and the trafo ratio (1 for lines) of branches
+            (branches x attributes).
+          - "bus_names" and "branch_names": Names of elements.
+    """
+    buses = buses.sort_values("bus_name", ignore_index=True)
+    branches = branches.sort_values("branch_name", ignore_index=True)
+    bus_name_to_id = pd.Series(data=buses.index.values, index=buses["bus_name"])
+    from_ids = bus_name_to_id[branches["from_bus"]].values
+    to_ids = bus_name_to_id[branches["to_bus"]].values
+
+    # Parameters in per units, trafo parameters are given for the from bus
+    v_rated_kv = buses["v_rated_kv"].values[from_ids]
+    z_base = v_rated_kv**2 / s_base_mva
+    parallel = branches["parallel"].values
+    edge_attr = np.column_stack(
+        [
+            branches["r_ohm"].values / z_base / parallel,
+            branches["x_ohm"].values / z_base / parallel,
+            branches["b_µs"].values * 1e-6 * z_base * parallel,
+            3**0.5 * v_rated_kv * branches["max_i_ka"].values * parallel,
+            branches["trafo_ratio_rel"].fillna(1).values,
+        ]
+    )
+    return {
+        "edge_index": np.vstack([from_ids, to_ids]).astype(np.int64),
+        "edge_attr": edge_attr.astype(np.float32),
+        "bus_names": buses["bus_name"].values.astype(str),
+        "branch_names": branches["branch_name"].values.astype(str),
+    }
+
+
+class GraphReader:
+    """Read graphs saved by `exporting_graphs`.
+
+    Graphs are stored in chunks of consecutive hours. Features of nodes and
+    edges of one hour are stored next to each other, so a batch of hours is
+    read from each chunk as one contiguous block.
+
+    Args:
+        path: Path to the folder of graphs.
+
+    Attributes:
+        edge_index: Positions of from and to buses of edges (2 x edges).
+        edge_attr: Static attributes of edges (edges x attributes).
+        timestamps: Timestamps of graphs.
+        is_converged: If power flow of each graph converged.
+        meta: Names of buses, branches, and features, and the chunk size.
+    """
+
+    def __init__(self, path: str) -> None:
+        """Read graphs saved by `exporting_graphs`."""
+        self._path = path
+        with open(os.path.join(path, _META_FILE)) as file:
+            self.meta = json.load(file)
+        self.edge_index = np.load(os.path.join(path, "edge_index.npy"))
+        self.edge_attr = np.load(os.path.join(path, "edge_attr.npy"))
+        self.timestamps = np.load(os.path.join(path, "timestamps.npy"))
+        self.is_converged = np.load(os.path.join(path, "is_converged.npy"))
+        self._chunks = [
+            np.load(os.path.join(path, name), mmap_mode="r")
+            for name in self.meta["chunks"]
+        ]
+
+    def __len__(self) -> int:
+        """Number of graphs."""
+        return len(self.timestamps)
+
+    def read(self, start: int, stop: int) -> tuple[np.ndarray, np.ndarray]:
+        """Read features of consecutive graphs.
+
+        Args:
+            start: Position of the first graph.
+            stop: Position after the last graph.
+
+        Returns:
+            Features of nodes (graphs x buses x features) and features of
+              edges (graphs x branches x features).
+        """
+        chunk_size = self.meta["chunk_size"]
+        stop = min(stop, len(self))
+        nodes, edges = [], []
+        while start < stop:
+            chunk, offset = divmod(start, chunk_size)
+            count = min(stop - start, chunk_size - offset)
+            block = np.array(self._chunks[chunk][offset : offset + count])
+            nodes.append(block["nodes"])
+            edges.append(block["edges"])
+            start += count
+        if len(nodes) == 1:
+            return nodes[0], edges[0]
+        node_shape = (0, *self._chunks[0].dtype["nodes"].shape)
+        edge_shape = (0, *self._chunks[0].dtype["edges"].shape)
+        return (
+            np.concatenate(nodes) if nodes else np.empty(node_shape, np.float32),
+            np.concatenate(edges) if edges else np.empty(edge_shape, np.float32),
+        )
+
+
+def exporting_graphs(
+    buses: str | pd.DataFrame,
+    branches: str | pd.DataFrame,
+    branches_ts: str | pd.DataFrame,
+    path_arrays: str,
+    path_graphs: str,
+    chunk_size: int = GRAPHS_CHUNK_SIZE,
+) -> None:
+    """Export built cases as graphs for graph neural networks.
+
+    The edge index and static attributes of edges are saved once. Features of
+    nodes are taken from bus arrays of results, and features of edges are
+    taken from branch arrays and hourly statuses of branches. They are saved
+    in chunks of `chunk_size` hours, where each hour is one record of nodes
+    and edges (see `GraphReader`).
+
+    Args:
+        buses: Path or DataFrame with bus data.
+        branches: Path or DataFrame with branch data.
+        branches_ts: Path or DataFrame with branch time-series data.
+        path_arrays: Path to arrays of results (see `ArraysWriter`).
+        path_graphs: Path to the folder to save graphs.
+        chunk_size: Number of graphs in each chunk.
+    """
+    logger = get_logger(__name__)
+
+    # Load data
+    buses = load_df_data(data=buses, dtypes={"bus_name": str, "v_rated_kv": float})
+    branches = load_df_data(
+        data=branches,
+        dtypes={
+            "branch_name": str,
+            "from_bus": str,
+            "to_bus": str,
+            "parallel": int,
+            "r_ohm": float,
+            "x_ohm": float,
+            "b_µs": float,
+            "trafo_ratio_rel": float,
+            "max_i_ka": float,
+        },
+    )
+    branches_ts = load_df_data(
+        data=branches_ts,
+        dtypes={"datetime": str, "branch_name": str, "in_service": bool},
+    )
+    arrays, arrays_meta = load_arrays(path_arrays)
+    structure = get_graph_structure(buses, branches)
+    timestamps = arrays["timestamps"]
+
+    # Features are taken from arrays of buses and branches
+    features = {"bus": [], "branch": []}
+    for name, meta in arrays_meta["arrays"].items():
+        element = meta["element_type"]
+        if element not in features:
+            continue
+        assert (
+            meta["element_names"] == structure[f"{element}_names"].tolist()
+        ), f"Elements of the array {name} differ from the network"
+        features[element].append(name)
+    status = (
+        branches_ts.pivot(index="datetime", columns="branch_name", values="in_service")
+        .reindex(index=timestamps, columns=structure["branch_names"])
+        .values.astype(np.float32)
+    )
+
+    # One record per hour, so consecutive hours are contiguous
+    node_names = [
+        f"{name}.{feature}"
+        for name in features["bus"]
+        for feature in arrays_meta["arrays"][name]["features"]
+    ]
+    edge_names = [
+        f"{name}.{feature}"
+        for name in features["branch"]
+        for feature in arrays_meta["arrays"][name]["features"]
+    ] + ["in_service"]
+    dtype = np.dtype(
+        [
+            ("nodes", np.float32, (len(structure["bus_names"]), len(node_names))),
+            ("edges", np.float32, (len(structure["branch_names"]), len(edge_names))),
+        ]
+    )
+
+    # Save chunks
+    os.makedirs(path_graphs, exist_ok=True)
+    chunks = []
+    for start in range(0, len(timestamps), chunk_size):
+        stop = min(start + chunk_size, len(timestamps))
+        chunk_name = f"graphs_{len(chunks):05d}.npy"
+        chunk = np.lib.format.open_memmap(
+            os.path.join(path_graphs, chunk_name),
+            mode="w+",
+            dtype=dtype,
+            shape=(stop - start,),
+        )
+        chunk["nodes"] = np.concatenate(
+            [arrays[name][start:stop] for name in features["bus"]], axis=2
+        )
+        chunk["edges"] = np.concatenate(
+            [arrays[name][start:stop] for name in features["branch"]]
+            + [status[start:stop, :, None]],
+            axis=2,
+        )
+        chunk.flush()
+        chunks.append(chunk_name)
+
+    # Structure and metadata
+    np.save(os.path.join(path_graphs, "edge_index.npy"), structure["edge_index"])
+    np.save(os.path.join(path_graphs, "edge_attr.npy"), structure["edge_attr"])
+    for name in ["timestamps", "is_converged", "weights"]:
+        np.save(os.path.join(path_graphs, f"{name}.npy"), arrays[name])
+    meta = {
+        "count": len(timestamps),
+        "chunk_size": chunk_size,
+        "chunks": chunks,
+        "node_features": node_names,
+        "edge_features": edge_names,
+        "edge_attributes": _EDGE_ATTRIBUTES,
+        "bus_names": structure["bus_names"].tolist(),
+        "branch_names": structure["branch_names"].tolist(),
+    }
+    with open(os.path.join(path_graphs, _META_FILE), "w") as file:
+        json.dump(meta, file, indent=2)
+    logger.info(f"{len(timestamps)} graphs were saved in {len(chunks)} chunks.")
+
+
+if __name__ == "__main__":
+    # Check params
+    if len(sys.argv) != 6:
+        raise ValueError(
+            "Incorrect arguments. Usage:\n\tpython "
+            "graphs.py path_buses path_branches path_branches_ts path_arrays "
+            "path_graphs\n"
+        )
+
+    # Run
+    exporting_graphs(
+        buses=sys.argv[1],
+        branches=sys.argv[2],
+        branches_ts=sys.argv[3],
+        path_arrays=sys.argv[4],
+        path_graphs=sys.argv[5],
+    )
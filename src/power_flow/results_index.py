@@ -0,0 +1,408 @@
+import json
+import os
+import sqlite3
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from definitions import (
+    RESULT_LIMITS,
+    RESULTS_INDEX_GEN_TOLERANCE_MW,
+    RESULTS_INDEX_VARIABLES,
+)
+
+# Name of the file with metadata of the index
+_META_FILE = "meta.json"
+
+# Columns of per-hour summaries
+_SUMMARY_COLUMNS = [
+    "weight",
+    "is_opf_converged",
+    "is_pf_converged",
+    "min_vm_pu",
+    "max_vm_pu",
+    "max_loading_percent",
+    "gen_p_mw",
+    "slack_p_mw",
+    "losses_mw",
+    "overloads_count",
+    "voltage_violations_count",
+    "binding_gens_count",
+]
+
+
+class ResultsIndexWriter:
+    """Collect an index of results while cases are built.
+
+    For each case, summary values (convergence, extreme voltages and loadings,
+    generation, losses, and numbers of violations) and values of variables
+    listed in `RESULTS_INDEX_VARIABLES` are kept. Elements with values outside
+    `RESULT_LIMITS` and optimized gens at their output limits are flagged. The
+    index is saved as a folder of `.npy` columns, which are memory-mapped by
+    `ResultsIndex`.
+
+    Args:
+        element_names: Names of elements for each element type in the order
+          used in results (see `_get_element_names` of the builder).
+        weights: Weights of timestamps, e.g. numbers of timestamps represented
+          by them. Timestamps which are not listed have the weight of 1.
+        variables: Variables to keep for each element type.
+        limits: Limits of variables in the format
+          {<element type>: {<variable>: (<lower>, <upper>)}}, None means no limit.
+        gen_tolerance_mw: Max distance of gen outputs to their limits at which
+          limits are considered binding.
+
+    Attributes:
+        element_names: Names of elements for each element type.
+        weights: Weights of timestamps.
+    """
+
+    def __init__(
+        self,
+        element_names: dict[str, list[str]],
+        weights: Optional[dict[str, float]] = None,
+        variables: dict[str, list[str]] = RESULTS_INDEX_VARIABLES,
+        limits: dict = RESULT_LIMITS,
+        gen_tolerance_mw: float = RESULTS_INDEX_GEN_TOLERANCE_MW,
+    ) -> None:
+        """Collect an index of results while cases are built."""
+        self.element_names = element_names
+        self.weights = weights or {}
+        self._variables = variables
+        self._limits = limits
+        self._gen_tolerance_mw = gen_tolerance_mw
+        self._timestamps = []
+        self._summary = {col: [] for col in _SUMMARY_COLUMNS}
+        self._values = {
+            (element, variable): []
+            for element, element_variables in variables.items()
+            for variable in element_variables
+        }
+        self._flags = {}
+
+    def update(self, record: dict) -> None:
+        """Add results of a case.
+
+        Args:
+            record: Timestamp, convergence flags, and result arrays for each
+              element type (see `_get_record` of the builder).
+        """
+        position = len(self._timestamps)
+        self._timestamps.append(record["timestamp"])
+        for (element, variable), rows in self._values.items():
+            rows.append(np.asarray(record[element][variable], dtype=np.float32))
+
+        # Elements outside limits, NaNs of not converged cases are not flagged
+        counts = {}
+        for element, element_limits in self._limits.items():
+            for variable, (lower, upper) in element_limits.items():
+                values = record[element][variable]
+                for suffix, limit, is_violated in [
+                    ("below", lower, np.less),
+                    ("above", upper, np.greater),
+                ]:
+                    if limit is None:
+                        continue
+                    flag = f"{element}.{variable}.{suffix}"
+                    elements = np.flatnonzero(is_violated(values, limit))
+                    self._add_flag(flag, position, elements)
+                    counts[element] = counts.get(element, 0) + len(elements)
+
+        # Limits are NaNs for gens which outputs are fixed
+        gen = record["gen"]
+        binding_count = 0
+        for flag, limit in [
+            ("gen.p_mw.at_min", gen["min_p_mw"]),
+            ("gen.p_mw.at_max", gen["max_p_mw"]),
+        ]:
+            elements = np.flatnonzero(
+                np.abs(gen["p_mw"] - limit) <= self._gen_tolerance_mw
+            )
+            self._add_flag(flag, position, elements)
+            binding_count += len(elements)
+
+        # Summary of the case, bus powers are positive for consumption
+        bus, branch = record["bus"], record["branch"]
+        is_converged = record["is_pf_converged"]
+        summary = self._summary
+        summary["weight"].append(float(self.weights.get(record["timestamp"], 1)))
+        summary["is_opf_converged"].append(record["is_opf_converged"])
+        summary["is_pf_converged"].append(is_converged)
+        for col, function, values in [
+            ("min_vm_pu", np.nanmin, bus["vm_pu"]),
+            ("max_vm_pu", np.nanmax, bus["vm_pu"]),
+            ("max_loading_percent", np.nanmax, branch["loading_percent"]),
+            ("gen_p_mw", np.nansum, gen["p_mw"]),
+            ("slack_p_mw", np.nansum, record["ext_grid"]["p_mw"]),
+            ("losses_mw", np.nansum, -bus["p_mw"]),
+        ]:
+            summary[col].append(function(values) if is_converged else np.nan)
+        summary["overloads_count"].append(counts.get("branch", 0))
+        summary["voltage_violations_count"].append(counts.get("bus", 0))
+        summary["binding_gens_count"].append(binding_count)
+
+    def save(self, path_index: str) -> None:
+        """Save the index sorted by timestamps.
+
+        Args:
+            path_index: Path to the folder of the index.
+        """
+        timestamps = np.array(self._timestamps, dtype=str)
+        order = np.argsort(timestamps, kind="stable")
+        positions = np.empty_like(order)
+        positions[order] = np.arange(len(order))
+        for folder in ["summary", "values", "flags"]:
+            os.makedirs(os.path.join(path_index, folder), exist_ok=True)
+        np.save(os.path.join(path_index, "timestamps.npy"), timestamps[order])
+
+        # Summary columns
+        for col, values in self._summary.items():
+            array = np.asarray(values)[order]
+            np.save(os.path.join(path_index, "summary", f"{col}.npy"), array)
+
+        # Matrices of hours x elements
+        for (element, variable), rows in self._values.items():
+            size = len(self.element_names[element])
+            array = np.vstack(rows) if rows else np.empty((0, size), np.float32)
+            np.save(
+                os.path.join(path_index, "values", f"{element}.{variable}.npy"),
+                array[order],
+            )
+
+        # Flags are stored by elements: hours of the element j are
+        # `hours[indptr[j]:indptr[j + 1]]` in the ascending order
+        for flag, (hours, elements) in self._flags.items():
+            element = flag.split(".")[0]
+            hours = positions[np.concatenate(hours)] if hours else np.empty(0, int)
+            elements = np.concatenate(elements) if elements else np.empty(0, int)
+            sorting = np.lexsort((hours, elements))
+            counts = np.bincount(elements, minlength=len(self.element_names[element]))
+            indptr = np.concatenate([[0], np.cumsum(counts)])
+            np.save(os.path.join(path_index, "flags", f"{flag}.indptr.npy"), indptr)
+            np.save(
+                os.path.join(path_index, "flags", f"{flag}.hours.npy"),
+                hours[sorting].astype(np.int32),
+            )
+
+        meta = {
+            "element_names": self.element_names,
+            "summary": list(self._summary),
+            "values": [f"{element}.{variable}" for element, variable in self._values],
+            "flags": sorted(self._flags),
+            "limits": self._limits,
+            "gen_tolerance_mw": self._gen_tolerance_mw,
+        }
+        with open(os.path.join(path_index, _META_FILE), "w") as file:
+            json.dump(meta, file, indent=2)
+
+    def _add_flag(self, flag: str, position: int, elements: np.ndarray) -> None:
+        """Add flagged elements of the case.
+
+        Args:
+            flag: Name of the flag.
+            position: Position of the case in the order of updates.
+            elements: Positions of flagged elements.
+        """
+        hours, flagged = self._flags.setdefault(flag, ([], []))
+        if len(elements):
+            hours.append(np.full(len(elements), position))
+            flagged.append(elements)
+
+
+class ResultsIndex:
+    """Query the index of results saved by `ResultsIndexWriter`.
+
+    Summary columns are loaded at once, matrices of variables and flags are
+    memory-mapped, so only queried columns are read from disk.
+
+    Args:
+        path_index: Path to the folder of the index.
+
+    Attributes:
+        timestamps: Sorted timestamps of cases.
+        element_names: Names of elements for each element type.
+        summary: Summary of each case indexed by timestamps.
+        variables: Variables with values for each element type.
+        flags: Names of flags, e.g. "branch.loading_percent.above".
+    """
+
+    def __init__(self, path_index: str) -> None:
+        """Query the index of results saved by `ResultsIndexWriter`."""
+        self._path = path_index
+        with open(os.path.join(path_index, _META_FILE)) as file:
+            self._meta = json.load(file)
+        self.element_names = self._meta["element_names"]
+        self.flags = self._meta["flags"]
+        self.variables = {}
+        for name in self._meta["values"]:
+            element, variable = name.split(".")
+            self.variables.setdefault(element, []).append(variable)
+        self.timestamps = np.load(os.path.join(path_index, "timestamps.npy"))
+        self.summary = pd.DataFrame(
+            {
+                col: np.load(os.path.join(path_index, "summary", f"{col}.npy"))
+                for col in self._meta["summary"]
+            },
+            index=pd.Index(self.timestamps, name="datetime"),
+        )
+        self._positions = {
+            element: pd.Series(np.arange(len(names)), index=names)
+            for element, names in self.element_names.items()
+        }
+        self._arrays = {}
+
+    def query(self, expr: str) -> pd.DataFrame:
+        """Select cases by summary columns.
+
+        Args:
+            expr: Expression of `DataFrame.query`, e.g.
+              "max_loading_percent > 90 and is_pf_converged".
+
+        Returns:
+            Summary of selected cases.
+        """
+        return self.summary.query(expr)
+
+    def values(
+        self,
+        element: str,
+        variable: str,
+        names: Optional[list[str]] = None,
+        start: Optional[str] = None,
+        end: Optional[str] = None,
+    ) -> pd.DataFrame:
+        """Get values of the variable.
+
+        Args:
+            element: Element type.
+            variable: Result variable.
+            names: Names of elements. If None, all elements are returned.
+            start: First timestamp of the range (inclusive).
+            end: Last timestamp of the range (inclusive).
+
+        Returns:
+            Values with timestamps as the index and element names as columns.
+        """
+        rows = self._get_rows(start, end)
+        array = self._load(f"values/{element}.{variable}")
+        names = self.element_names[element] if names is None else names
+        cols = self._positions[element][names].values
+        return pd.DataFrame(
+            array[rows][:, cols], index=self.summary.index[rows], columns=names
+        )
+
+    def select(
+        self,
+        element: str,
+        variable: str,
+        name: str,
+        lower: Optional[float] = None,
+        upper: Optional[float] = None,
+    ) -> np.ndarray:
+        """Find cases where the variable of the element is within the range.
+
+        Args:
+            element: Element type.
+            variable: Result variable.
+            name: Name of the element.
+            lower: Min value (inclusive). If None, not limited.
+            upper: Max value (inclusive). If None, not limited.
+
+        Returns:
+            Timestamps of found cases.
+        """
+        array = self._load(f"values/{element}.{variable}")
+        values = array[:, self._positions[element][name]]
+        mask = ~np.isnan(values)
+        if lower is not None:
+            mask &= values >= lower
+        if upper is not None:
+            mask &= values <= upper
+        return self.timestamps[mask]
+
+    def flagged(self, flag: str, name: Optional[str] = None) -> pd.DataFrame:
+        """Get cases and elements with the flag.
+
+        Args:
+            flag: Name of the flag, e.g. "bus.vm_pu.below" or "gen.p_mw.at_max".
+            name: Name of the element. If None, all elements are returned.
+
+        Returns:
+            Pairs of timestamps and element names sorted by elements and
+              timestamps.
+        """
+        element = flag.split(".")[0]
+        indptr = self._load(f"flags/{flag}.indptr")
+        hours = self._load(f"flags/{flag}.hours")
+        if name is None:
+            counts = np.diff(indptr)
+            elements = np.repeat(np.arange(len(counts)), counts)
+        else:
+            position = self._positions[element][name]
+            hours = hours[indptr[position] : indptr[position + 1]]
+            elements = np.full(len(hours), position)
+        return pd.DataFrame(
+            {
+                "datetime": self.timestamps[hours],
+                "element_name": np.asarray(self.element_names[element])[elements],
+            }
+        )
+
+    def to_sqlite(self, path_db: str) -> None:
+        """Export summaries and flags to a SQLite database.
+
+        Tables: "summary" with one row per case and "flags" with columns flag,
+        datetime, and element_name. Both are indexed for lookups.
+
+        Args:
+            path_db: Path to the database file.
+        """
+        flags = pd.concat(
+            [self.flagged(flag).assign(flag=flag) for flag in self.flags],
+            ignore_index=True,
+        )
+        with sqlite3.connect(path_db) as connection:
+            self.summary.to_sql("summary", connection, if_exists="replace")
+            flags.to_sql("flags", connection, if_exists="replace", index=False)
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS flags_lookup "
+                "ON flags (flag, element_name, datetime)"
+            )
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS summary_datetime ON summary (datetime)"
+            )
+
+    def _get_rows(self, start: Optional[str], end: Optional[str]) -> slice:
+        """Find positions of cases within the range of timestamps.
+
+        Args:
+            start: First timestamp of the range (inclusive).
+            end: Last timestamp of the range (inclusive).
+
+        Returns:
+            Slice of sorted cases.
+        """
+        first = 0 if start is None else np.searchsorted(self.timestamps, start)
+        last = (
+            len(self.timestamps)
+            if end is None
+            else np.searchsorted(self.timestamps, end, side="right")
+        )
+        return slice(first, last)
+
+    def _load(self, name: str) -> np.ndarray:
+        """Memory-map the array of the index once.
+
+        Args:
+            name: Path to the array within the index without the extension.
+
+        Returns:
+            Memory-mapped array.
+        """
+        array = self._arrays.get(name)
+        if array is None:
+            path = os.path.join(self._path, *name.split("/")) + ".npy"
+            array = np.load(path, mmap_mode="r")
+            self._arrays[name] = array
+        return array
@@ -0,0 +1,387 @@
+import os
+import sys
+import time
+from multiprocessing import Array, Pool, Queue, TimeoutError
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from definitions import (
+    SCENARIO_LOAD_SCALE_STD,
+    SCENARIO_OUTAGE_RATE,
+    SCENARIO_RENEWABLE_ERROR_STD,
+    SCENARIOS_COUNT,
+    SCENARIOS_SEED,
+    WORKERS_COUNT,
+)
+from src.power_flow.builders.base import BasePowerFlowBuilder
+from src.power_flow.building import get_builder
+from src.utils.app_logger import get_logger, start_queue_listener, stop_queue_listener
+from src.utils.data_loaders import load_df_data
+from src.utils.progress import ProgressTracker
+
+# Gen types whose outputs have forecast errors
+_RENEWABLE_TYPES = ("solar", "wind")
+
+# State of a worker process shared by all its tasks
+_worker_state = {}
+
+# Period to update the progress with counters of workers
+_PROGRESS_POLL_S = 1.0
+
+
+def _init_worker(
+    builder: BasePowerFlowBuilder,
+    template: bytes,
+    base: dict[str, np.ndarray],
+    path_scenarios: str,
+    queue: Queue,
+    counters: Array,
+) -> None:
+    """Initialize a worker process.
+
+    Args:
+        builder: Builder with prepared data.
+        template: Serialized base model shared by all scenarios.
+        base: Base values of perturbed variables (see `get_base_values`).
+        path_scenarios: Path to save results of scenarios.
+        queue: Queue for logs.
+        counters: Shared numbers of completed and failed cases of all workers.
+    """
+    _worker_state["builder"] = builder
+    _worker_state["model"] = builder.restore_template(template)
+    _worker_state["logger"] = builder._get_process_logger(queue)
+    _worker_state["base"] = base
+    _worker_state["path_scenarios"] = path_scenarios
+    _worker_state["counters"] = counters
+
+
+def _scenario_worker(scenario_id: int) -> tuple[int, dict, int]:
+    """Solve all cases of one scenario and save their results.
+
+    Args:
+        scenario_id: Number of the scenario.
+
+    Returns:
+        Number of solved cases, solver statistics, and size of saved results
+          in bytes.
+    """
+    builder = _worker_state["builder"]
+    model = _worker_state["model"]
+    logger = _worker_state["logger"]
+    base = _worker_state["base"]
+    counters = _worker_state["counters"]
+    builder.stats = {}
+
+    # Perturbations are generated for the whole year at once
+    values = get_scenario_values(base, scenario_id)
+    records = []
+    for time_id, timestamp in enumerate(base["timestamps"]):
+        overrides = _get_overrides(base, values, time_id)
+        model, flags = builder._solve_case(model, timestamp, logger, overrides)
+        records.append(builder._get_record(model, timestamp, *flags))
+        with counters.get_lock():
+            counters[0] += 1
+            counters[1] += not flags[1]
+    _worker_state["model"] = model
+
+    # Results of all cases are saved to one compressed archive
+    path_scenario = os.path.join(
+        _worker_state["path_scenarios"], f"scenario_{scenario_id:05d}.npz"
+    )
+    arrays = {
+        "timestamp": base["timestamps"].astype(str),
+        "is_opf_converged": np.array([r["is_opf_converged"] for r in records]),
+        "is_pf_converged": np.array([r["is_pf_converged"] for r in records]),
+    }
+    for element, variables in records[0].items():
+        if not isinstance(variables, dict):
+            continue
+        for variable in variables:
+            arrays[f"{element}/{variable}"] = np.stack(
+                [r[element][variable] for r in records]
+            ).astype(np.float32)
+    np.savez_compressed(path_scenario, **arrays)
+    return len(records), builder.stats, os.path.getsize(path_scenario)
+
+
+def get_base_values(
+    buses: pd.DataFrame,
+    loads: pd.DataFrame,
+    loads_ts: pd.DataFrame,
+    gens: pd.DataFrame,
+    gens_ts: pd.DataFrame,
+    timestamps: Optional[list[str]] = None,
+) -> dict[str, np.ndarray]:
+    """Convert variables perturbed in scenarios to arrays of timestamps x elements.
+
+    Args:
+        buses: Bus data.
+        loads: Load data.
+        loads_ts: Load time-series data.
+        gens: Generation data.
+        gens_ts: Generation time-series data.
+        timestamps: Timestamps to include. If None, all timestamps are included.
+
+    Returns:
+        Arrays of base values, names of elements, and regions of loads.
+    """
+    if timestamps is None:
+        timestamps = np.sort(loads_ts["datetime"].unique())
+    timestamps = np.asarray(timestamps)
+
+    # Loads are scaled by regions
+    loads = loads.sort_values("load_name", ignore_index=True)
+    regions = loads["bus_name"].map(buses.set_index("bus_name")["region"])
+    region_names, region_ids = np.unique(regions.values, return_inverse=True)
+    loads_ts = loads_ts.pivot(index="datetime", columns="load_name")
+    loads_ts = loads_ts.reindex(timestamps)
+
+    # Renewables have forecast errors, and optimized gens have random outages
+    gen_types = gens["gen_name"].str.replace(r"_\d+$", "", regex=True)
+    renewables = np.sort(gens.loc[gen_types.isin(_RENEWABLE_TYPES), "gen_name"])
+    optimized = np.sort(gens.loc[gens["opt_category"] != "non_optimized", "gen_name"])
+    gens_ts = gens_ts.pivot(index="datetime", columns="gen_name")
+    gens_ts = gens_ts.reindex(timestamps)
+    return {
+        "timestamps": timestamps,
+        "load_names": loads["load_name"].values,
+        "load_region_ids": region_ids,
+        "regions_count": np.array(len(region_names)),
+        "load_p_mw": loads_ts["p_mw"][loads["load_name"]].values.astype(float),
+        "load_q_mvar": loads_ts["q_mvar"][loads["load_name"]].values.astype(float),
+        "renewable_names": renewables,
+        "renewable_p_mw": gens_ts["p_mw"][renewables].values.astype(float),
+        "renewable_max_p_mw": gens_ts["max_p_mw"][renewables].values.astype(float),
+        "optimized_names": optimized,
+        "optimized_in_service": gens_ts["in_service"][optimized].values.astype(bool),
+    }
+
+
+def get_scenario_values(
+    base: dict[str, np.ndarray], scenario_id: int
+) -> dict[str, np.ndarray]:
+    """Generate perturbed values of one scenario.
+
+    Each scenario has its own random generator seeded by `SCENARIOS_SEED` and
+    the scenario number, so scenarios are reproducible in any order.
+
+    Perturbations:
+        Loads are scaled by normal factors which are the same for all loads
+          of a region during the scenario.
+        Outputs of renewables have independent normal relative errors for each
+          timestamp and are limited by max outputs.
+        Optimized gens are out of service with the probability
+          `SCENARIO_OUTAGE_RATE` at each timestamp.
+
+    Args:
+        base: Base values (see `get_base_values`).
+        scenario_id: Number of the scenario.
+
+    Returns:
+        Perturbed values of loads and gens.
+    """
+    rng = np.random.default_rng([SCENARIOS_SEED, scenario_id])
+    scales = rng.normal(1, SCENARIO_LOAD_SCALE_STD, size=int(base["regions_count"]))
+    scales = np.maximum(scales, 0)[base["load_region_ids"]]
+    errors = rng.normal(0, SCENARIO_RENEWABLE_ERROR_STD, base["renewable_p_mw"].shape)
+    renewable_p_mw = np.clip(
+        base["renewable_p_mw"] * (1 + errors), 0, base["renewable_max_p_mw"]
+    )
+    outages = rng.random(base["optimized_in_service"].shape) < SCENARIO_OUTAGE_RATE
+    return {
+        "load_p_mw": base["load_p_mw"] * scales,
+        "load_q_mvar": base["load_q_mvar"] * scales,
+        "renewable_p_mw": renewable_p_mw,
+        "optimized_in_service": base["optimized_in_service"] & ~outages,
+    }
+
+
+def _get_overrides(
+    base: dict[str, np.ndarray], values: dict[str, np.ndarray], time_id: int
+) -> dict:
+    """Compose overrides of the case from perturbed values.
+
+    Args:
+        base: Base values (see `get_base_values`).
+        values: Perturbed values of the scenario (see `get_scenario_values`).
+        time_id: Position of the timestamp.
+
+    Returns:
+        Overrides in the format of `_apply_overrides` of the builder.
+    """
+    loads = {
+        name: {"p_mw": p_mw, "q_mvar": q_mvar}
+        for name, p_mw, q_mvar in zip(
+            base["load_names"],
+            values["load_p_mw"][time_id],
+            values["load_q_mvar"][time_id],
+        )
+    }
+    gens = {
+        name: {"p_mw": p_mw}
+        for name, p_mw in zip(
+            base["renewable_names"], values["renewable_p_mw"][time_id]
+        )
+        if not np.isnan(p_mw)
+    }
+    for name, in_service in zip(
+        base["optimized_names"], values["optimized_in_service"][time_id]
+    ):
+        gens.setdefault(name, {})["in_service"] = float(in_service)
+    return {"loads": loads, "gens": gens}
+
+
+def run_scenarios(
+    builder: BasePowerFlowBuilder,
+    base: dict[str, np.ndarray],
+    path_scenarios: str,
+    scenario_ids: list[int],
+    workers: int = 1,
+) -> None:
+    """Solve cases of scenarios in parallel processes.
+
+    The base model is built once and shared by worker processes, and each
+    worker solves all timestamps of one scenario at a time.
+
+    Args:
+        builder: Builder with loaded data.
+        base: Base values of perturbed variables (see `get_base_values`).
+        path_scenarios: Path to save results of scenarios.
+        scenario_ids: Numbers of scenarios to solve.
+        workers: Number of workers to use.
+    """
+    logger = get_logger(__name__)
+    workers_count = builder._get_workers_count(workers, len(scenario_ids))
+    template = builder.create_template()
+    builder.stats = {}
+    os.makedirs(path_scenarios, exist_ok=True)
+
+    # Thread to capture logs
+    log_queue, log_thread = start_queue_listener(__name__)
+
+    # Workers count solved cases, and the progress of all of them is polled
+    counters = Array("q", 2)
+    progress = ProgressTracker(
+        len(scenario_ids) * len(base["timestamps"]), display=True, logger=logger
+    )
+
+    # Solve scenarios
+    start = time.perf_counter()
+    cases_count, sizes = 0, []
+    initargs = (builder, template, base, path_scenarios, log_queue, counters)
+    with Pool(workers_count, initializer=_init_worker, initargs=initargs) as pool:
+        results = pool.imap_unordered(_scenario_worker, scenario_ids)
+        while len(sizes) < len(scenario_ids):
+            try:
+                scenario_cases, scenario_stats, size = results.next(_PROGRESS_POLL_S)
+                cases_count += scenario_cases
+                sizes.append(size)
+                builder._merge_stats(scenario_stats)
+            except TimeoutError:
+                pass
+            progress.update(
+                counters[0] - progress.completed, counters[1] - progress.failed
+            )
+    progress.close()
+    time_s = time.perf_counter() - start
+
+    # Finish logging thread
+    stop_queue_listener(log_queue, log_thread)
+    builder._log_stats()
+    logger.info(
+        f"{cases_count} cases of {len(scenario_ids)} scenarios were solved in "
+        f"{time_s:.1f} s ({cases_count / time_s:.2f} cases per second), "
+        f"{np.mean(sizes) / 2**20:.2f} MB per scenario."
+    )
+
+
+def simulating(
+    buses: str | pd.DataFrame,
+    branches: str | pd.DataFrame,
+    branches_ts: str | pd.DataFrame,
+    loads: str | pd.DataFrame,
+    loads_ts: str | pd.DataFrame,
+    gens: str | pd.DataFrame,
+    gens_ts: str | pd.DataFrame,
+    path_scenarios: str,
+) -> None:
+    """Solve power flow cases of Monte-Carlo scenarios of the year.
+
+    The number of scenarios and parameters of perturbations are set in
+    definitions. Results of each scenario are saved to a separate archive.
+
+    Args:
+        buses: Path or DataFrame with bus data.
+        branches: Path or DataFrame with branch data.
+        branches_ts: Path or DataFrame with branch time-series data.
+        loads: Path or DataFrame with load data.
+        loads_ts: Path or DataFrame with load time-series data.
+        gens: Path or DataFrame with generation data.
+        gens_ts: Path or DataFrame with generation time-series data.
+        path_scenarios: Path to save results of scenarios.
+    """
+    # Base values of perturbed variables
+    base = get_base_values(
+        buses=load_df_data(data=buses, dtypes={"bus_name": str, "region": str}),
+        loads=load_df_data(data=loads, dtypes={"load_name": str, "bus_name": str}),
+        loads_ts=load_df_data(
+            data=loads_ts,
+            dtypes={"datetime": str, "load_name": str, "p_mw": float, "q_mvar": float},
+        ),
+        gens=load_df_data(data=gens, dtypes={"gen_name": str, "opt_category": str}),
+        gens_ts=load_df_data(
+            data=gens_ts,
+            dtypes={
+                "datetime": str,
+                "gen_name": str,
+                "in_service": bool,
+                "p_mw": float,
+                "max_p_mw": float,
+            },
+        ),
+    )
+
+    # Create builder and load data
+    builder = get_builder()
+    builder.load_data(
+        buses=buses,
+        branches=branches,
+        branches_ts=branches_ts,
+        loads=loads,
+        loads_ts=loads_ts,
+        gens=gens,
+        gens_ts=gens_ts,
+    )
+
+    # Start solving scenarios
+    run_scenarios(
+        builder=builder,
+        base=base,
+        path_scenarios=path_scenarios,
+        scenario_ids=list(range(SCENARIOS_COUNT)),
+        workers=WORKERS_COUNT,
+    )
+
+
+if __name__ == "__main__":
+    # Check params
+    if len(sys.argv) != 9:
+        raise ValueError(
+            "Incorrect arguments. Usage:\n\tpython "
+            "scenarios.py path_buses path_branches path_branches_ts path_loads "
+            "path_loads_ts path_gens path_gens_ts path_scenarios\n"
+        )
+
+    # Run
+    simulating(
+        buses=sys.argv[1],
+        branches=sys.argv[2],
+        branches_ts=sys.argv[3],
+        loads=sys.argv[4],
+        loads_ts=sys.argv[5],
+        gens=sys.argv[6],
+        gens_ts=sys.argv[7],
+        path_scenarios=sys.argv[8],
+    )
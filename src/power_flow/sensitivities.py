@@ -0,0 +1,276 @@
+import hashlib
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from scipy.sparse.linalg import splu
+
+from definitions import S_BASE_MVA, SENSITIVITIES_PATH
+from src.utils.app_logger import get_logger
+
+# Columns which define the topology and parameters of the network
+_BUS_COLUMNS = ["bus_name", "in_service", "v_rated_kv", "is_slack"]
+_BRANCH_COLUMNS = [
+    "branch_name",
+    "from_bus",
+    "to_bus",
+    "parallel",
+    "in_service",
+    "r_ohm",
+    "x_ohm",
+    "b_µs",
+    "trafo_ratio_rel",
+]
+
+# Matrices saved in the sparse format, others are saved as dense arrays
+_SPARSE_MATRICES = ["ybus", "yf", "yt", "incidence", "bbus", "bf"]
+
+# Version of the set of saved matrices, it is a part of the cache key
+_CACHE_VERSION = 2
+
+
+def get_topology_hash(
+    buses: pd.DataFrame, branches: pd.DataFrame, s_base_mva: float
+) -> str:
+    """Calculate the hash of network parameters used in sensitivities.
+
+    Args:
+        buses: Bus data.
+        branches: Branch data.
+        s_base_mva: Base power.
+
+    Returns:
+        Hex digest of the hash.
+    """
+    buses = buses.sort_values("bus_name", ignore_index=True)[_BUS_COLUMNS]
+    branches = branches.sort_values("branch_name", ignore_index=True)[_BRANCH_COLUMNS]
+    digest = hashlib.sha256()
+    digest.update(buses.to_csv(index=False).encode("utf-8"))
+    digest.update(branches.to_csv(index=False).encode("utf-8"))
+    digest.update(f"{s_base_mva} {_CACHE_VERSION}".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def calculate_sensitivities(
+    buses: pd.DataFrame, branches: pd.DataFrame, s_base_mva: float
+) -> dict[str, np.ndarray | sparse.csr_matrix]:
+    """Calculate admittance matrices and DC sensitivities of branch flows.
+
+    Buses and branches are ordered by their names. Trafo parameters are given
+    for the high voltage side which is the from bus.
+
+    Args:
+        buses: Bus data.
+        branches: Branch data.
+        s_base_mva: Base power.
+
+    Returns:
+        Matrices in per units:
+          - "ybus": AC bus admittance matrix (buses x buses, sparse).
+          - "yf" and "yt": AC branch admittance matrices for from and to ends
+            (branches x buses, sparse).
+          - "incidence": Branch-bus incidence matrix (branches x buses, sparse).
+          - "bbus": DC bus susceptance matrix (buses x buses, sparse).
+          - "bf": DC branch susceptance matrix (branches x buses, sparse).
+          - "ptdf": PTDF matrix (branches x buses) with zero column of the
+            slack bus.
+          - "lodf": LODF matrix (branches x outaged branches). Columns are
+            NaNs for branches which outages split the system into islands.
+          - "bus_names" and "branch_names": Names of elements.
+    """
+    buses = buses.sort_values("bus_name", ignore_index=True)
+    branches = branches.sort_values("branch_name", ignore_index=True)
+    bus_name_to_id = pd.Series(data=buses.index.values, index=buses["bus_name"])
+    from_ids = bus_name_to_id[branches["from_bus"]].values
+    to_ids = bus_name_to_id[branches["to_bus"]].values
+    branches_count, buses_count = len(branches), len(buses)
+
+    # Branch parameters in per units taking into account parallel circuits
+    v_rated_kv = buses["v_rated_kv"].values[from_ids]
+    z_base = v_rated_kv**2 / s_base_mva
+    status = branches["in_service"].values * branches["parallel"].values
+    r_pu = branches["r_ohm"].values / z_base
+    x_pu = branches["x_ohm"].values / z_base
+    b_pu = branches["b_µs"].values * 1e-6 * z_base
+    tap = branches["trafo_ratio_rel"].fillna(1).values
+
+    # Connection matrices of branch ends
+    branch_ids = np.arange(branches_count)
+    ones = np.ones(branches_count)
+    shape = (branches_count, buses_count)
+    c_from = sparse.csr_matrix((ones, (branch_ids, from_ids)), shape=shape)
+    c_to = sparse.csr_matrix((ones, (branch_ids, to_ids)), shape=shape)
+    incidence = (c_from - c_to).tocsr()
+
+    # AC admittance matrices of the pi-model with the tap at the from bus
+    y_series = status / (r_pu + 1j * x_pu)
+    y_shunt = status * 1j * b_pu / 2
+    y_ft = -y_series / tap
+    yf = sparse.diags((y_series + y_shunt) / tap**2) @ c_from
+    yf += sparse.diags(y_ft) @ c_to
+    yt = sparse.diags(y_ft) @ c_from + sparse.diags(y_series + y_shunt) @ c_to
+    ybus = (c_from.T @ yf + c_to.T @ yt).tocsr()
+
+    # DC susceptance matrices
+    bf = sparse.diags(status / (x_pu * tap)) @ incidence
+    bbus = (incidence.T @ bf).tocsr()
+
+    # PTDF with the slack bus as the reference
+    no_slack = np.where(~buses["is_slack"].values)[0]
+    ptdf = np.zeros((branches_count, buses_count))
+    factor = splu(bbus[no_slack][:, no_slack].tocsc())
+    ptdf[:, no_slack] = factor.solve(bf[:, no_slack].T.toarray()).T
+
+    # LODF from flows caused by unit transfers between branch ends
+    lodf = _calculate_lodf(ptdf, incidence)
+    return {
+        "ybus": ybus,
+        "yf": yf.tocsr(),
+        "yt": yt.tocsr(),
+        "incidence": incidence,
+        "bbus": bbus,
+        "bf": bf.tocsr(),
+        "ptdf": ptdf,
+        "lodf": lodf,
+        "bus_names": buses["bus_name"].values.astype(str),
+        "branch_names": branches["branch_name"].values.astype(str),
+    }
+
+
+def load_sensitivities(
+    buses: pd.DataFrame,
+    branches: pd.DataFrame,
+    s_base_mva: float = S_BASE_MVA,
+    path: str = SENSITIVITIES_PATH,
+) -> dict[str, np.ndarray | sparse.csr_matrix]:
+    """Load sensitivities of the network from the cache or calculate them.
+
+    Matrices are saved in the folder named by the hash of network parameters,
+    so they are recalculated only if bus or branch data change. Dense arrays
+    are memory-mapped in the read-only mode and shared by all processes
+    which load them.
+
+    Args:
+        buses: Bus data.
+        branches: Branch data.
+        s_base_mva: Base power.
+        path: Path to the cache folder.
+
+    Returns:
+        Matrices described in `calculate_sensitivities`.
+    """
+    logger = get_logger(__name__)
+    path_matrices = os.path.join(path, get_topology_hash(buses, branches, s_base_mva))
+    if not os.path.exists(path_matrices):
+        logger.info("Calculating sensitivities of the network.")
+        matrices = calculate_sensitivities(buses, branches, s_base_mva)
+
+        # Save to a temporary folder and then rename it, so other processes
+        # never see incomplete results
+        os.makedirs(path, exist_ok=True)
+        path_temp = tempfile.mkdtemp(dir=path)
+        for name, matrix in matrices.items():
+            if name in _SPARSE_MATRICES:
+                sparse.save_npz(os.path.join(path_temp, f"{name}.npz"), matrix)
+            else:
+                np.save(os.path.join(path_temp, f"{name}.npy"), matrix)
+        try:
+            os.rename(path_temp, path_matrices)
+        except OSError:
+            # The same matrices were saved by another process
+            shutil.rmtree(path_temp)
+
+    # Load matrices
+    logger.debug(f"Loading sensitivities from {path_matrices}.")
+    matrices = {}
+    for file in sorted(os.listdir(path_matrices)):
+        name, extension = os.path.splitext(file)
+        if extension == ".npz":
+            matrices[name] = sparse.load_npz(os.path.join(path_matrices, file))
+        else:
+            matrices[name] = np.load(os.path.join(path_matrices, file), mmap_mode="r")
+    return matrices
+
+
+def get_outage_sensitivities(
+    matrices: dict[str, np.ndarray | sparse.csr_matrix], outages: list[int]
+) -> dict[str, np.ndarray | sparse.csr_matrix]:
+    """Update sensitivities after outages of several branches.
+
+    Instead of new factorization, matrices are updated using low-rank
+    corrections: admittance matrices lose entries of the outaged branches, and
+    PTDF is corrected using the Woodbury identity with the matrix of transfers
+    between the ends of the outaged branches.
+
+    Args:
+        matrices: Matrices of the network with all branches (see
+          `calculate_sensitivities`).
+        outages: Positions of outaged branches in the order of branch names.
+
+    Returns:
+        Matrices of the same structure for the network without the outaged
+          branches. LODF columns of the outaged branches are zeros.
+
+    Raises:
+        ValueError: Error if outages split the system into islands.
+    """
+    outages = np.asarray(outages, dtype=int)
+    if not len(outages):
+        return matrices
+    incidence = matrices["incidence"]
+    keep = sparse.diags(
+        np.isin(np.arange(incidence.shape[0]), outages, invert=True).astype(float)
+    )
+
+    # Remove entries of the outaged branches
+    c_from = (incidence > 0).astype(float)
+    c_to = (incidence < 0).astype(float)
+    yf, yt, bf = keep @ matrices["yf"], keep @ matrices["yt"], keep @ matrices["bf"]
+    ybus = matrices["ybus"] - (c_from.T @ (matrices["yf"] - yf))
+    ybus -= c_to.T @ (matrices["yt"] - yt)
+    bbus = matrices["bbus"] - incidence.T @ (matrices["bf"] - bf)
+
+    # Flows caused by unit transfers between ends of the outaged branches
+    ptdf = np.asarray(matrices["ptdf"])
+    transfer = np.asarray(incidence[outages] @ ptdf.T).T
+    system = np.eye(len(outages)) - transfer[outages]
+    if np.linalg.cond(system) > 1e12:
+        raise ValueError("Branch outages split the system into islands.")
+    ptdf = ptdf + transfer @ np.linalg.solve(system, ptdf[outages])
+    ptdf[outages] = 0
+    lodf = _calculate_lodf(ptdf, incidence)
+    lodf[:, outages] = 0
+    return {
+        **matrices,
+        "ybus": ybus.tocsr(),
+        "yf": yf.tocsr(),
+        "yt": yt.tocsr(),
+        "bbus": bbus.tocsr(),
+        "bf": bf.tocsr(),
+        "ptdf": ptdf,
+        "lodf": lodf,
+    }
+
+
+def _calculate_lodf(ptdf: np.ndarray, incidence: sparse.csr_matrix) -> np.ndarray:
+    """Calculate LODF from flows caused by unit transfers between branch ends.
+
+    Args:
+        ptdf: PTDF matrix.
+        incidence: Branch-bus incidence matrix.
+
+    Returns:
+        LODF matrix with NaN columns for branches which outages split
+          the system into islands.
+    """
+    transfer = (incidence @ ptdf.T).T
+    denominator = 1 - np.diag(transfer)
+    is_island = np.abs(denominator) < 1e-6
+    denominator[is_island] = np.nan
+    lodf = transfer / denominator[None, :]
+    np.fill_diagonal(lodf, -1)
+    lodf[:, is_island] = np.nan
+    return lodf
@@ -0,0 +1,284 @@
+import io
+import json
+import os
+import sys
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from multiprocessing import Pool
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from definitions import SERVER_ADDRESS, SERVER_CACHE_SIZE, SERVER_WORKERS_COUNT
+from src.power_flow.builders.base import BasePowerFlowBuilder
+from src.power_flow.building import get_builder
+from src.power_flow.session import get_session_results, init_session_worker
+from src.utils.app_logger import get_logger
+
+
+class CaseServer(ThreadingHTTPServer):
+    """HTTP server of power flow cases with a pool of warm worker processes.
+
+    Each worker keeps a session with prepared data and the base model (see
+    `PowerFlowSession`), so requests are served without rebuilding the model.
+
+    Endpoints:
+        GET /timestamps: List of timestamps with data.
+        GET /elements: Names of elements in the order used in results.
+        POST /case: Results of the case. The request body is a JSON object
+          with keys "timestamp", "overrides" (optional, see `_apply_overrides`
+          of the builder), and "format" (optional, "json" or "npz").
+
+    Args:
+        builder: Builder with loaded data.
+        address: Host and port to listen.
+        workers: Number of worker processes.
+        cache_size: Number of recently solved cases kept by each worker.
+
+    Attributes:
+        timestamps: List of timestamps with data.
+        element_names: Names of elements in the order used in results.
+    """
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        builder: BasePowerFlowBuilder,
+        address: tuple[str, int],
+        workers: int = 1,
+        cache_size: int = 32,
+    ) -> None:
+        """HTTP server of power flow cases with a pool of warm worker processes."""
+        self._logger = get_logger(__name__)
+        template = builder.create_template()
+        self.timestamps = builder.timestamps.tolist()
+        self.element_names = builder._get_element_names()
+
+        # Start workers before opening the socket, so they do not inherit it
+        workers_count = workers if workers > 0 else os.cpu_count()
+        self._pool = Pool(
+            workers_count,
+            initializer=init_session_worker,
+            initargs=(builder, template, cache_size),
+        )
+        super().__init__(address, _CaseRequestHandler)
+        self._logger.info(
+            f"Server of power flow cases with {workers_count} workers "
+            f"is listening on {address[0]}:{address[1]}."
+        )
+
+    def get_results(self, timestamp: str, overrides: Optional[dict] = None) -> dict:
+        """Get results of the power flow case from one of the workers.
+
+        Args:
+            timestamp: Datetime of the case.
+            overrides: Custom values of load and gen variables.
+
+        Returns:
+            Convergence flags and result arrays for each element type.
+        """
+        return self._pool.apply(get_session_results, (timestamp, overrides))
+
+    def server_close(self) -> None:
+        """Close the socket and stop workers."""
+        super().server_close()
+        self._pool.terminate()
+        self._pool.join()
+
+
+class _CaseRequestHandler(BaseHTTPRequestHandler):
+    """Handler of requests to the server of power flow cases."""
+
+    server: CaseServer
+
+    def do_GET(self) -> None:
+        """Handle GET requests."""
+        match self.path:
+            case "/timestamps":
+                self._send_json(self.server.timestamps)
+            case "/elements":
+                self._send_json(self.server.element_names)
+            case _:
+                self.send_error(HTTPStatus.NOT_FOUND)
+
+    def do_POST(self) -> None:
+        """Handle POST requests."""
+        if self.path != "/case":
+            self.send_error(HTTPStatus.NOT_FOUND)
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length))
+            result = self.server.get_results(
+                request["timestamp"], request.get("overrides")
+            )
+            result_format = request.get("format", "json")
+        except (ValueError, KeyError, TypeError, AttributeError) as error:
+            self.send_error(HTTPStatus.BAD_REQUEST, explain=str(error))
+            return
+        except Exception as error:
+            self._send_server_error(error)
+            return
+
+        try:
+            match result_format:
+                case "json":
+                    self._send_json(_to_json_compatible(result))
+                case "npz":
+                    self._send_npz(result)
+                case _:
+                    self.send_error(
+                        HTTPStatus.BAD_REQUEST,
+                        explain=f"Unknown format {result_format}.",
+                    )
+        except Exception as error:
+            self._send_server_error(error)
+
+    def log_message(self, format: str, *args) -> None:
+        """Write access logs to the logger instead of stderr.
+
+        Args:
+            format: Message format.
+            *args: Message arguments.
+        """
+        self.server._logger.debug(format % args)
+
+    def _send_server_error(self, error: Exception) -> None:
+        """Log the unexpected error and report it to the client.
+
+        Args:
+            error: Error raised while handling the request.
+        """
+        self.server._logger.error(
+            f"Request {self.path} failed: {error!r}.", exc_info=error
+        )
+        self.send_error(HTTPStatus.INTERNAL_SERVER_ERROR, explain=repr(error))
+
+    def _send_json(self, data: dict | list) -> None:
+        """Send data as JSON.
+
+        Args:
+            data: Data to send.
+        """
+        self._send_bytes(json.dumps(data).encode("utf-8"), "application/json")
+
+    def _send_npz(self, result: dict) -> None:
+        """Send results as numpy archive with keys "<element>/<variable>".
+
+        Args:
+            result: Results of the case.
+        """
+        arrays = {}
+        for key, value in result.items():
+            if isinstance(value, dict):
+                for var, values in value.items():
+                    arrays[f"{key}/{var}"] = values
+            else:
+                arrays[key] = np.asarray(value)
+        buffer = io.BytesIO()
+        np.savez(buffer, **arrays)
+        self._send_bytes(buffer.getvalue(), "application/octet-stream")
+
+    def _send_bytes(self, body: bytes, content_type: str) -> None:
+        """Send the response.
+
+        Args:
+            body: Response body.
+            content_type: Content type of the body.
+        """
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def _to_json_compatible(result: dict) -> dict:
+    """Convert result arrays to lists replacing NaNs with None.
+
+    Args:
+        result: Results of the case.
+
+    Returns:
+        Results which can be serialized to JSON.
+    """
+    converted = {}
+    for key, value in result.items():
+        if isinstance(value, dict):
+            converted[key] = {
+                var: [None if np.isnan(v) else v for v in values.tolist()]
+                for var, values in value.items()
+            }
+        else:
+            converted[key] = value
+    return converted
+
+
+def serving(
+    buses: str | pd.DataFrame,
+    branches: str | pd.DataFrame,
+    branches_ts: str | pd.DataFrame,
+    loads: str | pd.DataFrame,
+    loads_ts: str | pd.DataFrame,
+    gens: str | pd.DataFrame,
+    gens_ts: str | pd.DataFrame,
+) -> None:
+    """Start the server of power flow cases.
+
+    Args:
+        buses: Path or DataFrame with bus data.
+        branches: Path or DataFrame with branch data.
+        branches_ts: Path or DataFrame with branch time-series data.
+        loads: Path or DataFrame with load data.
+        loads_ts: Path or DataFrame with load time-series data.
+        gens: Path or DataFrame with generation data.
+        gens_ts: Path or DataFrame with generation time-series data.
+    """
+    # Create builder and load data
+    builder = get_builder()
+    builder.load_data(
+        buses=buses,
+        branches=branches,
+        branches_ts=branches_ts,
+        loads=loads,
+        loads_ts=loads_ts,
+        gens=gens,
+        gens_ts=gens_ts,
+    )
+
+    # Serve until interrupted
+    server = CaseServer(
+        builder=builder,
+        address=SERVER_ADDRESS,
+        workers=SERVER_WORKERS_COUNT,
+        cache_size=SERVER_CACHE_SIZE,
+    )
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    # Check params
+    if len(sys.argv) != 8:
+        raise ValueError(
+            "Incorrect arguments. Usage:\n\tpython "
+            "server.py path_buses path_branches path_branches_ts path_loads "
+            "path_loads_ts path_gens path_gens_ts\n"
+        )
+
+    # Run
+    serving(
+        buses=sys.argv[1],
+        branches=sys.argv[2],
+        branches_ts=sys.argv[3],
+        loads=sys.argv[4],
+        loads_ts=sys.argv[5],
+        gens=sys.argv[6],
+        gens_ts=sys.argv[7],
+    )
@@ -0,0 +1,173 @@
+import copy
+import json
+from collections import OrderedDict
+from typing import Any, Optional
+
+from src.power_flow.builders.base import BasePowerFlowBuilder
+from src.utils.app_logger import get_logger
+
+# Session of a worker process shared by all its tasks
+_worker_state = {}
+
+
+def init_session_worker(
+    builder: BasePowerFlowBuilder,
+    template: Optional[bytes | str] = None,
+    cache_size: int = 32,
+) -> None:
+    """Create a warm session in a worker process.
+
+    Args:
+        builder: Builder with loaded data.
+        template: Serialized base model or path to it.
+        cache_size: Number of recently solved cases to keep.
+    """
+    _worker_state["session"] = PowerFlowSession(
+        builder=builder, cache_size=cache_size, template=template
+    )
+
+
+def get_session_results(timestamp: str, overrides: Optional[dict] = None) -> dict:
+    """Get results of the power flow case using the session of the worker process.
+
+    Args:
+        timestamp: Datetime of the case.
+        overrides: Custom values of load and gen variables.
+
+    Returns:
+        Convergence flags and result arrays for each element type.
+    """
+    return _worker_state["session"].get_results(timestamp, overrides)
+
+
+class PowerFlowSession:
+    """Keep a builder warm to serve power flow cases for separate timestamps.
+
+    Data are prepared and the base model is built only once when the session
+    is created. Each request reuses the base model, and recently solved cases
+    are kept in an LRU cache.
+
+    Args:
+        builder: Builder with loaded data.
+        cache_size: Number of recently solved cases to keep.
+        template: Serialized base model or path to it (see `create_template`
+          of the builder). If None, the base model is built from the data.
+
+    Attributes:
+        builder: Builder used to create power flow cases.
+        cache_size: Max number of solved cases in the cache.
+    """
+
+    def __init__(
+        self,
+        builder: BasePowerFlowBuilder,
+        cache_size: int = 32,
+        template: Optional[bytes | str] = None,
+    ) -> None:
+        """Keep a builder warm to serve power flow cases for separate timestamps."""
+        self.builder = builder
+        self.cache_size = cache_size
+        self._logger = get_logger(__name__)
+        self._cache = OrderedDict()
+        self._timestamps = set(builder.timestamps)
+
+        # Expensive steps are done only once
+        self.builder._ensure_prepared()
+        if template is None:
+            self._model = self.builder._build_base_model()
+        else:
+            self._model = self.builder.restore_template(template)
+
+    @property
+    def element_names(self) -> dict[str, list[str]]:
+        """Names of elements in the order used in results."""
+        return self.builder._get_element_names()
+
+    def get_case(self, timestamp: str, overrides: Optional[dict] = None) -> Any:
+        """Get the power flow model with data of the timestamp without solving it.
+
+        Args:
+            timestamp: Datetime of the case.
+            overrides: Custom values of load and gen variables, e.g.
+              `{"loads": {"load_001": {"p_mw": 10}}, "gens": {"wind_001": {...}}}`.
+
+        Returns:
+            Copy of the power system model.
+        """
+        self._check_timestamp(timestamp)
+        self.builder._apply_next_timestamp(self._model, timestamp)
+        if overrides:
+            self.builder._apply_overrides(self._model, overrides)
+        return copy.deepcopy(self._model)
+
+    def solve(self, timestamp: str, overrides: Optional[dict] = None) -> Any:
+        """Get the solved power flow case for the timestamp.
+
+        Args:
+            timestamp: Datetime of the case.
+            overrides: Custom values of load and gen variables.
+
+        Returns:
+            Copy of the solved power system model.
+        """
+        model, _ = self._solve(timestamp, overrides)
+        return copy.deepcopy(model)
+
+    def get_results(self, timestamp: str, overrides: Optional[dict] = None) -> dict:
+        """Get main results of the power flow case for the timestamp.
+
+        It is faster than `solve` since the model is not copied.
+
+        Args:
+            timestamp: Datetime of the case.
+            overrides: Custom values of load and gen variables.
+
+        Returns:
+            Convergence flags and result arrays for each element type.
+        """
+        model, flags = self._solve(timestamp, overrides)
+        return self.builder._get_record(model, timestamp, *flags)
+
+    def clear_cache(self) -> None:
+        """Remove all solved cases from the cache."""
+        self._cache.clear()
+
+    def _solve(
+        self, timestamp: str, overrides: Optional[dict]
+    ) -> tuple[Any, tuple[bool, bool]]:
+        """Solve the power flow case or take it from the cache.
+
+        Args:
+            timestamp: Datetime of the case.
+            overrides: Custom values of load and gen variables.
+
+        Returns:
+            Solved model, which must not be modified, and convergence flags.
+        """
+        self._check_timestamp(timestamp)
+        key = (timestamp, json.dumps(overrides, sort_keys=True) if overrides else "")
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            return self._cache[key]
+
+        # Solve and save to the cache
+        flags = self.builder._process_timestamp(
+            self._model, timestamp, self._logger, overrides
+        )
+        solved = (copy.deepcopy(self._model), flags)
+        self._cache[key] = solved
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return solved
+
+    def _check_timestamp(self, timestamp: str) -> None:
+        """Ensure there are data for the timestamp.
+
+        Args:
+            timestamp: Datetime of the case.
+
+        Raises:
+            ValueError: Error if the timestamp is not in the loaded data.
+        """
+        if timestamp not in self._timestamps:
+            raise ValueError(f"There are no data for the timestamp {timestamp}.")
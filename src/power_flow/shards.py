@@ -0,0 +1,167 @@
+import gzip
+import os
+import socket
+from datetime import datetime
+
+from definitions import DATE_FORMAT, SAMPLES_COMPRESSION_LEVEL
+
+# Formats of shard names for each period
+_PERIOD_FORMATS = {"day": "%Y_%m_%d", "month": "%Y_%m"}
+
+# Extensions of files with compressed cases and their indexes
+_DATA_EXTENSION = ".json.gz"
+_INDEX_EXTENSION = ".idx"
+
+# Host name in names of shards written by this process, dots are replaced since
+# they separate parts of file names
+_HOST = socket.gethostname().replace(".", "-") or "localhost"
+
+
+class SampleShards:
+    """Power flow cases saved in compressed shards per day or month.
+
+    Each case is compressed as a separate gzip member and appended to the
+    shard of its period, and its offset and length are appended to the index
+    of the shard. So a case is read without unpacking the whole shard, and
+    the folder has a few large files instead of one file per case.
+
+    Cases are appended with single writes to files opened in the append mode,
+    so worker processes of one host share shards. Names of shards include the
+    host name, so hosts never write to the same file in a shared folder. An
+    index line is written only after its case, so cases of killed processes
+    are never half-indexed.
+
+    Args:
+        path: Path to the folder of shards.
+        period: Period of shards: "day" or "month".
+        compression_level: Level of gzip compression from 1 (fastest) to 9.
+
+    Attributes:
+        path: Path to the folder of shards.
+        period: Period of shards.
+        compression_level: Level of gzip compression.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        period: str = "month",
+        compression_level: int = SAMPLES_COMPRESSION_LEVEL,
+    ) -> None:
+        """Power flow cases saved in compressed shards per day or month."""
+        if period not in _PERIOD_FORMATS:
+            raise ValueError(f"Unknown period of shards: {period}.")
+        self.path = path
+        self.period = period
+        self.compression_level = compression_level
+        self._index = None
+
+    @property
+    def timestamps(self) -> list[str]:
+        """Sorted timestamps of saved cases."""
+        return sorted(self._get_index())
+
+    def put(self, timestamp: str, data: bytes) -> None:
+        """Compress and append the case to its shard.
+
+        Args:
+            timestamp: Datetime of the case.
+            data: Serialized case.
+        """
+        moment = datetime.strptime(timestamp, DATE_FORMAT)
+        shard = f"{moment.strftime(_PERIOD_FORMATS[self.period])}.{_HOST}"
+        compressed = gzip.compress(data, compresslevel=self.compression_level, mtime=0)
+        end = _append(os.path.join(self.path, shard + _DATA_EXTENSION), compressed)
+        line = f"{timestamp},{end - len(compressed)},{len(compressed)}\n"
+        _append(os.path.join(self.path, shard + _INDEX_EXTENSION), line.encode())
+        if self._index is not None:
+            self._index[timestamp] = (shard, end - len(compressed), len(compressed))
+
+    def get(self, timestamp: str) -> bytes:
+        """Read and decompress the case.
+
+        Args:
+            timestamp: Datetime of the case.
+
+        Returns:
+            Serialized case.
+
+        Raises:
+            ValueError: Error if there is no case for the timestamp.
+        """
+        location = self._get_index().get(timestamp)
+        if location is None:
+            raise ValueError(f"There is no case for the timestamp {timestamp}.")
+        shard, offset, length = location
+        with open(os.path.join(self.path, shard + _DATA_EXTENSION), "rb") as file:
+            file.seek(offset)
+            return gzip.decompress(file.read(length))
+
+    def refresh(self) -> None:
+        """Read indexes of shards again, e.g. after other processes added cases."""
+        self._index = None
+
+    def _get_index(self) -> dict[str, tuple[str, int, int]]:
+        """Read indexes of all shards once.
+
+        Returns:
+            Shards, offsets, and lengths of cases by timestamps. If a case was
+              saved several times, the last one is taken.
+        """
+        if self._index is not None:
+            return self._index
+        index = {}
+        with os.scandir(self.path) as iterator:
+            names = sorted(
+                entry.name
+                for entry in iterator
+                if entry.name.endswith(_INDEX_EXTENSION)
+            )
+        for name in names:
+            shard = name[: -len(_INDEX_EXTENSION)]
+            with open(os.path.join(self.path, name)) as file:
+                for line in file:
+                    # The last line can be incomplete if the process was killed
+                    if not line.endswith("\n"):
+                        break
+                    timestamp, offset, length = line.rstrip("\n").split(",")
+                    index[timestamp] = (shard, int(offset), int(length))
+        self._index = index
+        return index
+
+
+def is_sharded(path: str) -> bool:
+    """Check if the folder contains shards of cases.
+
+    Args:
+        path: Path to the folder of cases.
+
+    Returns:
+        True if there is an index of at least one shard.
+    """
+    with os.scandir(path) as iterator:
+        return any(entry.name.endswith(_INDEX_EXTENSION) for entry in iterator)
+
+
+def _append(path: str, data: bytes) -> int:
+    """Append data to the file with a single write.
+
+    Args:
+        path: Path to the file.
+        data: Data to append.
+
+    Returns:
+        Position of the end of written data in the file.
+
+    Raises:
+        OSError: Error if data were written partially.
+    """
+    flags = os.O_WRONLY | os.O_CREAT | os.O_APPEND | getattr(os, "O_BINARY", 0)
+    handle = os.open(path, flags, 0o644)
+    try:
+        written = os.write(handle, data)
+        if written != len(data):
+            raise OSError(f"Only {written} of {len(data)} bytes written to {path}.")
+        return os.lseek(handle, 0, os.SEEK_CUR)
+    finally:
+        os.close(handle)
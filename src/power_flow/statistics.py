@@ -0,0 +1,274 @@
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from definitions import RESULT_LIMITS, STATISTICS_HISTOGRAMS, STATISTICS_QUANTILES
+
+
+class StreamingStatistics:
+    """Running statistics of results of power flow cases.
+
+    Statistics are updated with each solved case, so results of all cases do
+    not need to be stored. For each element and result variable, the weight
+    of converged cases, min, max, mean, and std are tracked. Quantiles are
+    estimated with fixed-width histograms of variables listed in
+    `STATISTICS_HISTOGRAMS`, so their accuracy is the bin width. Values
+    outside limits from `RESULT_LIMITS` are counted as violations, e.g.
+    congestion of branches. Statistics collected by different processes or
+    hosts can be merged.
+
+    Args:
+        element_names: Names of elements for each element type in the order
+          used in results (see `_get_element_names` of the builder).
+        weights: Weights of timestamps, e.g. numbers of timestamps represented
+          by them. Timestamps which are not listed have the weight of 1.
+        histograms: Ranges and numbers of bins of histograms in the format
+          {<element type>: {<variable>: (<lower>, <upper>, <bins>)}}.
+        limits: Limits of variables in the format
+          {<element type>: {<variable>: (<lower>, <upper>)}}, None means no limit.
+        quantiles: Quantiles to report.
+
+    Attributes:
+        element_names: Names of elements for each element type.
+        weights: Weights of timestamps.
+        cases_weight: Total weight of all cases including not converged ones.
+        failed_weight: Total weight of cases which did not converge.
+    """
+
+    def __init__(
+        self,
+        element_names: dict[str, list[str]],
+        weights: Optional[dict[str, float]] = None,
+        histograms: dict = STATISTICS_HISTOGRAMS,
+        limits: dict = RESULT_LIMITS,
+        quantiles: tuple[float, ...] = STATISTICS_QUANTILES,
+    ) -> None:
+        """Running statistics of results of power flow cases."""
+        self.element_names = element_names
+        self.weights = weights or {}
+        self.cases_weight = 0.0
+        self.failed_weight = 0.0
+        self._histogram_ranges = histograms
+        self._limits = limits
+        self._quantiles = quantiles
+        self._moments = {}
+        self._histograms = {}
+        self._violations = {}
+
+    def update(self, record: dict) -> None:
+        """Add results of a case.
+
+        Args:
+            record: Timestamp, convergence flags, and result arrays for each
+              element type (see `_get_record` of the builder).
+        """
+        weight = self.weights.get(record["timestamp"], 1.0)
+        self.cases_weight += weight
+        if not record["is_pf_converged"]:
+            self.failed_weight += weight
+            return
+        for element, variables in record.items():
+            if not isinstance(variables, dict):
+                continue
+            for variable, values in variables.items():
+                self._update_variable(element, variable, values, weight)
+
+    def merge(self, other: "StreamingStatistics") -> None:
+        """Add statistics collected separately, e.g. by another worker.
+
+        Args:
+            other: Statistics with the same elements and settings.
+        """
+        self.cases_weight += other.cases_weight
+        self.failed_weight += other.failed_weight
+        for key, moments in other._moments.items():
+            if key not in self._moments:
+                self._moments[key] = {
+                    name: array.copy() for name, array in moments.items()
+                }
+                continue
+            # Means and squared deviations are combined with the parallel
+            # algorithm, which is stable for large numbers of cases
+            own = self._moments[key]
+            weight = own["weight"] + moments["weight"]
+            delta = moments["mean"] - own["mean"]
+            share = np.divide(
+                moments["weight"], weight, out=np.zeros_like(weight), where=weight > 0
+            )
+            own["mean"] += delta * share
+            own["m2"] += moments["m2"] + delta**2 * own["weight"] * share
+            own["weight"] = weight
+            own["min"] = np.fmin(own["min"], moments["min"])
+            own["max"] = np.fmax(own["max"], moments["max"])
+        for store, other_store in [
+            (self._histograms, other._histograms),
+            (self._violations, other._violations),
+        ]:
+            for key, array in other_store.items():
+                if key in store:
+                    store[key] += array
+                else:
+                    store[key] = array.copy()
+
+    def to_frame(self) -> pd.DataFrame:
+        """Compose statistics of all elements and variables.
+
+        Returns:
+            Statistics with one row per element and variable. Columns: element
+              type, element name, variable, weight of converged cases, min,
+              max, mean, std, quantiles (if histograms are collected), and
+              shares of cases below and above limits (if limits are set).
+        """
+        frames = []
+        for (element, variable), moments in self._moments.items():
+            weight = moments["weight"]
+            mean = np.where(weight > 0, moments["mean"], np.nan)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                variance = moments["m2"] / weight
+            frame = pd.DataFrame(
+                {
+                    "element_type": element,
+                    "element_name": self.element_names[element],
+                    "variable": variable,
+                    "weight": weight,
+                    "min": moments["min"],
+                    "max": moments["max"],
+                    "mean": mean,
+                    "std": np.sqrt(variance),
+                }
+            )
+            if (element, variable) in self._histograms:
+                values = self._get_quantiles(element, variable, moments)
+                for quantile, column in zip(self._quantiles, values):
+                    frame[f"q{100 * quantile:g}"] = column
+            if (element, variable) in self._violations:
+                counts = self._violations[(element, variable)]
+                with np.errstate(invalid="ignore", divide="ignore"):
+                    frame["share_below"] = counts[0] / weight
+                    frame["share_above"] = counts[1] / weight
+            frames.append(frame)
+        return pd.concat(frames, ignore_index=True)
+
+    def _update_variable(
+        self, element: str, variable: str, values: np.ndarray, weight: float
+    ) -> None:
+        """Add values of a variable of all elements of the type.
+
+        Args:
+            element: Element type.
+            variable: Result variable.
+            values: Values of elements, NaNs are skipped.
+            weight: Weight of the case.
+        """
+        key = (element, variable)
+        moments = self._moments.get(key)
+        if moments is None:
+            size = len(values)
+            moments = {
+                "weight": np.zeros(size),
+                "mean": np.zeros(size),
+                "m2": np.zeros(size),
+                "min": np.full(size, np.nan),
+                "max": np.full(size, np.nan),
+            }
+            self._moments[key] = moments
+        is_valid = ~np.isnan(values)
+        valid = np.where(is_valid, values, 0.0)
+
+        # Weighted Welford update of means and sums of squared deviations
+        weights = np.where(is_valid, float(weight), 0.0)
+        moments["weight"] += weights
+        delta = valid - moments["mean"]
+        share = np.divide(
+            weights,
+            moments["weight"],
+            out=np.zeros_like(weights),
+            where=moments["weight"] > 0,
+        )
+        moments["mean"] += delta * share
+        moments["m2"] += weights * delta * (valid - moments["mean"])
+        moments["min"] = np.fmin(moments["min"], values)
+        moments["max"] = np.fmax(moments["max"], values)
+
+        # Histograms are stored as arrays of elements x bins
+        histogram_range = self._histogram_ranges.get(element, {}).get(variable)
+        if histogram_range is not None:
+            lower, upper, bins = histogram_range
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = np.zeros((len(values), bins))
+                self._histograms[key] = histogram
+            positions = np.floor((valid - lower) / (upper - lower) * bins)
+            positions = np.clip(positions, 0, bins - 1).astype(int)
+            rows = np.flatnonzero(is_valid)
+            histogram[rows, positions[rows]] += weight
+
+        # Violations are stored as arrays of 2 x elements (below and above)
+        limits = self._limits.get(element, {}).get(variable)
+        if limits is not None:
+            violations = self._violations.get(key)
+            if violations is None:
+                violations = np.zeros((2, len(values)))
+                self._violations[key] = violations
+            lower, upper = limits
+            if lower is not None:
+                violations[0] += weight * (is_valid & (valid < lower))
+            if upper is not None:
+                violations[1] += weight * (is_valid & (valid > upper))
+
+    def _get_quantiles(
+        self, element: str, variable: str, moments: dict[str, np.ndarray]
+    ) -> list[np.ndarray]:
+        """Estimate quantiles from histograms.
+
+        Values are assumed to be uniform within bins, and estimations are
+        limited by the exact min and max.
+
+        Args:
+            element: Element type.
+            variable: Result variable.
+            moments: Weights, min, and max of elements.
+
+        Returns:
+            Values of elements for each quantile.
+        """
+        lower, upper, bins = self._histogram_ranges[element][variable]
+        histogram = self._histograms[(element, variable)]
+        cumulative = np.cumsum(histogram, axis=1)
+        width = (upper - lower) / bins
+        results = []
+        for quantile in self._quantiles:
+            target = quantile * moments["weight"]
+            positions = (cumulative < target[:, None]).sum(axis=1)
+            positions = np.minimum(positions, bins - 1)
+            rows = np.arange(len(histogram))
+            before = cumulative[rows, positions] - histogram[rows, positions]
+            with np.errstate(invalid="ignore", divide="ignore"):
+                share = (target - before) / histogram[rows, positions]
+            values = lower + width * (positions + np.nan_to_num(share))
+            values = np.clip(values, moments["min"], moments["max"])
+            values[moments["weight"] == 0] = np.nan
+            results.append(values)
+        return results
+
+
+def save_statistics(
+    statistics: StreamingStatistics, path_statistics: Optional[str] = None
+) -> Optional[pd.DataFrame]:
+    """Save statistics of results to a CSV file.
+
+    Args:
+        statistics: Collected statistics.
+        path_statistics: Path to save statistics.
+
+    Returns:
+        Statistics or None if `path_statistics` is passed and they were saved.
+    """
+    data = statistics.to_frame()
+    cols = data.select_dtypes("number").columns
+    data[cols] = data[cols].round(decimals=6)
+    if path_statistics:
+        data.to_csv(path_statistics, header=True, index=False)
+    else:
+        return data
@@ -1,18 +1,50 @@
+import json
 import logging
 import logging.handlers
 import os
+import time
 from datetime import datetime
 from logging.handlers import QueueHandler
 from multiprocessing import Queue
+from queue import Empty
+from threading import Thread
 from typing import Optional
 
 import pytz
 
-from definitions import LOG_DATE_FORMAT, LOG_FORMAT_DEBUG, LOG_FORMAT_INFO, LOG_PATH
+from definitions import (
+    LOG_DATE_FORMAT,
+    LOG_FLUSH_PERIOD_S,
+    LOG_FORMAT_DEBUG,
+    LOG_FORMAT_INFO,
+    LOG_PATH,
+    LOG_STRUCTURED,
+    LOG_STRUCTURED_PATH,
+)
+
+# Timezone of log records
+_TIMEZONE = pytz.UTC
+
+# Max number of records taken by the listener from the queue at once
+_LISTENER_BATCH_SIZE = 1024
+
+# Max time to wait for remaining logs after workers are stopped, since records
+# of terminated workers can be incomplete
+_LISTENER_STOP_TIMEOUT_S = 10.0
 
 
 class CustomFormatter(logging.Formatter):
-    """Override standard formatter to specify timezone."""
+    """Override standard formatter to specify timezone.
+
+    Records of the same second have the same time string, so it is formatted
+    once per second.
+    """
+
+    def __init__(self, *args, **kwargs) -> None:
+        """Override standard formatter to specify timezone."""
+        super().__init__(*args, **kwargs)
+        self._cached_second = None
+        self._cached_time = None
 
     def converter(self, timestamp: float) -> datetime:
         """Convert time to UTC zone.
@@ -23,8 +55,7 @@ class CustomFormatter(logging.Formatter):
         Returns:
             Datetime object in UTC zone.
         """
-        dt = datetime.fromtimestamp(timestamp, tz=pytz.UTC)
-        return dt.astimezone(pytz.timezone("UTC"))
+        return datetime.fromtimestamp(timestamp, tz=_TIMEZONE)
 
     def formatTime(
         self, record: logging.LogRecord, datefmt: Optional[str] = None
@@ -38,10 +69,85 @@ class CustomFormatter(logging.Formatter):
         Returns:
             Time in string format.
         """
-        dt = self.converter(record.created)
-        if datefmt:
-            return dt.strftime(datefmt)
-        return dt.isoformat()
+        if not datefmt:
+            return self.converter(record.created).isoformat()
+        second = int(record.created)
+        if second != self._cached_second:
+            self._cached_time = self.converter(second).strftime(datefmt)
+            self._cached_second = second
+        return self._cached_time
+
+
+class JsonFormatter(CustomFormatter):
+    """Format records as JSON objects, one per line."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        """Convert the record to a JSON object.
+
+        Args:
+            record: Log record.
+
+        Returns:
+            JSON object with time, level, logger, function, process, message,
+              and exception if any.
+        """
+        data = {
+            "time": self.formatTime(record, self.datefmt),
+            "level": record.levelname,
+            "logger": record.name,
+            "function": record.funcName,
+            "process": record.processName,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            data["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            data["exception"] = record.exc_text
+        return json.dumps(data, ensure_ascii=False)
+
+
+class BufferedFileHandler(logging.FileHandler):
+    """File handler which writes records in batches.
+
+    The file is flushed at most once per `flush_period_s`, and immediately for
+    warnings and errors, so many records cost one write.
+
+    Args:
+        path: Path to the log file.
+        flush_period_s: Min period between flushes in seconds.
+    """
+
+    def __init__(self, path: str, flush_period_s: float = LOG_FLUSH_PERIOD_S) -> None:
+        """File handler which writes records in batches."""
+        super().__init__(path, encoding="utf-8")
+        self.flush_period_s = flush_period_s
+        self._next_flush = 0.0
+
+    def emit(self, record: logging.LogRecord) -> None:
+        """Write the record and flush the file for warnings and errors.
+
+        Args:
+            record: Log record.
+        """
+        super().emit(record)
+        if record.levelno >= logging.WARNING:
+            self.flush(force=True)
+
+    def flush(self, force: bool = False) -> None:
+        """Flush the file if the period has passed.
+
+        Args:
+            force: If to flush regardless of the period.
+        """
+        now = time.monotonic()
+        if force or now >= self._next_flush:
+            self._next_flush = now + self.flush_period_s
+            super().flush()
+
+    def close(self) -> None:
+        """Flush remaining records and close the file."""
+        self.flush(force=True)
+        super().close()
 
 
 def _get_file_handler(path: str) -> logging.FileHandler:
@@ -53,11 +159,14 @@ def _get_file_handler(path: str) -> logging.FileHandler:
     Returns:
         File handler for logs.
     """
-    file_handler = logging.FileHandler(path, encoding="utf-8")
+    file_handler = BufferedFileHandler(path)
     file_handler.setLevel(logging.DEBUG)
-    file_handler.setFormatter(
-        CustomFormatter(fmt=LOG_FORMAT_DEBUG, datefmt=LOG_DATE_FORMAT)
-    )
+    if LOG_STRUCTURED:
+        file_handler.setFormatter(JsonFormatter(datefmt=LOG_DATE_FORMAT))
+    else:
+        file_handler.setFormatter(
+            CustomFormatter(fmt=LOG_FORMAT_DEBUG, datefmt=LOG_DATE_FORMAT)
+        )
     return file_handler
 
 
@@ -87,7 +196,9 @@ def get_logger(module_name: str) -> logging.Logger:
     project_path = os.path.dirname(
         os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
     )
-    path_log = os.path.join(project_path, LOG_PATH)
+    path_log = os.path.join(
+        project_path, LOG_STRUCTURED_PATH if LOG_STRUCTURED else LOG_PATH
+    )
     os.makedirs(os.path.dirname(path_log), exist_ok=True)
     logger = logging.getLogger(module_name)
     if not logger.handlers:
@@ -100,6 +211,9 @@ def get_logger(module_name: str) -> logging.Logger:
 def get_queue_logger(module_name: str, queue: Queue) -> logging.Logger:
     """Logger used in subprocesses.
 
+    Records are not propagated to parent loggers, since forked processes
+    inherit their file handlers, and records are written by the listener.
+
     Args:
         queue: Shared queue.
         module_name: Name of the module where events happen.
@@ -111,19 +225,66 @@ def get_queue_logger(module_name: str, queue: Queue) -> logging.Logger:
     if not logger.handlers:
         logger.addHandler(QueueHandler(queue))
         logger.setLevel(logging.DEBUG)
+        logger.propagate = False
     return logger
 
 
 def queue_listener(module_name: str, queue: Queue) -> None:
     """Listen the log queue.
 
+    Records which are already in the queue are handled together, and the file
+    handler writes them in batches.
+
     Args:
         queue: Queue to listen.
         module_name: Name of the module where events happen.
     """
     logger = get_logger(module_name)
-    while True:
-        message = queue.get()
-        if message is None:
-            break
-        logger.handle(message)
+    is_stopped = False
+    while not is_stopped:
+        records = [queue.get()]
+        while len(records) < _LISTENER_BATCH_SIZE:
+            try:
+                records.append(queue.get_nowait())
+            except Empty:
+                break
+        for record in records:
+            if record is None:
+                is_stopped = True
+                break
+            logger.handle(record)
+    for handler in logger.handlers:
+        if isinstance(handler, BufferedFileHandler):
+            handler.flush(force=True)
+
+
+def start_queue_listener(module_name: str) -> tuple[Queue, Thread]:
+    """Start the thread which writes logs of worker processes.
+
+    The queue is a plain multiprocessing queue, so workers put records without
+    round trips to a manager process. It is passed to workers when they are
+    created.
+
+    Args:
+        module_name: Name of the module where events happen.
+
+    Returns:
+        Queue for logs and the listening thread.
+    """
+    queue = Queue(-1)
+    thread = Thread(target=queue_listener, args=(module_name, queue), daemon=True)
+    thread.start()
+    return queue, thread
+
+
+def stop_queue_listener(queue: Queue, thread: Thread) -> None:
+    """Write remaining logs and stop the listening thread.
+
+    Args:
+        queue: Queue for logs.
+        thread: Listening thread.
+    """
+    queue.put_nowait(None)
+    thread.join(timeout=_LISTENER_STOP_TIMEOUT_S)
+    queue.close()
+    queue.join_thread()
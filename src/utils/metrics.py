@@ -0,0 +1,312 @@
+import os
+import tempfile
+import threading
+import time
+from bisect import bisect_left
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+from definitions import (
+    METRICS_ADDRESS,
+    METRICS_LATENCY_BUCKETS_S,
+    METRICS_TEXTFILE_PATH,
+    METRICS_TEXTFILE_PERIOD_S,
+)
+from src.utils.app_logger import get_logger
+
+# Types and descriptions of exported metrics
+_METRICS = {
+    "power_flow_cases_total": ("counter", "Built power flow cases by status."),
+    "power_flow_case_seconds": ("histogram", "Wall-clock time to build one case."),
+    "power_flow_stage_seconds": (
+        "histogram",
+        "Time spent by solvers of one case at each calculation stage.",
+    ),
+    "power_flow_solver_calls_total": ("counter", "Calls of solvers."),
+    "power_flow_solver_failures_total": ("counter", "Calls which did not converge."),
+    "power_flow_solver_iterations_total": ("counter", "Iterations of solvers."),
+    "power_flow_solver_seconds_total": ("counter", "Time spent by solvers."),
+    "power_flow_worker_rss_bytes": ("gauge", "Resident memory of worker processes."),
+    "power_flow_queue_cases": ("gauge", "Cases waiting to be assigned to workers."),
+    "power_flow_workers": ("gauge", "Running worker processes."),
+}
+
+# Registry of the process, it is created on the first use
+_registry = None
+_registry_lock = threading.Lock()
+
+
+class MetricsRegistry:
+    """Counters, gauges, and histograms exported in the Prometheus text format.
+
+    Worker processes report results of cases to the parent process, which is
+    the only one updating the registry. Metrics are served over HTTP at
+    "/metrics" and/or written to a file for the textfile collector of the node
+    exporter.
+
+    Args:
+        address: Host and port of the HTTP endpoint. If None, it is not started.
+        path_textfile: Path to the file with metrics. If None, it is not written.
+        textfile_period_s: Min period of writing the file in seconds.
+        buckets: Upper bounds of histogram buckets in seconds.
+    """
+
+    def __init__(
+        self,
+        address: Optional[tuple[str, int]] = None,
+        path_textfile: Optional[str] = None,
+        textfile_period_s: float = 15,
+        buckets: tuple[float, ...] = METRICS_LATENCY_BUCKETS_S,
+    ) -> None:
+        """Counters, gauges, and histograms exported in the Prometheus text format."""
+        self._values = {}
+        self._histograms = {}
+        self._buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self._logger = get_logger(__name__)
+        self._path_textfile = path_textfile
+        self._textfile_period_s = textfile_period_s
+        self._next_write = 0.0
+        self._server = None
+        if address is not None:
+            self._server = ThreadingHTTPServer(address, _MetricsRequestHandler)
+            self._server.daemon_threads = True
+            self._server.registry = self
+            threading.Thread(target=self._server.serve_forever, daemon=True).start()
+            host, port = self._server.server_address[:2]
+            self._logger.info(f"Metrics are served at http://{host}:{port}/metrics.")
+
+    def inc(self, name: str, value: float = 1, **labels: str) -> None:
+        """Increase the counter.
+
+        Args:
+            name: Name of the metric.
+            value: Increment.
+            **labels: Labels of the series.
+        """
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + value
+
+    def set(self, name: str, value: float, **labels: str) -> None:
+        """Set the value of the gauge.
+
+        Args:
+            name: Name of the metric.
+            value: New value.
+            **labels: Labels of the series.
+        """
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._values[key] = value
+
+    def remove(self, name: str, **labels: str) -> None:
+        """Remove the series, e.g. the gauge of a stopped worker.
+
+        Args:
+            name: Name of the metric.
+            **labels: Labels of the series.
+        """
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._values.pop(key, None)
+
+    def observe(self, name: str, value: float, **labels: str) -> None:
+        """Add the value to the histogram.
+
+        Args:
+            name: Name of the metric.
+            value: Observed value.
+            **labels: Labels of the series.
+        """
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = [[0] * (len(self._buckets) + 1), 0.0]
+                self._histograms[key] = histogram
+            histogram[0][bisect_left(self._buckets, value)] += 1
+            histogram[1] += value
+
+    def observe_stats(self, stats: dict, per_case: bool = True) -> None:
+        """Add statistics of solvers collected by the builder.
+
+        Args:
+            stats: Statistics in the format of `stats` of the builder.
+            per_case: If statistics belong to one case, so time of each stage
+              is added to histograms.
+        """
+        for stage, stage_stats in stats.items():
+            if stage == "cache":
+                continue
+            for solver, solver_stats in stage_stats.items():
+                labels = {"stage": stage, "solver": solver}
+                self.inc(
+                    "power_flow_solver_calls_total", solver_stats["calls"], **labels
+                )
+                self.inc(
+                    "power_flow_solver_failures_total",
+                    solver_stats["calls"] - solver_stats["converged"],
+                    **labels,
+                )
+                self.inc(
+                    "power_flow_solver_seconds_total", solver_stats["time_s"], **labels
+                )
+                if "iterations" in solver_stats:
+                    self.inc(
+                        "power_flow_solver_iterations_total",
+                        solver_stats["iterations"],
+                        **labels,
+                    )
+            if per_case:
+                self.observe(
+                    "power_flow_stage_seconds",
+                    sum(
+                        solver_stats["time_s"] for solver_stats in stage_stats.values()
+                    ),
+                    stage=stage,
+                )
+
+    def render(self) -> str:
+        """Compose metrics in the Prometheus text format.
+
+        Returns:
+            Text with all series.
+        """
+        with self._lock:
+            values = sorted(self._values.items())
+            histograms = sorted(
+                (key, (list(counts), total))
+                for key, (counts, total) in self._histograms.items()
+            )
+        series = {}
+        for (name, labels), value in values:
+            series.setdefault(name, []).append(
+                f"{name}{_format_labels(labels)} {_format_value(value)}"
+            )
+        for (name, labels), (counts, total) in histograms:
+            lines = series.setdefault(name, [])
+            count = 0
+            bounds = [_format_value(bound) for bound in self._buckets] + ["+Inf"]
+            for bound, bucket_count in zip(bounds, counts):
+                count += bucket_count
+                bucket_labels = labels + (("le", bound),)
+                lines.append(f"{name}_bucket{_format_labels(bucket_labels)} {count}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(total)}")
+            lines.append(f"{name}_count{_format_labels(labels)} {count}")
+        text = []
+        for name, lines in series.items():
+            metric_type, description = _METRICS.get(name, ("untyped", name))
+            text.append(f"# HELP {name} {description}")
+            text.append(f"# TYPE {name} {metric_type}")
+            text.extend(lines)
+        return "\n".join(text) + "\n"
+
+    def flush(self, force: bool = False) -> None:
+        """Write metrics to the file if the period has passed.
+
+        The file is replaced atomically, so the collector never reads a
+        partially written file.
+
+        Args:
+            force: If to write the file regardless of the period.
+        """
+        if self._path_textfile is None:
+            return
+        now = time.monotonic()
+        if not force and now < self._next_write:
+            return
+        self._next_write = now + self._textfile_period_s
+        folder = os.path.dirname(os.path.abspath(self._path_textfile))
+        os.makedirs(folder, exist_ok=True)
+        handle, path_temp = tempfile.mkstemp(dir=folder, suffix=".tmp")
+        with os.fdopen(handle, "w", encoding="utf-8") as file:
+            file.write(self.render())
+        os.replace(path_temp, self._path_textfile)
+
+    def close(self) -> None:
+        """Write the file and stop the HTTP endpoint."""
+        self.flush(force=True)
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+
+
+class _MetricsRequestHandler(BaseHTTPRequestHandler):
+    """Handler of requests to the metrics endpoint."""
+
+    def do_GET(self) -> None:
+        """Send metrics in the Prometheus text format."""
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(HTTPStatus.NOT_FOUND)
+            return
+        body = self.server.registry.render().encode("utf-8")
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args) -> None:
+        """Skip access logs of scrapes.
+
+        Args:
+            format: Message format.
+            *args: Message arguments.
+        """
+
+
+def get_metrics() -> Optional[MetricsRegistry]:
+    """Get the registry of the process configured in definitions.
+
+    The registry and its HTTP endpoint are created on the first call.
+
+    Returns:
+        Registry or None if both `METRICS_ADDRESS` and `METRICS_TEXTFILE_PATH`
+          are None.
+    """
+    global _registry
+    if METRICS_ADDRESS is None and METRICS_TEXTFILE_PATH is None:
+        return None
+    with _registry_lock:
+        if _registry is None:
+            _registry = MetricsRegistry(
+                address=METRICS_ADDRESS,
+                path_textfile=METRICS_TEXTFILE_PATH,
+                textfile_period_s=METRICS_TEXTFILE_PERIOD_S,
+            )
+    return _registry
+
+
+def _format_labels(labels: tuple[tuple[str, str], ...]) -> str:
+    """Format labels of a series.
+
+    Args:
+        labels: Pairs of label names and values.
+
+    Returns:
+        Labels in braces or an empty string.
+    """
+    if not labels:
+        return ""
+    pairs = []
+    for name, value in labels:
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"')
+        value = value.replace("\n", "\\n")
+        pairs.append(f'{name}="{value}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+def _format_value(value: float) -> str:
+    """Format the value of a series.
+
+    Args:
+        value: Value.
+
+    Returns:
+        Integers without the fractional part and floats in the shortest form.
+    """
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
@@ -0,0 +1,95 @@
+import logging
+import time
+from typing import Optional
+
+from tqdm import tqdm
+
+from definitions import PROGRESS_LOG_PERIOD_S
+
+
+class ProgressTracker:
+    """Progress of cases solved by all workers of a run.
+
+    Workers report to the parent process, which updates one tracker, so the
+    progress bar and log lines show completed and failed cases, throughput, and
+    the estimated remaining time of the whole run. Updates only increase
+    counters, and log lines are written at most once per `log_period_s`.
+
+    Args:
+        total: Total number of cases.
+        display: If to show a progress bar.
+        logger: Logger for periodic progress lines. If None, nothing is logged.
+        log_period_s: Period of progress lines in seconds.
+        unit: Name of counted items.
+
+    Attributes:
+        total: Total number of cases.
+        completed: Number of completed cases including failed ones.
+        failed: Number of failed cases.
+    """
+
+    def __init__(
+        self,
+        total: int,
+        display: bool = False,
+        logger: Optional[logging.Logger] = None,
+        log_period_s: Optional[float] = PROGRESS_LOG_PERIOD_S,
+        unit: str = "cases",
+    ) -> None:
+        """Progress of cases solved by all workers of a run."""
+        self.total = total
+        self.completed = 0
+        self.failed = 0
+        self._logger = logger
+        self._log_period_s = log_period_s
+        self._unit = unit
+        self._bar = tqdm(total=total, unit=f" {unit}", disable=not display)
+        self._start = time.monotonic()
+        self._next_log = self._start + (log_period_s or 0)
+        self._logged = 0
+
+    def update(self, count: int = 1, failed: int = 0) -> None:
+        """Count completed cases.
+
+        Args:
+            count: Number of completed cases.
+            failed: Number of failed cases among completed ones.
+        """
+        self.completed += count
+        self._bar.update(count)
+        if failed:
+            self.failed += failed
+            self._bar.set_postfix(failed=self.failed, refresh=False)
+        if self._logger is not None and self._log_period_s is not None:
+            now = time.monotonic()
+            if now >= self._next_log:
+                self._next_log = now + self._log_period_s
+                self._log(now)
+
+    def close(self) -> None:
+        """Close the progress bar and log the final line."""
+        self._bar.close()
+        if self._logger is not None and self._log_period_s is not None:
+            if self.completed != self._logged:
+                self._log(time.monotonic())
+
+    def _log(self, now: float) -> None:
+        """Log completed and failed cases, throughput, and remaining time.
+
+        Args:
+            now: Current time of the monotonic clock.
+        """
+        self._logged = self.completed
+        elapsed_s = max(now - self._start, 1e-9)
+        rate = self.completed / elapsed_s
+        share = self.completed / self.total if self.total else 1.0
+        if self.completed >= self.total:
+            eta = "done"
+        elif rate > 0:
+            eta = f"ETA {tqdm.format_interval((self.total - self.completed) / rate)}"
+        else:
+            eta = "ETA unknown"
+        self._logger.info(
+            f"Progress: {self.completed}/{self.total} {self._unit} ({share:.1%}), "
+            f"{self.failed} failed, {rate:.2f} {self._unit} per second, {eta}."
+        )